@@ -2,116 +2,443 @@
 Battle system for Fire Emblem Combat Simulator.
 """
 import random
+from collections import deque, namedtuple
+from collections.abc import Mapping
+from fe_combat_sim.combat.skills import unit_skills
+from fe_combat_sim.data import WEAPON_RANGES
+from fe_combat_sim.data.ranges import UNARMED_RANGE
+from fe_combat_sim.data.terrain import resolve_terrain
+from fe_combat_sim.entities.weapon import WeaponInstance
 from fe_combat_sim.utils.weapon_triangle import WeaponTriangle
 
+# Logging levels of a battle: no log, AttackEvent tuples, EventLog rows, or full log entries
+LOG_NONE = "none"
+LOG_COMPACT = "compact"
+LOG_COLUMNAR = "columnar"
+LOG_FULL = "full"
+LOG_LEVELS = (LOG_NONE, LOG_COMPACT, LOG_COLUMNAR, LOG_FULL)
+
+# Log limit keeping only the attacks of the latest round
+LOG_LAST_ROUND = "round"
+
+class CombatProfile(namedtuple("CombatProfile", [
+        "hit", "crit", "damage", "critical_damage", "effective", "can_strike", "follow_up"])):
+    """
+    Combat parameters of one side striking the other, fixed for a whole battle.
+    
+    Attributes:
+        hit (int): Hit rate percentage
+        crit (int): Critical hit rate percentage
+        damage (int): Damage of a normal hit
+        critical_damage (int): Damage of a critical hit
+        effective (bool): Whether the weapon is effective against the target
+        can_strike (bool): Whether the side strikes at all (the attacker if its
+            weapon reaches the distance; the defender only if it can counter-attack)
+        follow_up (bool): Whether the side strikes a second time each round
+    """
+    __slots__ = ()
+
+# Profile of a side whose weapon broke: it strikes no more
+BROKEN_PROFILE = CombatProfile(0, 0, 0, 0, False, False, False)
+
+class AttackEvent(namedtuple("AttackEvent", [
+        "attacker", "defender", "hit", "critical", "effective", "damage", "defender_hp_remaining"])):
+    """
+    Compact record of a single attack.
+    
+    Attributes:
+        attacker (str): Name of the attacking character
+        defender (str): Name of the defending character
+        hit (bool): Whether the attack hit
+        critical (bool): Whether the attack was a critical hit
+        effective (bool): Whether the weapon is effective against the defender
+        damage (int): Damage dealt
+        defender_hp_remaining (int): Defender's HP after the attack
+    """
+    __slots__ = ()
+    
+    @property
+    def message(self):
+        """Message describing the attack, rendered on demand."""
+        if not self.hit:
+            return f"{self.attacker}'s attack missed!"
+        return _attack_message(self.attacker, self.defender, self.damage, self.critical, self.effective)
+
+
+class AttackLogEntry(Mapping):
+    """
+    Read-only log entry of a single attack, with the keys of a full battle log.
+    
+    A miss only has the "attacker", "defender", "hit" and "message" keys. The
+    message is only rendered when it is read.
+    """
+    __slots__ = ("event",)
+    
+    HIT_KEYS = ("attacker", "defender", "hit", "critical", "effective", "damage",
+                "defender_hp_remaining", "message")
+    MISS_KEYS = ("attacker", "defender", "hit", "message")
+    
+    def __init__(self, event):
+        """
+        Initialize a log entry.
+        
+        Args:
+            event (AttackEvent): Attack described by the entry
+        """
+        self.event = event
+    
+    def _keys(self):
+        return self.HIT_KEYS if self.event.hit else self.MISS_KEYS
+    
+    def __getitem__(self, key):
+        if key not in self._keys():
+            raise KeyError(key)
+        return getattr(self.event, key)
+    
+    def __iter__(self):
+        return iter(self._keys())
+    
+    def __len__(self):
+        return len(self._keys())
+    
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def _attack_message(attacker_name, defender_name, damage, is_crit, is_effective):
+    """
+    Generate a message describing a successful attack.
+    
+    Args:
+        attacker_name (str): Name of the attacking character
+        defender_name (str): Name of the defending character
+        damage (int): Damage dealt
+        is_crit (bool): Whether the attack was a critical hit
+        is_effective (bool): Whether the attack was effective against the target
+        
+    Returns:
+        str: Message describing the attack
+    """
+    message = f"{attacker_name}"
+    
+    if is_effective:
+        message += " attacks with effectiveness!"
+    
+    if is_crit:
+        message += " lands a critical hit!"
+    else:
+        message += " attacks!"
+        
+    message += f" Deals {damage} damage to {defender_name}!"
+    
+    return message
+
+
+def strike_order(attacker_profile, defender_profile):
+    """
+    Get the sides striking in a round, before skills.
+    
+    The attacker strikes first when in range, then the defender counters, then
+    the faster side follows up.
+    
+    Args:
+        attacker_profile (CombatProfile): Profile of the attacker
+        defender_profile (CombatProfile): Profile of the defender
+        
+    Returns:
+        tuple: Side of each strike, 0 for the attacker and 1 for the defender
+    """
+    order = [0] if attacker_profile.can_strike else []
+    if defender_profile.can_strike:
+        order.append(1)
+    if attacker_profile.follow_up:
+        order.append(0)
+    elif defender_profile.follow_up:
+        order.append(1)
+    return tuple(order)
+
+
 class Battle:
     """Handles combat encounters between characters."""
     
-    def __init__(self, attacker, defender, terrain=None):
+    def __init__(self, attacker, defender, terrain=None, log_level=LOG_FULL, event_log=None,
+                 log_limit=None, rng=None, seed=None, record_rolls=False, distance=None):
         """
         Initialize a battle between two characters.
         
         Args:
             attacker (Character): Attacking character
             defender (Character): Defending character
-            terrain (dict, optional): Terrain effects
+            terrain (optional): Tile both characters stand on (a tile name,
+                Terrain or dict of modifiers), or an (attacker tile, defender
+                tile) pair; see resolve_terrain
+            log_level (str): LOG_NONE to keep no log, LOG_COMPACT to log
+                AttackEvent tuples, LOG_COLUMNAR to log rows of an EventLog, or
+                LOG_FULL to log AttackLogEntry mappings
+            event_log (EventLog, optional): Log shared by several battles, used
+                with LOG_COLUMNAR; a new one is created if None
+            log_limit (int or str, optional): Maximum number of attacks kept in
+                the log, the oldest being dropped first, or LOG_LAST_ROUND to
+                start a new log every round; None keeps every attack
+            rng (optional): Source of randint for the dice, such as a
+                random.Random; defaults to the random module
+            seed (int, optional): Seed of a random.Random used as the source
+                when rng is None, so the battle can be re-run exactly
+            record_rolls (bool): Keep every roll drawn in self.rolls
+            distance (int, optional): Distance between the characters, in
+                tiles; defaults to the nearest distance the attacker's weapon
+                reaches. A side strikes only if its weapon reaches it
+        
+        The skills of both characters and their weapons are checked here, once:
+        those that apply to the fight are compiled into its profiles, strike
+        order and guards, and a fight without skills runs no skill code.
         """
+        if log_level not in LOG_LEVELS:
+            raise ValueError(f"Unknown log level '{log_level}'")
+        if log_limit is not None:
+            if log_level == LOG_COLUMNAR:
+                raise ValueError("Columnar logs cannot be limited")
+            if log_limit != LOG_LAST_ROUND and (not isinstance(log_limit, int)
+                                                or isinstance(log_limit, bool) or log_limit < 1):
+                raise ValueError(f"Invalid log limit '{log_limit}'")
+        
         self.attacker = attacker
         self.defender = defender
+        self.combatants = (attacker, defender)
         self.terrain = terrain or {}
-        self.log = []
+        self.tiles = resolve_terrain(terrain)
+        if distance is None:
+            distance = (attacker.weapon.range if attacker.weapon else UNARMED_RANGE)[0]
+        self.distance = distance
+        self.log_level = log_level
+        self.log_limit = log_limit
+        self.log = deque(maxlen=log_limit) if isinstance(log_limit, int) else []
+        
+        # (character name, weapon) of each weapon broken during the battle
+        self.broken_weapons = []
+        
+        if rng is None:
+            rng = random.Random(seed) if seed is not None else random
+        self.seed = seed
+        self.rolls = None
+        if record_rolls:
+            from fe_combat_sim.combat.dice import RecordingRandom
+            rng = RecordingRandom(rng)
+            self.rolls = rng.rolls
+        self.rng = rng
+        
+        # Attacks logged by this battle, in total and before the latest round
+        self._logged = 0
+        self._round_start = 0
+        
+        if log_level == LOG_COLUMNAR:
+            if event_log is None:
+                from fe_combat_sim.combat.event_log import EventLog
+                event_log = EventLog()
+            event_log.start_fight(attacker.name, defender.name)
+            self.log = event_log
+        
+        # Nothing below changes during a battle, so it is computed once
+        broken = (self._has_broken_weapon(attacker), self._has_broken_weapon(defender))
+        can_attack = self._can_attack() and not broken[0]
+        can_counter = self._can_counter_attack() and not broken[1]
+        attacker_follow_up = can_attack and self._can_perform_follow_up(attacker, defender)
+        self.profiles = (
+            self.compile_profile(attacker, defender, can_attack, attacker_follow_up, self.tiles[1]),
+            self.compile_profile(defender, attacker, can_counter,
+                                 can_counter and not attacker_follow_up
+                                 and self._can_perform_follow_up(defender, attacker),
+                                 self.tiles[0])
+        )
+        if broken[0] or broken[1]:
+            # A weapon broken before the battle strikes no more, as after _break_weapon
+            self.profiles = tuple(BROKEN_PROFILE if broken[side] else profile
+                                  for side, profile in enumerate(self.profiles))
+        self.order = strike_order(*self.profiles)
+        
+        # Damage hooks of each side's skills, run on every hit it takes, and
+        # the chances among them that negate a hit
+        self.guards = ((), ())
+        self.negates = ((), ())
+        self.skills = ()
+        skills = (unit_skills(attacker), unit_skills(defender))
+        if skills[0] or skills[1]:
+            self.skills = tuple((side, skill) for side in (0, 1) for skill in skills[side]
+                                if skill.applies(self, side))
+            self._compile_skills()
     
-    def simulate_round(self):
+    @property
+    def attacker_profile(self):
+        """CombatProfile of the attacker striking the defender."""
+        return self.profiles[0]
+    
+    @property
+    def defender_profile(self):
+        """CombatProfile of the defender striking the attacker."""
+        return self.profiles[1]
+    
+    @property
+    def last_round(self):
+        """Log entries of the latest round, oldest first (only those still in the log)."""
+        count = min(self._logged - self._round_start, len(self.log))
+        return [self.log[index] for index in range(len(self.log) - count, len(self.log))]
+    
+    def compile_profile(self, striker, target, can_strike=True, follow_up=False, target_terrain=None):
         """
-        Simulate a full round of combat.
+        Compute the combat parameters of one character striking another.
+        
+        A character without a weapon cannot hit.
         
+        Args:
+            striker (Character): Striking character
+            target (Character): Targeted character
+            can_strike (bool): Whether the striker strikes at all
+            follow_up (bool): Whether the striker strikes twice each round
+            target_terrain (Terrain, optional): Tile of the target (defaults to
+                the battle's tile of the target)
+            
         Returns:
-            dict: Results of the combat round
+            CombatProfile: Combat parameters of the striker
         """
-        # Attacker attacks first
-        attacker_result = self._perform_attack(self.attacker, self.defender)
-        self.log.append(attacker_result)
+        if not striker.weapon:
+            return CombatProfile(0, 0, 0, 0, False, can_strike, follow_up)
+        
+        if target_terrain is None:
+            target_terrain = self._tile_of(target)
+        damage = self._calculate_damage(striker, target, target_terrain)
+        return CombatProfile(
+            self._calculate_hit_rate(striker, target, target_terrain),
+            min(100, self._calculate_crit_rate(striker, target)),
+            damage,
+            damage * 3,
+            striker.weapon.is_effective_against(target),
+            can_strike,
+            follow_up
+        )
+    
+    def _compile_skills(self):
+        """Apply the hooks of the skills that apply to the battle."""
+        profiles = list(self.profiles)
+        guards = ([], [])
+        negates = ([], [])
+        for side, skill in self.skills:
+            if skill.profile is not None:
+                profiles[side] = skill.profile(self, side, profiles[side])
+            if skill.negate is not None:
+                chance = skill.negate(self, side)
+                negates[side].append(chance)
+                guards[side].append(self._negate_guard(chance))
+            if skill.guard is not None:
+                guards[side].append(skill.guard(self, side))
+        self.profiles = tuple(profiles)
+        self.guards = (tuple(guards[0]), tuple(guards[1]))
+        self.negates = (tuple(negates[0]), tuple(negates[1]))
+        
+        # The order starts from the final profiles, then each skill reorders it
+        order = strike_order(*self.profiles)
+        for side, skill in self.skills:
+            if skill.order is not None:
+                order = skill.order(order, side)
+        self.order = order
+    
+    def _negate_guard(self, chance):
+        """Guard negating a hit at a percentage chance (only hits dealing damage roll)."""
+        rng = self.rng
         
-        # Check if defender is defeated
-        if self.defender.current_hp <= 0:
-            return {"victory": True, "victor": self.attacker.name, "log": self.log}
+        def guard(damage):
+            return 0 if damage and rng.randint(1, 100) <= chance else damage
         
-        # Determine if defender can counter-attack
-        can_counter = self._can_counter_attack()
+        return guard
+    
+    def _tile_of(self, character):
+        """Tile a character of the battle stands on."""
+        return self.tiles[1] if character is self.defender else self.tiles[0]
+    
+    def simulate_round(self):
+        """
+        Simulate a full round of combat.
         
-        if can_counter:
-            defender_result = self._perform_attack(self.defender, self.attacker)
-            self.log.append(defender_result)
-            
-            # Check if attacker is defeated
-            if self.attacker.current_hp <= 0:
-                return {"victory": True, "victor": self.defender.name, "log": self.log}
-        
-        # Handle follow-up attacks based on speed
-        if self._can_perform_follow_up(self.attacker, self.defender) and self.defender.current_hp > 0:
-            follow_up_result = self._perform_attack(self.attacker, self.defender)
-            self.log.append(follow_up_result)
-            
-            if self.defender.current_hp <= 0:
-                return {"victory": True, "victor": self.attacker.name, "log": self.log}
-                
-        elif self._can_perform_follow_up(self.defender, self.attacker) and can_counter and self.attacker.current_hp > 0:
-            follow_up_result = self._perform_attack(self.defender, self.attacker)
-            self.log.append(follow_up_result)
+        Returns:
+            dict: Results of the combat round
+        """
+        # Results of earlier rounds keep their own log
+        if self.log_limit == LOG_LAST_ROUND:
+            self.log = []
+        self._round_start = self._logged
+        
+        # Strikes in the order fixed when the battle was set up
+        combatants = self.combatants
+        for side in self.order:
+            self._perform_attack(side)
             
-            if self.attacker.current_hp <= 0:
-                return {"victory": True, "victor": self.defender.name, "log": self.log}
+            # Check if the target is defeated
+            if combatants[1 - side].current_hp <= 0:
+                return {"victory": True, "victor": combatants[side].name, "log": self.log}
         
         return {"victory": False, "log": self.log}
     
-    def _perform_attack(self, attacker, defender):
+    def _perform_attack(self, side):
         """
-        Perform a single attack.
+        Perform a single attack and log it at the battle's log level.
         
         Args:
-            attacker (Character): Attacking character
-            defender (Character): Defending character
-            
-        Returns:
-            dict: Result of the attack
-        """
-        # Calculate hit chance
-        hit_rate = self._calculate_hit_rate(attacker, defender)
-        hit_roll = random.randint(1, 100)
-        
-        if hit_roll > hit_rate:
-            return {
-                "attacker": attacker.name,
-                "defender": defender.name,
-                "hit": False,
-                "message": f"{attacker.name}'s attack missed!"
-            }
-        
-        # Calculate if attack is a critical hit
-        crit_rate = self._calculate_crit_rate(attacker, defender)
-        crit_roll = random.randint(1, 100)
-        is_crit = crit_roll <= crit_rate
-        
-        # Calculate damage
-        base_damage = attacker._calculate_damage(defender)
-        damage = base_damage * (3 if is_crit else 1)
-        
-        # Check for effectiveness
-        effectiveness = attacker.weapon.is_effective_against(defender)
-        
-        # Apply damage
-        defender.current_hp = max(0, defender.current_hp - damage)
-        
-        return {
-            "attacker": attacker.name,
-            "defender": defender.name,
-            "hit": True,
-            "critical": is_crit,
-            "effective": effectiveness,
-            "damage": damage,
-            "defender_hp_remaining": defender.current_hp,
-            "message": self._generate_attack_message(attacker, defender, damage, is_crit, effectiveness)
-        }
+            side (int): 0 for the attacker striking the defender, 1 for the
+                defender striking the attacker
+        """
+        profile = self.profiles[side]
+        if not profile.can_strike:
+            # The striker's weapon broke earlier in the round
+            return
+        attacker, defender = (self.attacker, self.defender) if side == 0 else (self.defender, self.attacker)
+        
+        hit = self.rng.randint(1, 100) <= profile.hit
+        is_crit = False
+        damage = 0
+        
+        if hit:
+            is_crit = self.rng.randint(1, 100) <= profile.crit
+            damage = profile.critical_damage if is_crit else profile.damage
+            for guard in self.guards[1 - side]:
+                damage = guard(damage)
+            defender.current_hp = max(0, defender.current_hp - damage)
+        
+        # Every strike wears the striker's own copy of its weapon
+        weapon = attacker.weapon
+        if isinstance(weapon, WeaponInstance) and not weapon.use():
+            self._break_weapon(side)
+        
+        if self.log_level == LOG_NONE:
+            return
+        
+        self._logged += 1
+        if self.log_level == LOG_COLUMNAR:
+            self.log.record(side, hit, is_crit, profile.effective, damage, defender.current_hp)
+            return
+        
+        event = AttackEvent(attacker.name, defender.name, hit, is_crit, profile.effective,
+                            damage, defender.current_hp)
+        self.log.append(event if self.log_level == LOG_COMPACT else AttackLogEntry(event))
+    
+    def _break_weapon(self, side):
+        """
+        Unequip a broken weapon; its wielder strikes no more in this battle.
+        
+        Args:
+            side (int): 0 for the attacker, 1 for the defender
+        """
+        character = self.attacker if side == 0 else self.defender
+        self.broken_weapons.append((character.name, character.weapon))
+        character.weapon = None
+        
+        profiles = list(self.profiles)
+        profiles[side] = BROKEN_PROFILE
+        self.profiles = tuple(profiles)
+    
+    @staticmethod
+    def _has_broken_weapon(character):
+        """Whether a character's weapon has no uses left."""
+        weapon = character.weapon
+        return isinstance(weapon, WeaponInstance) and weapon.is_broken
     
     def _generate_attack_message(self, attacker, defender, damage, is_crit, is_effective):
         """
@@ -127,27 +454,17 @@ class Battle:
         Returns:
             str: Message describing the attack
         """
-        message = f"{attacker.name}"
-        
-        if is_effective:
-            message += " attacks with effectiveness!"
-        
-        if is_crit:
-            message += " lands a critical hit!"
-        else:
-            message += " attacks!"
-            
-        message += f" Deals {damage} damage to {defender.name}!"
-        
-        return message
+        return _attack_message(attacker.name, defender.name, damage, is_crit, is_effective)
     
-    def _calculate_hit_rate(self, attacker, defender):
+    def _calculate_hit_rate(self, attacker, defender, defender_terrain=None):
         """
         Calculate hit rate.
         
         Args:
             attacker (Character): Attacking character
             defender (Character): Defending character
+            defender_terrain (Terrain, optional): Tile of the defender
+                (defaults to the battle's tile of the defender)
             
         Returns:
             int: Hit rate percentage
@@ -160,10 +477,8 @@ class Battle:
         
         avoid = defender.stats.get("spd", 0) * 2 + defender.stats.get("lck", 0)
         
-        # Apply terrain effects if any
-        terrain_avoid = 0
-        if self.terrain:
-            terrain_avoid = self.terrain.get("avoid", 0)
+        # Apply the avoid bonus of the defender's tile
+        terrain_avoid = (defender_terrain or self._tile_of(defender)).avoid
         
         # Apply weapon triangle effects
         if attacker.weapon and defender.weapon:
@@ -175,6 +490,36 @@ class Battle:
         final_hit_rate = min(100, max(0, hit - avoid - terrain_avoid))
         return final_hit_rate
     
+    def _calculate_damage(self, attacker, defender, defender_terrain=None):
+        """
+        Calculate the damage of a normal hit, with the defender's terrain bonuses.
+        
+        Args:
+            attacker (Character): Attacking character
+            defender (Character): Defending character
+            defender_terrain (Terrain, optional): Tile of the defender
+                (defaults to the battle's tile of the defender)
+            
+        Returns:
+            int: Damage dealt
+        """
+        terrain = defender_terrain or self._tile_of(defender)
+        physical = attacker.weapon.is_physical()
+        bonus = terrain.defense if physical else terrain.resistance
+        if not bonus:
+            return attacker._calculate_damage(defender)
+        
+        # Same formula as Character._calculate_damage, with the bonus added
+        if physical:
+            atk = attacker.stats.get("str", 0) + attacker.weapon.might
+            defense = defender.stats.get("def", 0) + bonus
+        else:
+            atk = attacker.stats.get("mag", 0) + attacker.weapon.might
+            defense = defender.stats.get("res", 0) + bonus
+        
+        damage = max(0, atk - defense)
+        return int(damage * attacker.weapon.get_effectiveness_multiplier(defender))
+    
     def _calculate_crit_rate(self, attacker, defender):
         """
         Calculate critical hit rate.
@@ -196,23 +541,26 @@ class Battle:
         final_crit_rate = max(0, crit - crit_avoid)
         return final_crit_rate
     
+    def _can_attack(self):
+        """
+        Determine if attacker can strike from the battle's distance.
+        
+        Returns:
+            bool: True if the attacker's weapon reaches the defender
+        """
+        low, high = self.attacker.weapon.range if self.attacker.weapon else UNARMED_RANGE
+        return low <= self.distance <= high
+    
     def _can_counter_attack(self):
         """
         Determine if defender can counter-attack.
         
+        Both weapons must reach the battle's distance.
+        
         Returns:
             bool: True if defender can counter-attack
         """
-        if not self.defender.weapon:
-            return False
-        
-        attacker_range = self.attacker.weapon.range if self.attacker.weapon else (1, 1)
-        defender_range = self.defender.weapon.range if self.defender.weapon else (1, 1)
-        
-        # Assume 1 tile distance for simplicity
-        combat_range = 1
-        
-        return (defender_range[0] <= combat_range <= defender_range[1])
+        return WEAPON_RANGES.can_counter(self.attacker.weapon, self.defender.weapon, self.distance)
     
     def _can_perform_follow_up(self, character, opponent):
         """
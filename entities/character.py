@@ -3,11 +3,12 @@ Character class for Fire Emblem Combat Simulator.
 """
 
 from fe_combat_sim.entities.character_class import CharacterClass, get_class
+from fe_combat_sim.entities.weapon import Weapon
 
 class Character:
     """Base class for all characters in the game."""
     
-    def __init__(self, name, character_class, stats, weapon=None):
+    def __init__(self, name, character_class, stats, weapon=None, skills=None):
         """
         Initialize a character.
         
@@ -15,7 +16,10 @@ class Character:
             name (str): Character name
             character_class (str or CharacterClass): Character class
             stats (dict): Character statistics
-            weapon (Weapon, optional): Equipped weapon
+            weapon (Weapon, optional): Equipped weapon; a shared definition is
+                replaced by a WeaponInstance of the character's own
+            skills (list, optional): Skills of the character, as names of
+                registered skills or Skill objects
         """
         self.name = name
         
@@ -30,8 +34,19 @@ class Character:
             
         self.stats = stats
         self.weapon = weapon
+        self.skills = tuple(skills or ())
         self.current_hp = stats.get("hp", 0)
     
+    @property
+    def weapon(self):
+        """Equipped WeaponInstance, or None."""
+        return self._weapon
+    
+    @weapon.setter
+    def weapon(self, weapon):
+        # Durability belongs to the unit, never to the shared definition
+        self._weapon = weapon.instance() if isinstance(weapon, Weapon) else weapon
+    
     def attack(self, target):
         """
         Attack another character.
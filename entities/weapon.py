@@ -1,14 +1,25 @@
 """
 Weapon class for Fire Emblem Combat Simulator.
+A Weapon holds the stats of a kind of weapon and is shared by every unit that
+carries one; each unit carries its own WeaponInstance, which tracks the uses
+left on its copy.
 """
 
 class Weapon:
-    """Base class for all weapons in the game."""
+    """
+    Base class for all weapons in the game.
+    
+    A weapon definition is shared; equipping it gives the character a
+    WeaponInstance of its own, at full durability. Battles only wear instances;
+    a definition used on its own still counts its uses with use() and
+    current_uses, but that count never carries over to the units equipped
+    with it.
+    """
     
     WEAPON_TYPES = ["Sword", "Lance", "Axe", "Bow", "Tome", "Staff"]
     
     def __init__(self, name, weapon_type, might, hit, crit=0, range=(1, 1), uses=None, 
-                 effective_against=None):
+                 effective_against=None, skills=None):
         """
         Initialize a weapon.
         
@@ -21,6 +32,8 @@ class Weapon:
             range (tuple, optional): Range of weapon (min, max)
             uses (int, optional): Number of uses before breaking
             effective_against (list, optional): List of class types the weapon is effective against
+            skills (list, optional): Skills granted to its wielder (e.g. "Brave"),
+                as names of registered skills or Skill objects
         """
         if weapon_type not in self.WEAPON_TYPES:
             raise ValueError(f"Invalid weapon type. Must be one of {self.WEAPON_TYPES}")
@@ -34,6 +47,44 @@ class Weapon:
         self.uses = uses
         self.current_uses = uses
         self.effective_against = effective_against or []
+        self.skills = tuple(skills or ())
+    
+    @property
+    def definition(self):
+        """The shared weapon definition (the weapon itself)."""
+        return self
+    
+    @property
+    def is_broken(self):
+        """Whether the weapon has no uses left."""
+        return self.current_uses is not None and self.current_uses <= 0
+    
+    def use(self):
+        """
+        Use the weapon once.
+        
+        Returns:
+            bool: True if weapon can still be used, False if broken
+        """
+        if self.current_uses is None:
+            return True
+        
+        if self.current_uses > 0:
+            self.current_uses -= 1
+            
+        return self.current_uses > 0
+    
+    def instance(self, current_uses=None):
+        """
+        Create a per-unit copy of the weapon.
+        
+        Args:
+            current_uses (int, optional): Uses left (defaults to full durability)
+            
+        Returns:
+            WeaponInstance: New instance sharing this weapon's stats
+        """
+        return WeaponInstance(self, current_uses)
     
     def is_physical(self):
         """
@@ -74,6 +125,68 @@ class Weapon:
             float: Damage multiplier (typically 2.0 or 3.0 for effectiveness)
         """
         return 3.0 if self.is_effective_against(character) else 1.0
+
+    @property
+    def range_mask(self):
+        """Bitmask of the distances the weapon reaches (bit d set for distance d)."""
+        low, high = self.range
+        return ((1 << (high + 1)) - 1) & ~((1 << low) - 1)
+
+    def reaches(self, distance):
+        """
+        Check if the weapon can strike from a distance.
+
+        Args:
+            distance (int): Distance to the target, in tiles
+
+        Returns:
+            bool: True if the distance is within the weapon's range
+        """
+        return self.range[0] <= distance <= self.range[1]
+
+    def __str__(self):
+        """String representation of the weapon."""
+        return self.name
+        
+    def __repr__(self):
+        """Detailed representation of the weapon."""
+        effective_str = ", ".join(self.effective_against) if self.effective_against else "None"
+        return (f"Weapon(name='{self.name}', type='{self.weapon_type}', might={self.might}, "
+                f"hit={self.hit}, crit={self.crit}, range={self.range}, uses={self.uses}, "
+                f"effective_against=[{effective_str}])")
+
+
+class WeaponInstance:
+    """
+    One unit's copy of a weapon: the shared definition plus the uses left.
+    
+    Every stat and rule of the definition (might, range, is_physical...) can be
+    read from the instance directly.
+    """
+    __slots__ = ("definition", "current_uses")
+    
+    def __init__(self, definition, current_uses=None):
+        """
+        Initialize a weapon instance.
+        
+        Args:
+            definition (Weapon): Shared weapon definition
+            current_uses (int, optional): Uses left (defaults to the
+                definition's uses; None for an unbreakable weapon)
+        """
+        self.definition = definition
+        self.current_uses = definition.uses if current_uses is None else current_uses
+    
+    def __getattr__(self, name):
+        # Only reached for names the instance does not hold itself
+        if name.startswith("__") or name in WeaponInstance.__slots__:
+            raise AttributeError(name)
+        return getattr(self.definition, name)
+    
+    @property
+    def is_broken(self):
+        """Whether the weapon has no uses left."""
+        return self.current_uses is not None and self.current_uses <= 0
     
     def use(self):
         """
@@ -82,24 +195,33 @@ class Weapon:
         Returns:
             bool: True if weapon can still be used, False if broken
         """
-        if self.uses is None:
+        if self.current_uses is None:
             return True
         
         if self.current_uses > 0:
             self.current_uses -= 1
             
         return self.current_uses > 0
+    
+    def instance(self, current_uses=None):
+        """
+        Create another copy of the same weapon.
         
+        Args:
+            current_uses (int, optional): Uses left (defaults to full durability)
+            
+        Returns:
+            WeaponInstance: New instance sharing the definition
+        """
+        return WeaponInstance(self.definition, current_uses)
+    
     def __str__(self):
         """String representation of the weapon."""
-        return self.name
-        
+        return self.definition.name
+    
     def __repr__(self):
-        """Detailed representation of the weapon."""
-        effective_str = ", ".join(self.effective_against) if self.effective_against else "None"
-        return (f"Weapon(name='{self.name}', type='{self.weapon_type}', might={self.might}, "
-                f"hit={self.hit}, crit={self.crit}, range={self.range}, uses={self.uses}, "
-                f"effective_against=[{effective_str}])")
+        """Detailed representation of the weapon instance."""
+        return f"WeaponInstance({self.definition!r}, current_uses={self.current_uses})"
 
 
 # Define some common weapon effectiveness combinations
@@ -3,4 +3,12 @@ Combat modules for Fire Emblem Combat Simulator.
 Includes battle mechanics and calculations.
 """
 
-from fe_combat_sim.combat.battle import Battle
+from fe_combat_sim.combat.battle import (
+    Battle, CombatProfile, AttackEvent, AttackLogEntry,
+    LOG_NONE, LOG_COMPACT, LOG_COLUMNAR, LOG_FULL, LOG_LAST_ROUND
+)
+from fe_combat_sim.combat.dice import CounterRandom, RecordingRandom, ReplayRandom
+from fe_combat_sim.combat.event_log import EventLog
+from fe_combat_sim.combat.snapshot import CombatSnapshot
+from fe_combat_sim.combat.skills import Skill, SKILLS, get_skill, register_skill
+from fe_combat_sim.combat.replay import Replay, ReplayReader, ReplayWriter, record_battle
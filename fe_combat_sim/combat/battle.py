@@ -3,6 +3,13 @@ Battle system for Fire Emblem Combat Simulator.
 """
 
 # Import from old location and fix imports for the package structure
-from combat.battle import Battle
+from combat.battle import (
+    Battle, CombatProfile, AttackEvent, AttackLogEntry,
+    LOG_NONE, LOG_COMPACT, LOG_COLUMNAR, LOG_FULL, LOG_LEVELS, LOG_LAST_ROUND,
+    strike_order
+)
 # Update imports to use package structure
 Battle.__module__ = 'fe_combat_sim.combat.battle'
+CombatProfile.__module__ = 'fe_combat_sim.combat.battle'
+AttackEvent.__module__ = 'fe_combat_sim.combat.battle'
+AttackLogEntry.__module__ = 'fe_combat_sim.combat.battle'
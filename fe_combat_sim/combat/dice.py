@@ -0,0 +1,129 @@
+"""
+Random sources for Fire Emblem Combat Simulator.
+Anything with a randint method can roll the dice of a battle; these sources add
+recording, exact replay, and counter-based streams whose rolls can be computed
+directly from (seed, fight, roll index).
+"""
+
+_MASK = (1 << 64) - 1
+_GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+def _mix(value):
+    """SplitMix64 finalizer: a bijective scramble of a 64-bit integer."""
+    value = (value + _GOLDEN_GAMMA) & _MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK
+    return value ^ (value >> 31)
+
+
+class RecordingRandom:
+    """Random source that records every roll drawn from another source."""
+
+    def __init__(self, rng):
+        """
+        Initialize a recording source.
+
+        Args:
+            rng: Source of randint, such as the random module or a random.Random
+        """
+        self.rng = rng
+        self.rolls = []
+
+    def randint(self, a, b):
+        """
+        Draw an integer between a and b (inclusive) and record it.
+
+        Args:
+            a (int): Lowest value
+            b (int): Highest value
+
+        Returns:
+            int: Drawn value
+        """
+        roll = self.rng.randint(a, b)
+        self.rolls.append(roll)
+        return roll
+
+
+class ReplayRandom:
+    """Random source returning recorded rolls, in order."""
+
+    def __init__(self, rolls):
+        """
+        Initialize a replay source.
+
+        Args:
+            rolls (list): Rolls to return, e.g. RecordingRandom.rolls
+        """
+        self.rolls = list(rolls)
+        self.position = 0
+
+    def randint(self, a, b):
+        """
+        Return the next recorded roll.
+
+        Args:
+            a (int): Lowest value
+            b (int): Highest value
+
+        Returns:
+            int: Recorded value
+        """
+        if self.position >= len(self.rolls):
+            raise ValueError("No recorded rolls left to replay")
+
+        roll = self.rolls[self.position]
+        if not a <= roll <= b:
+            raise ValueError(f"Recorded roll {roll} is outside [{a}, {b}]")
+        self.position += 1
+        return roll
+
+
+class CounterRandom:
+    """
+    Counter-based random source.
+
+    Roll i of fight k is a hash of (seed, k, i), so any fight of a long run can
+    be regenerated directly, without drawing the rolls of the fights before it.
+    """
+
+    def __init__(self, seed, fight=0):
+        """
+        Initialize a counter-based source.
+
+        Args:
+            seed (int): Seed of the run
+            fight (int): Index of the fight within the run
+        """
+        self.seed = seed
+        self.fight = fight
+        self.counter = 0
+        self._key = _mix((_mix(seed & _MASK) + fight) & _MASK)
+
+    def for_fight(self, fight):
+        """
+        Get the source of another fight of the same run.
+
+        Args:
+            fight (int): Index of the fight
+
+        Returns:
+            CounterRandom: Source positioned at the first roll of the fight
+        """
+        return CounterRandom(self.seed, fight)
+
+    def randint(self, a, b):
+        """
+        Draw the next integer between a and b (inclusive).
+
+        Args:
+            a (int): Lowest value
+            b (int): Highest value
+
+        Returns:
+            int: Drawn value
+        """
+        value = _mix((self._key + self.counter) & _MASK)
+        self.counter += 1
+        return a + ((value * (b - a + 1)) >> 64)
@@ -0,0 +1,168 @@
+"""
+Columnar battle event logs for Fire Emblem Combat Simulator.
+Each attack is stored as one row of typed arrays instead of a dict, so the
+logs of many fights can be kept for auditing in a fraction of the memory.
+"""
+from array import array
+
+from fe_combat_sim.combat.battle import AttackEvent, AttackLogEntry
+
+# Columns of an event log, with their array typecodes
+EVENT_COLUMNS = (
+    ("fight", "I"),
+    ("actor", "b"),
+    ("hit", "b"),
+    ("critical", "b"),
+    ("effective", "b"),
+    ("damage", "h"),
+    ("defender_hp_remaining", "h"),
+)
+
+# Columns holding flags, stored as bytes
+FLAG_COLUMNS = ("hit", "critical", "effective")
+
+
+class EventLog:
+    """
+    Struct-of-arrays log of the attacks of one or more battles.
+
+    Row i of every column describes the i-th attack. The actor is 0 for the
+    attacker of the fight and 1 for its defender; names are stored once per
+    fight.
+    """
+
+    def __init__(self):
+        """Initialize an empty event log."""
+        self.columns = {name: array(typecode) for name, typecode in EVENT_COLUMNS}
+        self.fights = []
+
+    def start_fight(self, attacker_name, defender_name):
+        """
+        Start logging a new fight.
+
+        Args:
+            attacker_name (str): Name of the attacking character
+            defender_name (str): Name of the defending character
+
+        Returns:
+            int: Index of the fight
+        """
+        self.fights.append((attacker_name, defender_name))
+        return len(self.fights) - 1
+
+    def record(self, actor, hit, critical, effective, damage, defender_hp_remaining):
+        """
+        Append an attack of the current fight.
+
+        Args:
+            actor (int): 0 if the attacker struck, 1 if the defender did
+            hit (bool): Whether the attack hit
+            critical (bool): Whether the attack was a critical hit
+            effective (bool): Whether the weapon is effective against the target
+            damage (int): Damage dealt
+            defender_hp_remaining (int): Target's HP after the attack
+        """
+        columns = self.columns
+        columns["fight"].append(len(self.fights) - 1)
+        columns["actor"].append(actor)
+        columns["hit"].append(hit)
+        columns["critical"].append(critical)
+        columns["effective"].append(effective)
+        columns["damage"].append(damage)
+        columns["defender_hp_remaining"].append(defender_hp_remaining)
+
+    def event(self, index):
+        """
+        Get one attack as an AttackEvent.
+
+        Args:
+            index (int): Row of the attack
+
+        Returns:
+            AttackEvent: Attack, with the names of both characters
+        """
+        columns = self.columns
+        names = self.fights[columns["fight"][index]]
+        actor = columns["actor"][index]
+        return AttackEvent(
+            names[actor],
+            names[1 - actor],
+            bool(columns["hit"][index]),
+            bool(columns["critical"][index]),
+            bool(columns["effective"][index]),
+            columns["damage"][index],
+            columns["defender_hp_remaining"][index]
+        )
+
+    def fight_entries(self, fight):
+        """
+        Get the log entries of one fight, in the form of a full battle log.
+
+        Args:
+            fight (int): Index of the fight
+
+        Returns:
+            list: AttackLogEntry of each attack of the fight
+        """
+        return [self[index] for index, row_fight in enumerate(self.columns["fight"])
+                if row_fight == fight]
+
+    @property
+    def nbytes(self):
+        """Memory used by the columns, in bytes."""
+        return sum(column.itemsize * len(column) for column in self.columns.values())
+
+    def to_dataframe(self):
+        """
+        Convert the log to a pandas DataFrame, one row per attack.
+
+        The columns are read straight from the array buffers, and the names
+        are categorical, so the frame stays about as compact as the log.
+
+        Returns:
+            pandas.DataFrame: Fight, attack columns, and the names of the
+            striking and targeted characters as "attacker" and "defender"
+        """
+        import numpy as np
+        import pandas as pd
+
+        data = {}
+        for name, typecode in EVENT_COLUMNS:
+            column = self.columns[name]
+            # Older NumPy versions reject empty buffers
+            values = np.frombuffer(column, dtype=typecode) if len(column) else np.zeros(0, typecode)
+            data[name] = values.astype(bool) if name in FLAG_COLUMNS else values
+
+        names = np.array(self.fights, dtype=object).reshape(-1, 2)
+        strikers = names[data["fight"], data["actor"]]
+        targets = names[data["fight"], 1 - data["actor"]]
+
+        frame = pd.DataFrame(data)
+        frame.insert(2, "attacker", pd.Categorical(strikers))
+        frame.insert(3, "defender", pd.Categorical(targets))
+        return frame
+
+    def __len__(self):
+        """Number of attacks logged."""
+        return len(self.columns["fight"])
+
+    def __getitem__(self, index):
+        """
+        Get one attack in the form of a full battle log entry.
+
+        Args:
+            index (int): Row of the attack
+
+        Returns:
+            AttackLogEntry: Entry with the keys and message of a full log
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event log index out of range")
+        return AttackLogEntry(self.event(index))
+
+    def __iter__(self):
+        """Iterate over the attacks as full battle log entries."""
+        for index in range(len(self)):
+            yield AttackLogEntry(self.event(index))
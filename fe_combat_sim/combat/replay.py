@@ -0,0 +1,486 @@
+"""
+Binary battle replays for Fire Emblem Combat Simulator.
+A replay stores the combat snapshots of both participants, the dice rolls and
+the compact event stream of one fight. Replays are appended to a file one after
+the other, and an index written when the file is closed lets a memory-mapped
+reader jump straight to any of them.
+
+File layout (little-endian):
+    header   "FERP", version (u16), reserved (u16)
+    records  "RP", body length (u32), body: both units, the terrain (JSON
+             [name, avoid, defense, resistance, healing] of the attacker's and
+             the defender's tile), distance, seed, rounds, rolls and attacks
+    index    offset of every record (u64 each), index offset (u64),
+             record count (u64), "FEIX"
+"""
+import json
+import mmap
+import struct
+from collections import namedtuple
+from types import MappingProxyType
+
+from fe_combat_sim.combat.battle import AttackEvent, AttackLogEntry, Battle, LOG_COLUMNAR
+from fe_combat_sim.combat.dice import ReplayRandom
+from fe_combat_sim.combat.snapshot import CombatSnapshot
+from fe_combat_sim.data.terrain import Terrain
+from fe_combat_sim.entities.character import Character
+from fe_combat_sim.entities.character_class import CharacterClass
+from fe_combat_sim.entities.weapon import Weapon
+
+FILE_MAGIC = b"FERP"
+INDEX_MAGIC = b"FEIX"
+FORMAT_VERSION = 1
+
+_FILE_HEADER = struct.Struct("<4sHH")
+_RECORD_HEADER = struct.Struct("<2sI")
+RECORD_TAG = b"RP"
+_INDEX_FOOTER = struct.Struct("<QQ4s")
+_OFFSET = struct.Struct("<Q")
+_COUNT = struct.Struct("<I")
+_SMALL_COUNT = struct.Struct("<B")
+_STRING_LENGTH = struct.Struct("<H")
+# Seed flag (0: no seed, 1: non-negative, 2: negative) and magnitude
+_SEED = struct.Struct("<BQ")
+_SEED_LIMIT = 1 << 64
+_ROUNDS = struct.Struct("<H")
+_DISTANCE = struct.Struct("<B")
+_STAT = struct.Struct("<h")
+_WEAPON = struct.Struct("<hhhbbh")
+
+# One attack: actor, hit, critical, effective, damage, defender's remaining HP
+EVENT_RECORD = struct.Struct("<bbbbhh")
+
+
+class ReplayEvent(namedtuple("ReplayEvent", [
+        "actor", "hit", "critical", "effective", "damage", "defender_hp_remaining"])):
+    """
+    One attack of a replay.
+
+    Attributes:
+        actor (int): 0 if the attacker struck, 1 if the defender did
+        hit (bool): Whether the attack hit
+        critical (bool): Whether the attack was a critical hit
+        effective (bool): Whether the weapon is effective against the target
+        damage (int): Damage dealt
+        defender_hp_remaining (int): Target's HP after the attack
+    """
+    __slots__ = ()
+
+
+class Replay(namedtuple("Replay", ["attacker", "defender", "terrain", "distance", "seed",
+                                   "rolls", "rounds", "events"])):
+    """
+    Everything needed to show or re-run one fight.
+
+    Attributes:
+        attacker (CombatSnapshot): Attacker at the start of the fight
+        defender (CombatSnapshot): Defender at the start of the fight
+        terrain (tuple): Terrain of the attacker and of the defender
+        distance (int): Distance the fight took place at, in tiles
+        seed (int): Seed the fight was rolled with, or None
+        rolls (bytes): Every d100 roll drawn, in order
+        rounds (int): Number of rounds simulated
+        events (tuple): ReplayEvent of each attack
+    """
+    __slots__ = ()
+
+    def entries(self):
+        """
+        Render the fight in the form of a full battle log.
+
+        Returns:
+            list: AttackLogEntry of each attack, with the messages players saw
+        """
+        names = (self.attacker.name, self.defender.name)
+        return [
+            AttackLogEntry(AttackEvent(names[event.actor], names[1 - event.actor], event.hit,
+                                       event.critical, event.effective, event.damage,
+                                       event.defender_hp_remaining))
+            for event in self.events
+        ]
+
+    def rerun(self, **options):
+        """
+        Fight again from the snapshots with the recorded rolls.
+
+        Args:
+            **options: Extra Battle arguments, such as log_level
+
+        Returns:
+            Battle: Battle after the same rounds, on fresh characters
+        """
+        attacker, defender = (_character(snapshot) for snapshot in (self.attacker, self.defender))
+        battle = Battle(attacker, defender, self.terrain, rng=ReplayRandom(self.rolls),
+                        distance=self.distance, **options)
+        for _ in range(self.rounds):
+            if battle.simulate_round()["victory"]:
+                break
+        return battle
+
+
+def _character(snapshot):
+    """Build a fresh character from a snapshot."""
+    character = Character(snapshot.name, snapshot.character_class, dict(snapshot.stats),
+                          _copy_weapon(snapshot.weapon), snapshot.skills)
+    character.current_hp = snapshot.current_hp
+    return character
+
+
+def _copy_weapon(weapon):
+    if weapon is None:
+        return None
+    definition = Weapon(weapon.name, weapon.weapon_type, weapon.might, weapon.hit, weapon.crit,
+                        tuple(weapon.range), weapon.uses, list(weapon.effective_against),
+                        weapon.skills)
+    return definition.instance(weapon.current_uses)
+
+
+def record_battle(attacker, defender, terrain=None, seed=None, max_rounds=10, distance=None):
+    """
+    Fight a battle and record it as a replay.
+
+    The characters take damage as in any battle; the replay keeps their state
+    from before the fight.
+
+    Args:
+        attacker (Character): Attacking character
+        defender (Character): Defending character
+        terrain (optional): Terrain, as accepted by Battle
+        seed (int, optional): Seed of the battle's dice
+        max_rounds (int): Number of rounds after which the fight stops
+        distance (int, optional): Distance between the characters in tiles
+            (see Battle)
+
+    Returns:
+        Replay: Recording of the fight
+    """
+    snapshots = (CombatSnapshot.from_character(attacker), CombatSnapshot.from_character(defender))
+    battle = Battle(attacker, defender, terrain, log_level=LOG_COLUMNAR, seed=seed,
+                    record_rolls=True, distance=distance)
+
+    rounds = 0
+    while rounds < max_rounds:
+        rounds += 1
+        if battle.simulate_round()["victory"]:
+            break
+
+    columns = battle.log.columns
+    events = tuple(
+        ReplayEvent(actor, bool(hit), bool(critical), bool(effective), damage, remaining)
+        for actor, hit, critical, effective, damage, remaining in zip(
+            columns["actor"], columns["hit"], columns["critical"], columns["effective"],
+            columns["damage"], columns["defender_hp_remaining"])
+    )
+    return Replay(snapshots[0], snapshots[1], battle.tiles, battle.distance, seed,
+                  bytes(battle.rolls), rounds, events)
+
+
+def _pack_string(parts, text):
+    data = text.encode("utf-8")
+    parts.append(_STRING_LENGTH.pack(len(data)))
+    parts.append(data)
+
+
+def _pack_strings(parts, texts):
+    parts.append(_SMALL_COUNT.pack(len(texts)))
+    for text in texts:
+        _pack_string(parts, text)
+
+
+def _skill_names(skills):
+    return [skill if isinstance(skill, str) else skill.name for skill in skills]
+
+
+def _pack_unit(parts, snapshot):
+    character_class = snapshot.character_class or CharacterClass("")
+    _pack_string(parts, snapshot.name)
+    _pack_string(parts, character_class.name)
+    parts.append(_STAT.pack(character_class.movement))
+    _pack_strings(parts, list(character_class.class_types))
+
+    parts.append(_SMALL_COUNT.pack(len(snapshot.stats)))
+    for stat, value in snapshot.stats.items():
+        _pack_string(parts, stat)
+        parts.append(_STAT.pack(value))
+    parts.append(_STAT.pack(snapshot.current_hp))
+    _pack_strings(parts, _skill_names(snapshot.skills))
+
+    weapon = snapshot.weapon
+    parts.append(_SMALL_COUNT.pack(weapon is not None))
+    if weapon is not None:
+        _pack_string(parts, weapon.name)
+        _pack_string(parts, weapon.weapon_type)
+        parts.append(_WEAPON.pack(weapon.might, weapon.hit, weapon.crit, weapon.range[0],
+                                  weapon.range[1], -1 if weapon.uses is None else weapon.uses))
+        _pack_strings(parts, list(weapon.effective_against))
+        parts.append(_STAT.pack(-1 if weapon.current_uses is None else weapon.current_uses))
+        _pack_strings(parts, _skill_names(weapon.skills))
+
+
+def encode_replay(replay):
+    """
+    Encode a replay as the body of a record.
+
+    Args:
+        replay (Replay): Replay to encode
+
+    Returns:
+        bytes: Encoded replay
+    """
+    parts = []
+    _pack_unit(parts, replay.attacker)
+    _pack_unit(parts, replay.defender)
+    _pack_string(parts, json.dumps([list(tile) for tile in replay.terrain]))
+    parts.append(_DISTANCE.pack(replay.distance))
+
+    seed = replay.seed
+    if seed is not None and not isinstance(seed, int):
+        raise ValueError("Only integer seeds can be stored in a replay")
+    if seed is not None and abs(seed) >= _SEED_LIMIT:
+        raise ValueError("Only seeds of at most 64 bits can be stored in a replay")
+    if seed is None:
+        parts.append(_SEED.pack(0, 0))
+    else:
+        parts.append(_SEED.pack(1 if seed >= 0 else 2, abs(seed)))
+    parts.append(_ROUNDS.pack(replay.rounds))
+
+    parts.append(_COUNT.pack(len(replay.rolls)))
+    parts.append(bytes(replay.rolls))
+    parts.append(_COUNT.pack(len(replay.events)))
+    parts.extend(EVENT_RECORD.pack(*event) for event in replay.events)
+    return b"".join(parts)
+
+
+class _Cursor:
+    """Sequential reader of the fields of an encoded replay."""
+
+    def __init__(self, buffer, offset):
+        self.buffer = buffer
+        self.offset = offset
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.buffer, self.offset)
+        self.offset += layout.size
+        return values
+
+    def take(self, size):
+        data = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+    def string(self):
+        length, = self.unpack(_STRING_LENGTH)
+        return bytes(self.take(length)).decode("utf-8")
+
+    def strings(self):
+        count, = self.unpack(_SMALL_COUNT)
+        return [self.string() for _ in range(count)]
+
+    def unit(self):
+        name = self.string()
+        class_name = self.string()
+        movement, = self.unpack(_STAT)
+        character_class = CharacterClass(class_name, movement, self.strings())
+
+        stats = {}
+        for _ in range(self.unpack(_SMALL_COUNT)[0]):
+            stat = self.string()
+            stats[stat] = self.unpack(_STAT)[0]
+        current_hp, = self.unpack(_STAT)
+        skills = tuple(self.strings())
+
+        weapon = None
+        if self.unpack(_SMALL_COUNT)[0]:
+            weapon_name = self.string()
+            weapon_type = self.string()
+            might, hit, crit, low, high, uses = self.unpack(_WEAPON)
+            effective_against = self.strings()
+            current_uses, = self.unpack(_STAT)
+            weapon_skills = self.strings()
+            weapon = Weapon(weapon_name, weapon_type, might, hit, crit, (low, high),
+                            None if uses < 0 else uses, effective_against, weapon_skills)
+            weapon = weapon.instance(current_uses if current_uses >= 0 else None)
+
+        return CombatSnapshot(name, character_class, MappingProxyType(stats), weapon, current_hp,
+                              skills)
+
+
+def decode_replay(buffer, offset=0):
+    """
+    Decode a replay encoded by encode_replay.
+
+    Args:
+        buffer: Bytes-like object holding the encoded replay
+        offset (int): Position of the replay in the buffer
+
+    Returns:
+        Replay: Decoded replay
+    """
+    cursor = _Cursor(buffer, offset)
+    attacker = cursor.unit()
+    defender = cursor.unit()
+    tiles = json.loads(cursor.string())
+    if len(tiles) != 2 or any(len(tile) != len(Terrain._fields) for tile in tiles):
+        raise ValueError("Malformed replay terrain")
+    terrain = tuple(Terrain(*tile) for tile in tiles)
+    distance, = cursor.unpack(_DISTANCE)
+    seed_flag, seed = cursor.unpack(_SEED)
+    if seed_flag > 2:
+        raise ValueError("Malformed replay seed")
+    rounds, = cursor.unpack(_ROUNDS)
+
+    rolls = bytes(cursor.take(cursor.unpack(_COUNT)[0]))
+    count, = cursor.unpack(_COUNT)
+    events = tuple(
+        ReplayEvent(actor, bool(hit), bool(critical), bool(effective), damage, remaining)
+        for actor, hit, critical, effective, damage, remaining
+        in EVENT_RECORD.iter_unpack(cursor.take(count * EVENT_RECORD.size))
+    )
+    seed = (None, seed, -seed)[seed_flag]
+    return Replay(attacker, defender, terrain, distance, seed, rolls,
+                  rounds, events)
+
+
+class ReplayWriter:
+    """Streaming writer of a replay file."""
+
+    def __init__(self, path):
+        """
+        Create a replay file.
+
+        Args:
+            path (str): Path of the file, replaced if it exists
+        """
+        self._file = open(path, "wb")
+        self._file.write(_FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, 0))
+        self._offsets = []
+
+    def write(self, replay):
+        """
+        Append a replay to the file.
+
+        Args:
+            replay (Replay): Replay to append
+
+        Returns:
+            int: Index of the replay in the file
+        """
+        body = encode_replay(replay)
+        self._offsets.append(self._file.tell())
+        self._file.write(_RECORD_HEADER.pack(RECORD_TAG, len(body)))
+        self._file.write(body)
+        return len(self._offsets) - 1
+
+    def close(self):
+        """Write the index of the replays and close the file."""
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        self._file.write(b"".join(_OFFSET.pack(offset) for offset in self._offsets))
+        self._file.write(_INDEX_FOOTER.pack(index_offset, len(self._offsets), INDEX_MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _IndexView:
+    """Record offsets read on demand from the index at the end of a file."""
+
+    def __init__(self, buffer, offset, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return _OFFSET.unpack_from(self.buffer, self.offset + index * _OFFSET.size)[0]
+
+
+class ReplayReader:
+    """
+    Memory-mapped reader of a replay file.
+
+    Replays are only decoded when accessed. A file whose writer was not closed
+    has no index, so its records are located by walking their length prefixes.
+    """
+
+    def __init__(self, path):
+        """
+        Open a replay file.
+
+        Args:
+            path (str): Path of the file
+        """
+        with open(path, "rb") as file:
+            if not file.seek(0, 2):
+                raise ValueError("Empty replay file")
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < _FILE_HEADER.size:
+            raise ValueError("Not a replay file")
+        magic, version, _ = _FILE_HEADER.unpack_from(self._map, 0)
+        if magic != FILE_MAGIC:
+            raise ValueError("Not a replay file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported replay format version {version}")
+
+        self._offsets = self._read_index()
+
+    def _read_index(self):
+        """Get the offset of every record, from the index or by walking the records."""
+        size = len(self._map)
+        if size >= _FILE_HEADER.size + _INDEX_FOOTER.size:
+            index_offset, count, magic = _INDEX_FOOTER.unpack_from(self._map, size - _INDEX_FOOTER.size)
+            if magic == INDEX_MAGIC and index_offset + count * _OFFSET.size + _INDEX_FOOTER.size == size:
+                return _IndexView(self._map, index_offset, count)
+
+        offsets = []
+        offset = _FILE_HEADER.size
+        while offset + _RECORD_HEADER.size <= size:
+            tag, length = _RECORD_HEADER.unpack_from(self._map, offset)
+            if tag != RECORD_TAG or offset + _RECORD_HEADER.size + length > size:
+                break
+            offsets.append(offset)
+            offset += _RECORD_HEADER.size + length
+        return offsets
+
+    def __len__(self):
+        """Number of replays in the file."""
+        return len(self._offsets)
+
+    def __getitem__(self, index):
+        """
+        Decode one replay.
+
+        Args:
+            index (int): Index of the replay
+
+        Returns:
+            Replay: Decoded replay
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("replay index out of range")
+        return decode_replay(self._map, self._offsets[index] + _RECORD_HEADER.size)
+
+    def __iter__(self):
+        """Iterate over the replays in file order."""
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+        """Unmap the file."""
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
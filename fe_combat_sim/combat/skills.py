@@ -0,0 +1,173 @@
+"""
+Combat skills for Fire Emblem Combat Simulator.
+A skill is a condition and hooks into the combat pipeline: one changing the
+owner's combat profile, one changing the strike order of a round, and one
+guarding every strike the owner takes, either as a chance to negate the
+damage of each hit (which predictions can model) or as any function of the
+damage (which only Battle runs). Battle checks the
+skills of both characters (and of their weapons) once, when the fight is set
+up, and keeps only the hooks of the skills that apply; a fight without
+skills runs no hook at all.
+
+Sides are numbered as in Battle: 0 for the attacker, 1 for the defender.
+"""
+
+
+class Skill:
+    """A combat skill and the hooks it adds to the fights it applies to."""
+
+    def __init__(self, name, description="", activates=None, profile=None, order=None, guard=None,
+                 negate=None):
+        """
+        Initialize a skill.
+
+        Args:
+            name (str): Skill name
+            description (str): What the skill does
+            activates (callable, optional): activates(battle, side) tells if
+                the skill applies to a fight; always by default
+            profile (callable, optional): profile(battle, side, profile)
+                returns the owner's CombatProfile with the skill applied
+            order (callable, optional): order(order, side) returns the strike
+                order of a round with the skill applied
+            guard (callable, optional): guard(battle, side) returns a function
+                called with the damage of every hit the owner takes, and
+                returning the damage actually dealt
+            negate (callable, optional): negate(battle, side) returns the
+                percentage chance that the owner negates the damage of each hit
+                it takes; unlike guard, predictions take it into account
+        """
+        self.name = name
+        self.description = description
+        self.activates = activates
+        self.profile = profile
+        self.order = order
+        self.guard = guard
+        self.negate = negate
+
+    def applies(self, battle, side):
+        """
+        Check if the skill applies to a fight.
+
+        Args:
+            battle (Battle): Fight being set up
+            side (int): Side of the skill's owner
+
+        Returns:
+            bool: True if the skill's hooks are part of the fight
+        """
+        return self.activates is None or self.activates(battle, side)
+
+    def __str__(self):
+        """String representation of the skill."""
+        return self.name
+
+    def __repr__(self):
+        """Detailed representation of the skill."""
+        return f"Skill(name='{self.name}')"
+
+
+def at_half_hp(battle, side):
+    """
+    Check if a side of a fight starts it at half HP or less.
+
+    Args:
+        battle (Battle): Fight being set up
+        side (int): Side to check
+
+    Returns:
+        bool: True if the side's HP is at most half its max HP
+    """
+    character = battle.combatants[side]
+    return character.current_hp * 2 <= character.stats.get("hp", 0)
+
+
+def _vantage_activates(battle, side):
+    return side == 1 and at_half_hp(battle, side)
+
+
+def _vantage_order(order, side):
+    # The owner's first strike moves ahead of everything else
+    if side not in order:
+        return order
+    index = order.index(side)
+    return (side,) + order[:index] + order[index + 1:]
+
+
+def _brave_order(order, side):
+    return tuple(strike for striker in order
+                 for strike in ((striker, striker) if striker == side else (striker,)))
+
+
+def _wrath_profile(battle, side, profile):
+    return profile._replace(crit=min(100, profile.crit + 50)) if profile.damage else profile
+
+
+def _pavise_activates(battle, side):
+    weapon = battle.combatants[1 - side].weapon
+    return weapon is not None and weapon.is_physical()
+
+
+def _pavise_negate(battle, side):
+    return battle.combatants[side].stats.get("skl", 0)
+
+
+VANTAGE = Skill("Vantage", "Strikes first when attacked at half HP or less",
+                activates=_vantage_activates, order=_vantage_order)
+BRAVE = Skill("Brave", "Strikes twice in a row each time it strikes", order=_brave_order)
+WRATH = Skill("Wrath", "Critical rate +50 when fighting at half HP or less",
+              activates=at_half_hp, profile=_wrath_profile)
+PAVISE = Skill("Pavise", "Skill% chance to negate the damage of a physical hit",
+               activates=_pavise_activates, negate=_pavise_negate)
+
+# Skills that characters and weapons can name
+SKILLS = {skill.name: skill for skill in (VANTAGE, BRAVE, WRATH, PAVISE)}
+
+
+def register_skill(skill):
+    """
+    Add a skill to the registry, so characters and weapons can name it.
+
+    Args:
+        skill (Skill): Skill to register
+
+    Returns:
+        Skill: The registered skill
+    """
+    SKILLS[skill.name] = skill
+    return skill
+
+
+def get_skill(name):
+    """
+    Get a registered skill by name.
+
+    Args:
+        name (str): Name of the skill
+
+    Returns:
+        Skill: The skill
+    """
+    skill = SKILLS.get(name)
+    if skill is None:
+        raise ValueError(f"Skill '{name}' not found")
+    return skill
+
+
+def unit_skills(character):
+    """
+    Get the skills a character brings to a fight: its own and its weapon's.
+
+    Args:
+        character (Character): Character to check
+
+    Returns:
+        tuple: Skill objects, resolved from names through the registry
+    """
+    skills = tuple(getattr(character, "skills", ()))
+    weapon_skills = getattr(character.weapon, "skills", None)
+    if weapon_skills:
+        skills += tuple(weapon_skills)
+    if not skills:
+        return skills
+    return tuple(get_skill(skill) if isinstance(skill, str) else skill for skill in skills)
@@ -0,0 +1,56 @@
+"""
+Immutable combat snapshots for Fire Emblem Combat Simulator.
+A snapshot copies the combat-relevant state of a character once, so predictions
+can run on it without ever touching the original object.
+"""
+import copy
+from collections import namedtuple
+from types import MappingProxyType
+
+from fe_combat_sim.entities.character import Character
+
+
+class CombatSnapshot(namedtuple("CombatSnapshot", [
+        "name", "character_class", "stats", "weapon", "current_hp", "skills"],
+        defaults=((),))):
+    """
+    Read-only copy of a character's combat-relevant state.
+
+    A snapshot can stand in for a Character wherever combat stats are only read,
+    such as the calculation methods of Battle.
+
+    Attributes:
+        name (str): Character name
+        character_class (CharacterClass): Character class
+        stats (mappingproxy): Read-only copy of the character's stats
+        weapon (Weapon): Private copy of the equipped weapon, or None
+        current_hp (int): HP at the time of the snapshot
+        skills (tuple): Skills of the character (names or Skill objects)
+    """
+    __slots__ = ()
+
+    # Same damage formula as the character the snapshot was taken from
+    _calculate_damage = Character._calculate_damage
+
+    @classmethod
+    def from_character(cls, character):
+        """
+        Take a snapshot of a character.
+
+        Args:
+            character (Character or CombatSnapshot): Character to copy
+
+        Returns:
+            CombatSnapshot: Snapshot of the character's current state
+        """
+        if isinstance(character, cls):
+            return character
+
+        return cls(
+            character.name,
+            character.character_class,
+            MappingProxyType(dict(character.stats)),
+            copy.copy(character.weapon),
+            character.current_hp,
+            tuple(getattr(character, "skills", ()))
+        )
@@ -9,6 +9,10 @@ from fe_combat_sim.entities.character_class import (
     CharacterClass, INFANTRY, KNIGHT, CAVALIER, 
     PEGASUS_KNIGHT, WYVERN_RIDER, MAGE, LORD
 )
+from fe_combat_sim.data.terrain import (
+    Terrain, TERRAIN, TERRAIN_TYPES, PLAINS, get_terrain, resolve_terrain
+)
+from fe_combat_sim.data.ranges import RangeTable, attack_mask, reach_mask
 
 # Predefined weapons
 WEAPONS = {
@@ -65,6 +69,9 @@ WEAPONS = {
     "Physic": Weapon("Physic", "Staff", might=0, hit=100, crit=0, range=(1, 10), uses=15),
 }
 
+# Counter eligibility of every pair of predefined weapons at every distance
+WEAPON_RANGES = RangeTable(WEAPONS.values())
+
 # Character templates with reasonable stat distributions
 CHARACTER_TEMPLATES = {
     "Lord": {
@@ -0,0 +1,62 @@
+"""
+Movement cost tables for Fire Emblem Combat Simulator.
+A class moves as one of a few movement types, read from its class types, and
+each movement type pays its own cost to enter each tile type.
+"""
+from fe_combat_sim.data.terrain import Terrain
+
+MOVEMENT_TYPES = ("Infantry", "Armored", "Mounted", "Flying")
+
+# Cost of a tile a movement type cannot enter
+IMPASSABLE = None
+
+# Cost of entering each tile type, per movement type
+MOVEMENT_COSTS = {
+    "Infantry": {"Plains": 1, "Forest": 2, "Mountain": 4, "Fort": 2, "River": 5, "Desert": 2},
+    "Armored": {"Plains": 1, "Forest": 2, "Mountain": IMPASSABLE, "Fort": 1, "River": IMPASSABLE,
+                "Desert": 3},
+    "Mounted": {"Plains": 1, "Forest": 3, "Mountain": IMPASSABLE, "Fort": 1, "River": IMPASSABLE,
+                "Desert": 4},
+    # Fliers ignore terrain
+    "Flying": {"Plains": 1, "Forest": 1, "Mountain": 1, "Fort": 1, "River": 1, "Desert": 1},
+}
+
+
+def movement_type(character_class):
+    """
+    Get the movement type of a class from its class types.
+
+    Args:
+        character_class (CharacterClass): Class to check, or None
+
+    Returns:
+        str: One of MOVEMENT_TYPES (fliers first, so a wyvern flies)
+    """
+    if character_class is None:
+        return "Infantry"
+    if character_class.is_type("Flying"):
+        return "Flying"
+    if character_class.is_type("Armored"):
+        return "Armored"
+    if character_class.is_type("Horseback") or character_class.is_type("Mounted"):
+        return "Mounted"
+    return "Infantry"
+
+
+def movement_cost(terrain, move_type):
+    """
+    Get the cost for a movement type to enter a tile.
+
+    Args:
+        terrain (Terrain or str): Tile type or its name
+        move_type (str): Movement type
+
+    Returns:
+        int: Movement points spent, or IMPASSABLE; tile types outside the
+        table (custom tiles) cost 1
+    """
+    name = terrain.name if isinstance(terrain, Terrain) else terrain
+    costs = MOVEMENT_COSTS.get(move_type)
+    if costs is None:
+        raise ValueError(f"Invalid movement type. Must be one of {MOVEMENT_TYPES}")
+    return costs.get(name, 1)
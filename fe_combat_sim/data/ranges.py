@@ -0,0 +1,127 @@
+"""
+Weapon range tables for Fire Emblem Combat Simulator.
+Ranges are stored as bitmasks, bit d being set when a weapon reaches distance
+d, so whether two weapons can trade blows from a distance is a single AND of
+precomputed masks.
+"""
+
+# Range of an attacker without a weapon, which still engages at 1 tile
+UNARMED_RANGE = (1, 1)
+UNARMED_MASK = 1 << 1
+
+
+def reach_mask(weapon):
+    """
+    Get the distances a weapon can counter from.
+
+    Args:
+        weapon (Weapon): Weapon, or None for no weapon
+
+    Returns:
+        int: Range bitmask of the weapon (0 without a weapon)
+    """
+    return weapon.range_mask if weapon is not None else 0
+
+
+def attack_mask(weapon):
+    """
+    Get the distances an attack can be made from.
+
+    Args:
+        weapon (Weapon): Weapon of the attacker, or None for no weapon
+
+    Returns:
+        int: Range bitmask of the weapon (UNARMED_MASK without a weapon)
+    """
+    return weapon.range_mask if weapon is not None else UNARMED_MASK
+
+
+class RangeTable:
+    """
+    Counter eligibility of every pair of weapons of a catalog at every distance.
+
+    counters[i][j] has bit d set when weapon j can counter an attack made with
+    weapon i from distance d, i.e. when both weapons reach d. Weapons outside
+    the catalog are looked up from their own range.
+    """
+
+    def __init__(self, weapons):
+        """
+        Build the table of a weapon catalog.
+
+        Args:
+            weapons (iterable): Weapons of the catalog
+        """
+        self.weapons = list(weapons)
+        self.masks = [weapon.range_mask for weapon in self.weapons]
+        self.max_distance = max((weapon.range[1] for weapon in self.weapons), default=0)
+        self.counters = [[attack & counter for counter in self.masks] for attack in self.masks]
+
+        # Catalog weapons are shared definitions, so they are looked up by identity
+        self._slots = {id(weapon): slot for slot, weapon in enumerate(self.weapons)}
+
+        # reaching[d] has bit j set when weapon j reaches distance d
+        self.reaching = [
+            sum(1 << slot for slot, mask in enumerate(self.masks) if mask >> distance & 1)
+            for distance in range(self.max_distance + 1)
+        ]
+
+    def slot(self, weapon):
+        """
+        Get the position of a weapon in the catalog.
+
+        Args:
+            weapon (Weapon): Weapon or WeaponInstance to look up
+
+        Returns:
+            int: Index of the weapon, or None if it is not in the catalog
+        """
+        return self._slots.get(id(weapon.definition)) if weapon is not None else None
+
+    def can_counter(self, attacker_weapon, defender_weapon, distance):
+        """
+        Check if a defender can counter an attack made from a distance.
+
+        Args:
+            attacker_weapon (Weapon): Weapon of the attacker, or None
+            defender_weapon (Weapon): Weapon of the defender, or None
+            distance (int): Distance between the two characters, in tiles
+
+        Returns:
+            bool: True if both weapons reach the distance
+        """
+        attack = self.slot(attacker_weapon)
+        counter = self.slot(defender_weapon)
+        if attack is not None and counter is not None:
+            return bool(self.counters[attack][counter] >> distance & 1)
+        return bool((attack_mask(attacker_weapon) & reach_mask(defender_weapon)) >> distance & 1)
+
+    def counter_weapons(self, attacker_weapon, distance):
+        """
+        Get the catalog weapons able to counter an attack made from a distance.
+
+        Args:
+            attacker_weapon (Weapon): Weapon of the attacker, or None
+            distance (int): Distance between the two characters, in tiles
+
+        Returns:
+            list: Weapons of the catalog that can counter
+        """
+        if not attack_mask(attacker_weapon) >> distance & 1 or distance > self.max_distance:
+            return []
+        reaching = self.reaching[distance]
+        return [weapon for slot, weapon in enumerate(self.weapons) if reaching >> slot & 1]
+
+    def to_array(self):
+        """
+        Expand the table into a boolean array.
+
+        Returns:
+            numpy.ndarray: Whether weapon j counters weapon i from distance d,
+            shape (weapons, weapons, max_distance + 1)
+        """
+        import numpy as np
+
+        masks = np.array(self.counters, dtype=np.int64).reshape(len(self.weapons), len(self.weapons))
+        distances = np.arange(self.max_distance + 1)
+        return (masks[:, :, None] >> distances & 1).astype(bool)
@@ -0,0 +1,101 @@
+"""
+Terrain catalog for Fire Emblem Combat Simulator.
+Each tile type grants the unit standing on it avoid, defense and resistance
+bonuses, and may heal it at the start of its turn.
+"""
+from collections import namedtuple
+from collections.abc import Mapping
+
+
+class Terrain(namedtuple("Terrain", ["name", "avoid", "defense", "resistance", "healing"])):
+    """
+    Modifiers of a tile type for the unit standing on it.
+
+    Attributes:
+        name (str): Name of the tile type
+        avoid (int): Avoid bonus
+        defense (int): Defense bonus against physical attacks
+        resistance (int): Resistance bonus against magical attacks
+        healing (int): Percentage of max HP healed at the start of the unit's turn
+    """
+    __slots__ = ()
+
+    def heal_amount(self, max_hp):
+        """
+        Get the HP healed by the tile at the start of a turn.
+
+        Args:
+            max_hp (int): Unit's max HP
+
+        Returns:
+            int: HP healed
+        """
+        return max_hp * self.healing // 100
+
+
+# Predefined tile types, in table order
+TERRAIN_TYPES = (
+    Terrain("Plains", avoid=0, defense=0, resistance=0, healing=0),
+    Terrain("Forest", avoid=20, defense=1, resistance=0, healing=0),
+    Terrain("Mountain", avoid=30, defense=2, resistance=0, healing=0),
+    Terrain("Fort", avoid=20, defense=2, resistance=2, healing=20),
+    Terrain("River", avoid=10, defense=0, resistance=0, healing=0),
+    Terrain("Desert", avoid=5, defense=0, resistance=0, healing=0),
+)
+
+TERRAIN = {terrain.name: terrain for terrain in TERRAIN_TYPES}
+
+# Tile without modifiers, used when no terrain is given
+PLAINS = TERRAIN["Plains"]
+
+
+def get_terrain(name):
+    """
+    Get a predefined tile type by name.
+
+    Args:
+        name (str): Name of the tile type
+
+    Returns:
+        Terrain: The tile type
+    """
+    terrain = TERRAIN.get(name)
+    if terrain is None:
+        raise ValueError(f"Terrain '{name}' not found")
+    return terrain
+
+
+def resolve_terrain(terrain):
+    """
+    Get the tiles both sides of a battle stand on.
+
+    Args:
+        terrain: None (plains), a tile name, a Terrain, a dict of modifiers
+            ("avoid", "defense", "resistance", "healing") shared by both
+            sides, or an (attacker tile, defender tile) pair of any of these
+
+    Returns:
+        tuple: (attacker's Terrain, defender's Terrain)
+    """
+    if isinstance(terrain, (list, tuple)) and not isinstance(terrain, Terrain):
+        if len(terrain) != 2:
+            raise ValueError("A terrain pair needs one tile per side")
+        return _tile(terrain[0]), _tile(terrain[1])
+
+    tile = _tile(terrain)
+    return tile, tile
+
+
+def _tile(terrain):
+    """Get the Terrain described by a tile name, Terrain, modifier dict or None."""
+    if terrain is None:
+        return PLAINS
+    if isinstance(terrain, Terrain):
+        return terrain
+    if isinstance(terrain, str):
+        return get_terrain(terrain)
+    if isinstance(terrain, Mapping):
+        return Terrain(terrain.get("name", "Custom"), terrain.get("avoid", 0),
+                       terrain.get("defense", 0), terrain.get("resistance", 0),
+                       terrain.get("healing", 0))
+    raise ValueError(f"Invalid terrain {terrain!r}")
@@ -0,0 +1,8 @@
+"""
+Map modules for Fire Emblem Combat Simulator.
+Includes tile grids, units' positions and movement.
+"""
+
+from fe_combat_sim.grid.map import DEFAULT_REACH_CACHE_SIZE, GridMap, MAP_LEGEND
+from fe_combat_sim.grid.movement import find_reachable, grid_neighbors
+from fe_combat_sim.grid.threat import ThreatMap, ring_offsets
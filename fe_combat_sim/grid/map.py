@@ -0,0 +1,336 @@
+"""
+Tile-grid maps for Fire Emblem Combat Simulator.
+A GridMap holds the tile type of every square and the units standing on the
+map, each in a team, and answers which tiles a unit can move to.
+"""
+from collections import OrderedDict
+from types import MappingProxyType
+
+from fe_combat_sim.data.movement import movement_cost, movement_type
+from fe_combat_sim.data.terrain import PLAINS, resolve_terrain
+from fe_combat_sim.grid.movement import find_reachable, grid_neighbors
+
+# Characters of the tile rows accepted by GridMap.from_rows
+MAP_LEGEND = {
+    ".": "Plains",
+    "f": "Forest",
+    "^": "Mountain",
+    "#": "Fort",
+    "~": "River",
+    "s": "Desert",
+}
+
+# Reachable-tile results kept by a map before the least recently used is dropped
+DEFAULT_REACH_CACHE_SIZE = 4096
+
+
+class GridMap:
+    """
+    Rectangular map of tiles, addressed by (x, y) positions.
+
+    Reachable tiles are cached per unit and position. A cached result stays
+    valid until the tiles change or a unit of another team moves, so units
+    whose enemies stand still (a whole enemy phase) are only searched once.
+    The cache is bounded, dropping the least recently used results first.
+    """
+
+    def __init__(self, width, height, tiles=None, reach_cache_size=DEFAULT_REACH_CACHE_SIZE):
+        """
+        Initialize a map.
+
+        Args:
+            width (int): Number of columns
+            height (int): Number of rows
+            tiles (list, optional): Rows of tiles (names, Terrain or modifier
+                dicts, as accepted by Battle); plains by default
+            reach_cache_size (int): Maximum number of reachable-tile results cached
+        """
+        if width <= 0 or height <= 0:
+            raise ValueError("A map needs at least one tile")
+
+        self.width = width
+        self.height = height
+        self.tiles = [PLAINS] * (width * height)
+        if tiles is not None:
+            if len(tiles) != height or any(len(row) != width for row in tiles):
+                raise ValueError(f"Tiles must be {height} rows of {width} tiles")
+            self.tiles = [resolve_terrain(tile)[0] for row in tiles for tile in row]
+
+        self._positions = [(index % width, index // width) for index in range(width * height)]
+        self._neighbors = grid_neighbors(width, height)
+
+        # Units on the map: unit -> tile index, unit -> team, tile index -> unit
+        self._index = {}
+        self._teams = {}
+        self._occupant = {}
+
+        # Bumped whenever a unit of the team is placed, moved or removed
+        self._team_versions = {}
+
+        self._costs = {}
+        self._blocked = {}
+        self._reach_cache = OrderedDict()
+        self.reach_cache_size = reach_cache_size
+
+    @classmethod
+    def from_rows(cls, rows, legend=None):
+        """
+        Create a map from rows of tile characters.
+
+        Args:
+            rows (list): Strings of one character per tile
+            legend (dict, optional): Tile name of each character
+                (MAP_LEGEND by default)
+
+        Returns:
+            GridMap: The map
+        """
+        legend = legend or MAP_LEGEND
+        tiles = [[legend[char] for char in row] for row in rows]
+        return cls(len(tiles[0]) if tiles else 0, len(tiles), tiles)
+
+    def in_bounds(self, position):
+        """
+        Check if a position is on the map.
+
+        Args:
+            position (tuple): (x, y) position
+
+        Returns:
+            bool: True if the position is on the map
+        """
+        x, y = position
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def _to_index(self, position):
+        """Get the tile index of an on-map position."""
+        if not self.in_bounds(position):
+            raise ValueError(f"Position {position} is outside the {self.width}x{self.height} map")
+        x, y = position
+        return y * self.width + x
+
+    def tile(self, position):
+        """
+        Get the tile type at a position.
+
+        Args:
+            position (tuple): (x, y) position
+
+        Returns:
+            Terrain: Tile type at the position
+        """
+        return self.tiles[self._to_index(position)]
+
+    def set_tile(self, position, terrain):
+        """
+        Change the tile type at a position.
+
+        Args:
+            position (tuple): (x, y) position
+            terrain: Tile name, Terrain or modifier dict
+        """
+        self.tiles[self._to_index(position)] = resolve_terrain(terrain)[0]
+        self._costs.clear()
+        self._reach_cache.clear()
+
+    def place(self, unit, position, team):
+        """
+        Put a unit on the map.
+
+        Args:
+            unit (Character): Unit to place
+            position (tuple): (x, y) position of an empty tile
+            team (str): Team of the unit; units of other teams block its way
+        """
+        index = self._to_index(position)
+        if unit in self._index:
+            raise ValueError(f"{unit.name} is already on the map")
+        if index in self._occupant:
+            raise ValueError(f"Position {position} is occupied by {self._occupant[index].name}")
+
+        self._index[unit] = index
+        self._teams[unit] = team
+        self._occupant[index] = unit
+        self._touch(team)
+
+    def move(self, unit, position):
+        """
+        Move a unit already on the map.
+
+        Args:
+            unit (Character): Unit to move
+            position (tuple): (x, y) position of an empty tile
+        """
+        index = self._to_index(position)
+        occupant = self._occupant.get(index)
+        if occupant is not None and occupant is not unit:
+            raise ValueError(f"Position {position} is occupied by {occupant.name}")
+
+        del self._occupant[self._index[unit]]
+        self._index[unit] = index
+        self._occupant[index] = unit
+        self._touch(self._teams[unit])
+
+    def remove(self, unit):
+        """
+        Take a unit off the map (e.g. when it falls).
+
+        Args:
+            unit (Character): Unit to remove
+        """
+        del self._occupant[self._index.pop(unit)]
+        self._touch(self._teams.pop(unit))
+        self._reach_cache = OrderedDict((key, value) for key, value in self._reach_cache.items()
+                                        if key[0] is not unit)
+
+    def _touch(self, team):
+        """Record that a unit of a team changed tiles."""
+        self._team_versions[team] = self._team_versions.get(team, 0) + 1
+
+    def position_of(self, unit):
+        """
+        Get the position of a unit.
+
+        Args:
+            unit (Character): Unit on the map
+
+        Returns:
+            tuple: (x, y) position, or None if the unit is not on the map
+        """
+        index = self._index.get(unit)
+        return self._positions[index] if index is not None else None
+
+    def team_of(self, unit):
+        """
+        Get the team of a unit.
+
+        Args:
+            unit (Character): Unit on the map
+
+        Returns:
+            str: Team of the unit, or None if the unit is not on the map
+        """
+        return self._teams.get(unit)
+
+    def unit_at(self, position):
+        """
+        Get the unit standing at a position.
+
+        Args:
+            position (tuple): (x, y) position
+
+        Returns:
+            Character: Unit at the position, or None
+        """
+        return self._occupant.get(self._to_index(position))
+
+    def units(self, team=None):
+        """
+        Get the units on the map.
+
+        Args:
+            team (str, optional): Only return the units of this team
+
+        Returns:
+            list: Units, in the order they were placed
+        """
+        return [unit for unit, unit_team in self._teams.items() if team is None or unit_team == team]
+
+    def _move_costs(self, move_type):
+        """Get the cost of entering every tile for a movement type."""
+        costs = self._costs.get(move_type)
+        if costs is None:
+            by_tile = {tile: movement_cost(tile, move_type) for tile in set(self.tiles)}
+            costs = [by_tile[tile] for tile in self.tiles]
+            self._costs[move_type] = costs
+        return costs
+
+    def _blocker_version(self, team):
+        """Get the version of the positions of every team but one."""
+        return tuple(version for other, version in self._team_versions.items() if other != team)
+
+    def _blocked_tiles(self, team, version):
+        """Get the tile indices held by the units of other teams."""
+        cached = self._blocked.get(team)
+        if cached is None or cached[0] != version:
+            blocked = frozenset(index for unit, index in self._index.items()
+                                if self._teams[unit] != team)
+            cached = self._blocked[team] = (version, blocked)
+        return cached[1]
+
+    def reachable(self, unit, position=None):
+        """
+        Get the tiles a unit can move to, with the movement it spends.
+
+        The unit moves up to its class's movement through tiles its movement
+        type can enter; tiles held by other teams block it, while allies can
+        be passed through (see destinations for the tiles it may stop on).
+
+        Args:
+            unit (Character): Unit on the map
+            position (tuple, optional): Tile to move from instead of the
+                unit's own (e.g. to plan from a tile it could reach)
+
+        Returns:
+            Mapping: Read-only mapping of each reachable (x, y) position to
+            the movement spent reaching it
+        """
+        team = self._teams.get(unit)
+        if team is None:
+            raise ValueError(f"{unit.name} is not on the map")
+        start = self._index[unit] if position is None else self._to_index(position)
+
+        character_class = unit.character_class
+        move_type = movement_type(character_class)
+        movement = character_class.movement if character_class else 0
+        version = self._blocker_version(team)
+
+        key = (unit, start, move_type, movement)
+        cache = self._reach_cache
+        cached = cache.get(key)
+        if cached is not None and cached[0] == version:
+            cache.move_to_end(key)
+            return cached[1]
+
+        spent = find_reachable(self._move_costs(move_type), self._neighbors, start, movement,
+                               self._blocked_tiles(team, version))
+        positions = self._positions
+        reach = MappingProxyType({positions[index]: used for index, used in spent.items()})
+        cache[key] = (version, reach)
+        cache.move_to_end(key)
+        while len(cache) > self.reach_cache_size:
+            cache.popitem(last=False)
+        return reach
+
+    def destinations(self, unit, position=None):
+        """
+        Get the tiles a unit can end its move on.
+
+        Args:
+            unit (Character): Unit on the map
+            position (tuple, optional): Tile to move from instead of the unit's own
+
+        Returns:
+            list: Reachable (x, y) positions that no other unit holds
+        """
+        occupant = self._occupant
+        return [tile for tile in self.reachable(unit, position)
+                if occupant.get(tile[1] * self.width + tile[0], unit) is unit]
+
+    @staticmethod
+    def distance(start, end):
+        """
+        Get the distance between two positions, in tiles.
+
+        Args:
+            start (tuple): (x, y) position
+            end (tuple): (x, y) position
+
+        Returns:
+            int: Manhattan distance, the distance weapon ranges are measured in
+        """
+        return abs(start[0] - end[0]) + abs(start[1] - end[1])
+
+    def __repr__(self):
+        """Detailed representation of the map."""
+        return f"GridMap(width={self.width}, height={self.height}, units={len(self._index)})"
@@ -0,0 +1,71 @@
+"""
+Movement search for Fire Emblem Combat Simulator.
+Reachable tiles are found with Dijkstra's algorithm over flat tile indices.
+Move costs are small positive integers, so the priority queue is a list of
+buckets indexed by the movement spent, which needs no heap at all.
+"""
+
+
+def grid_neighbors(width, height):
+    """
+    Get the tiles adjacent to every tile of a grid.
+
+    Args:
+        width (int): Number of columns
+        height (int): Number of rows
+
+    Returns:
+        list: Indices of the (up to four) tiles next to each tile index
+    """
+    neighbors = []
+    for y in range(height):
+        for x in range(width):
+            index = y * width + x
+            adjacent = []
+            if x > 0:
+                adjacent.append(index - 1)
+            if x < width - 1:
+                adjacent.append(index + 1)
+            if y > 0:
+                adjacent.append(index - width)
+            if y < height - 1:
+                adjacent.append(index + width)
+            neighbors.append(adjacent)
+    return neighbors
+
+
+def find_reachable(costs, neighbors, start, movement, blocked=frozenset()):
+    """
+    Find every tile a unit can move to, and the movement it spends getting there.
+
+    Args:
+        costs (list): Cost of entering each tile (None if impassable)
+        neighbors (list): Indices of the tiles adjacent to each tile
+        start (int): Index of the unit's tile
+        movement (int): Movement points of the unit
+        blocked (set, optional): Indices of tiles the unit cannot enter
+            (tiles held by enemy units)
+
+    Returns:
+        dict: Movement spent to reach each reachable tile index, the start
+        included
+    """
+    spent = {start: 0}
+    buckets = [[] for _ in range(movement + 1)]
+    buckets[0].append(start)
+
+    for used in range(movement + 1):
+        for tile in buckets[used]:
+            # A tile reached again more cheaply left a stale entry behind
+            if spent[tile] != used:
+                continue
+            for adjacent in neighbors[tile]:
+                cost = costs[adjacent]
+                if cost is None or adjacent in blocked:
+                    continue
+                total = used + cost
+                if total <= movement and total < spent.get(adjacent, movement + 1):
+                    spent[adjacent] = total
+                    buckets[total].append(adjacent)
+
+    return spent
@@ -0,0 +1,228 @@
+"""
+Threat maps for Fire Emblem Combat Simulator.
+A ThreatMap keeps the danger zone of a team: every tile one of its units can
+attack this turn, i.e. the tiles within its weapon's range of a tile it can
+move to. Each unit's threat is stored on its own, with a per-tile count of
+the units threatening it, so a move only recomputes the units it affects.
+"""
+
+# Ring offsets of each distance, shared by every threat map
+_RINGS = {}
+
+
+def ring_offsets(distance):
+    """
+    Get the offsets of the tiles at a distance from a tile.
+
+    Args:
+        distance (int): Distance in tiles (Manhattan, like weapon ranges)
+
+    Returns:
+        tuple: (dx, dy) offsets of the tiles exactly that far away
+    """
+    ring = _RINGS.get(distance)
+    if ring is None:
+        if distance == 0:
+            ring = ((0, 0),)
+        else:
+            ring = tuple(offset for step in range(distance)
+                         for offset in ((step, step - distance), (distance - step, step),
+                                        (-step, distance - step), (step - distance, -step)))
+        _RINGS[distance] = ring
+    return ring
+
+
+class ThreatMap:
+    """
+    Danger zone of the units of one team on a GridMap.
+
+    Moves, deaths and reinforcements must go through the threat map (or be
+    followed by refresh()) to keep it current. A unit's threat only depends
+    on the tiles it can reach, so a unit moving from or to a tile only
+    affects the units whose reach touches that tile.
+    """
+
+    def __init__(self, grid, team):
+        """
+        Build the threat map of a team.
+
+        Args:
+            grid (GridMap): Map the units stand on
+            team (str): Team whose threat is mapped (e.g. the enemy)
+        """
+        self.grid = grid
+        self.team = team
+        self.refresh()
+
+    def refresh(self):
+        """Recompute the threat of every unit of the team (e.g. after the tiles change)."""
+        self.counts = [0] * (self.grid.width * self.grid.height)
+        self._threats = {}
+        self._reach = {}
+        for unit in self.grid.units(self.team):
+            self._update(unit)
+
+    def _attack_tiles(self, unit):
+        """Get the tile indices a unit can attack from the tiles it can stop on."""
+        weapon = unit.weapon
+        # Staves heal rather than threaten
+        if weapon is None or weapon.weapon_type == "Staff":
+            return frozenset()
+
+        width, height = self.grid.width, self.grid.height
+        low, high = weapon.range
+        offsets = [offset for distance in range(low, high + 1) for offset in ring_offsets(distance)]
+        tiles = set()
+        for x, y in self.grid.destinations(unit):
+            for dx, dy in offsets:
+                tx, ty = x + dx, y + dy
+                if 0 <= tx < width and 0 <= ty < height:
+                    tiles.add(ty * width + tx)
+        return frozenset(tiles)
+
+    def _update(self, unit):
+        """Recompute the threat of one unit and its share of the tile counts."""
+        counts = self.counts
+        for index in self._threats.pop(unit, ()):
+            counts[index] -= 1
+
+        threat = self._attack_tiles(unit)
+        for index in threat:
+            counts[index] += 1
+        self._reach[unit] = self.grid.reachable(unit)
+        self._threats[unit] = threat
+
+    def _drop(self, unit):
+        """Remove a unit's share of the tile counts."""
+        for index in self._threats.pop(unit, ()):
+            self.counts[index] -= 1
+        self._reach.pop(unit, None)
+
+    def _affected(self, vacated=None, occupied=None):
+        """
+        Get the units whose threat may change when tiles are vacated or occupied.
+
+        A vacated tile matters to a unit reaching it or a tile next to it (the
+        tile may open a path, or become a tile to stop on); an occupied tile
+        only matters to a unit reaching it.
+        """
+        border = set()
+        if vacated is not None:
+            x, y = vacated
+            border.update(((x, y), (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)))
+        return [unit for unit, reach in self._reach.items()
+                if occupied in reach or any(tile in reach for tile in border)]
+
+    def place(self, unit, position, team):
+        """
+        Put a unit on the map and update the threats it affects.
+
+        Args:
+            unit (Character): Unit to place
+            position (tuple): (x, y) position of an empty tile
+            team (str): Team of the unit
+        """
+        self.grid.place(unit, position, team)
+        for other in self._affected(occupied=position):
+            self._update(other)
+        if team == self.team:
+            self._update(unit)
+
+    def move(self, unit, position):
+        """
+        Move a unit and update the threats it affects.
+
+        Args:
+            unit (Character): Unit to move
+            position (tuple): (x, y) position of an empty tile
+        """
+        vacated = self.grid.position_of(unit)
+        self.grid.move(unit, position)
+        affected = self._affected(vacated, position)
+        if unit in self._reach and unit not in affected:
+            affected.append(unit)
+        for other in affected:
+            self._update(other)
+
+    def remove(self, unit):
+        """
+        Take a unit off the map (e.g. when it falls) and update the threats it affects.
+
+        Args:
+            unit (Character): Unit to remove
+        """
+        vacated = self.grid.position_of(unit)
+        self.grid.remove(unit)
+        self._drop(unit)
+        for other in self._affected(vacated):
+            self._update(other)
+
+    def update_unit(self, unit):
+        """
+        Recompute one unit's threat after its weapon or class changes.
+
+        Args:
+            unit (Character): Unit of the team
+        """
+        self._update(unit)
+
+    def threat_of(self, unit):
+        """
+        Get the tiles one unit threatens.
+
+        Args:
+            unit (Character): Unit of the team
+
+        Returns:
+            set: (x, y) positions the unit can attack this turn
+        """
+        width = self.grid.width
+        return {(index % width, index // width) for index in self._threats.get(unit, ())}
+
+    def count(self, position):
+        """
+        Get the number of units threatening a tile.
+
+        Args:
+            position (tuple): (x, y) position
+
+        Returns:
+            int: Number of units of the team that can attack the tile
+        """
+        x, y = position
+        return self.counts[y * self.grid.width + x]
+
+    def threatened_by(self, position):
+        """
+        Get the units threatening a tile.
+
+        Args:
+            position (tuple): (x, y) position
+
+        Returns:
+            list: Units of the team that can attack the tile
+        """
+        x, y = position
+        index = y * self.grid.width + x
+        return [unit for unit, threat in self._threats.items() if index in threat]
+
+    def danger_zone(self):
+        """
+        Get every threatened tile.
+
+        Returns:
+            set: (x, y) positions at least one unit of the team can attack
+        """
+        width = self.grid.width
+        return {(index % width, index // width) for index, count in enumerate(self.counts) if count}
+
+    def to_array(self):
+        """
+        Get the tile counts as an array, for drawing the overlay.
+
+        Returns:
+            numpy.ndarray: Number of threatening units per tile, shape (height, width)
+        """
+        import numpy as np
+
+        return np.array(self.counts, dtype=np.int32).reshape(self.grid.height, self.grid.width)
@@ -2,5 +2,8 @@
 Utility modules for Fire Emblem Combat Simulator.
 """
 
-from fe_combat_sim.utils.stats import calculate_growth, generate_random_stats
+from fe_combat_sim.utils.stats import (
+    calculate_growth, generate_random_stats, calculate_average_stats,
+    growth_distribution
+)
 from fe_combat_sim.utils.weapon_triangle import WeaponTriangle
@@ -0,0 +1,69 @@
+"""
+Precision-targeted battle prediction for Fire Emblem Combat Simulator.
+Fights are sampled in chunks until the confidence interval on every victory
+percentage is tight enough, so lopsided matchups stop early and close ones get
+the samples they need.
+"""
+import numpy as np
+
+from fe_combat_sim.utils.confidence import required_trials
+from fe_combat_sim.utils.exchange import build_exchange_plan
+from fe_combat_sim.utils.outcome import OUTCOME_FIELDS, OutcomeTotals
+from fe_combat_sim.utils.vectorized import plan_arrays, simulate_fights
+
+
+def predict_battle_outcome_adaptive(attacker, defender, half_width=1.0, confidence=0.95,
+                                    chunk_size=1000, max_iterations=10**6, max_rounds=10,
+                                    seed=None, terrain=None, distance=None):
+    """
+    Predict the outcome of a battle to a target precision.
+
+    Args:
+        attacker: The attacking character
+        defender: The defending character
+        half_width: Target half-width of each victory percentage's interval,
+            in percentage points
+        confidence: Confidence level of the intervals
+        chunk_size: Minimum number of simulations per chunk
+        max_iterations: Number of simulations after which sampling stops anyway
+        max_rounds: Number of rounds after which a battle is a draw
+        seed: Seed for the random generator
+        terrain: Terrain effects
+        distance: Distance between the characters in tiles (see Battle)
+
+    Returns:
+        dict: Battle outcome prediction statistics, as in predict_battle_outcome,
+        plus "confidence_intervals" (Wilson bounds of each victory percentage),
+        "confidence", "iterations" (simulations used) and "converged"
+    """
+    plan = build_exchange_plan(attacker, defender, terrain, distance)
+    params = plan_arrays([plan])
+    rng = np.random.default_rng(seed)
+
+    totals = OutcomeTotals.empty()
+    size = min(chunk_size, max_iterations)
+
+    while True:
+        batch = simulate_fights(params, attacker.current_hp, defender.current_hp,
+                                size, max_rounds, rng)
+        totals = totals.merge(batch.totals())
+
+        intervals = totals.intervals(confidence)
+        widest = max((upper - lower) / 2 for lower, upper in intervals.values())
+        if widest <= half_width or totals.iterations >= max_iterations:
+            break
+
+        # Size the next chunk from the current estimate of each proportion
+        needed = max(
+            required_trials(getattr(totals, field) / totals.iterations, half_width / 100, confidence)
+            for field, _ in OUTCOME_FIELDS
+        )
+        size = min(max(chunk_size, needed - totals.iterations), max_iterations - totals.iterations)
+
+    results = totals.to_results()
+    results["confidence_intervals"] = intervals
+    results["confidence"] = confidence
+    results["iterations"] = totals.iterations
+    results["converged"] = widest <= half_width
+
+    return results
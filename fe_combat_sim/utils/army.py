@@ -0,0 +1,120 @@
+"""
+Army-vs-army combat for Fire Emblem Combat Simulator.
+Resolves many independent 1v1 fights between the units of two armies in one
+vectorized pass, with the rules of Battle.simulate_round, and returns the
+armies' updated HP and weapon uses as arrays.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from fe_combat_sim.utils.exchange import ATTACKER, DEFENDER, NO_VICTORY
+from fe_combat_sim.utils.unit_table import UNLIMITED_USES, UnitTable, pair_parameters
+from fe_combat_sim.utils.vectorized import SLOTS_PER_ROUND, strike_damage
+
+
+class PairingResults(namedtuple("PairingResults", [
+        "winner", "attacker_hp", "defender_hp", "attacker_uses", "defender_uses"])):
+    """
+    Results of a pass of army-vs-army fights.
+
+    Attributes:
+        winner (numpy.ndarray): ATTACKER, DEFENDER or NO_VICTORY for each pairing
+        attacker_hp (numpy.ndarray): HP of every unit of the attacking army
+        defender_hp (numpy.ndarray): HP of every unit of the defending army
+        attacker_uses (numpy.ndarray): Uses left on the weapon of every unit of
+            the attacking army (0 once broken, UNLIMITED_USES if unbreakable)
+        defender_uses (numpy.ndarray): Uses left on the defending army's weapons
+
+    Units outside the pairings keep their HP and uses. When an army fights
+    itself, both HP arrays (and both uses arrays) are the same array.
+    """
+    __slots__ = ()
+
+
+def _as_table(army):
+    """Get the unit table of an army given as a table or a list of characters."""
+    return army if isinstance(army, UnitTable) else UnitTable.from_characters(army)
+
+
+def resolve_pairings(attackers, defenders, pairings, rounds=1, terrain=None, distance=None,
+                     rng=None, seed=None):
+    """
+    Resolve the fights between the paired units of two armies at once.
+
+    Every pairing is one round of Battle.simulate_round (attack, counter-attack,
+    follow-up), stopping as soon as a unit falls; each strike uses one use of
+    the striker's weapon, and a unit whose weapon breaks strikes no more.
+
+    Args:
+        attackers (UnitTable or list): Attacking army, as a unit table or
+            a list of characters
+        defenders (UnitTable or list): Defending army (may be the attacking
+            army itself)
+        pairings: (attacker index, defender index) of each fight, as a
+            sequence of pairs or an array of shape (pairings, 2)
+        rounds (int): Number of rounds fought by each pairing
+        terrain (optional): Terrain of every fight, as accepted by Battle
+        distance (optional): Distance of every fight, or an array with the
+            distance of each pairing (see pair_parameters)
+        rng (numpy.random.Generator, optional): Random generator for the rolls
+        seed (int, optional): Seed of a new generator, used when rng is None
+
+    Returns:
+        PairingResults: Winner of each pairing and the updated army arrays
+    """
+    same_army = attackers is defenders
+    attackers = _as_table(attackers)
+    defenders = attackers if same_army else _as_table(defenders)
+    if rng is None:
+        rng = np.random.default_rng(seed)
+
+    pairings = np.asarray(pairings, dtype=np.int64).reshape(-1, 2)
+    attacker_index, defender_index = pairings[:, 0], pairings[:, 1]
+
+    # Each unit fights at most once, so the HP updates never overlap
+    fighters = ([np.concatenate([attacker_index, defender_index])] if same_army
+                else [attacker_index, defender_index])
+    for units in fighters:
+        if len(np.unique(units)) != len(units):
+            raise ValueError("A unit can only be in one pairing per pass")
+
+    params = pair_parameters(attackers, attacker_index, defenders, defender_index, terrain,
+                             distance=distance)
+
+    # Per-pairing state, indexed by side
+    hp = np.stack([attackers.current_hp[attacker_index], defenders.current_hp[defender_index]])
+    uses = np.stack([attackers.weapon_uses[attacker_index], defenders.weapon_uses[defender_index]])
+    # A weapon with no uses left strikes no more, even before its first strike here
+    broken = uses == 0
+
+    for _ in range(rounds):
+        for slot in range(SLOTS_PER_ROUND):
+            for side in (ATTACKER, DEFENDER):
+                target = 1 - side
+                striking = ((params.slots[:, slot] == side) & ~broken[side]
+                            & (hp[ATTACKER] > 0) & (hp[DEFENDER] > 0))
+                if not striking.any():
+                    continue
+
+                hit_rolls, crit_rolls = rng.integers(1, 101, (2, len(pairings)), dtype=np.int16)
+                dealt = strike_damage(hit_rolls, crit_rolls, params.hit[side], params.crit[side],
+                                      params.damage[side], striking)
+                hp[target] = np.maximum(hp[target] - dealt, 0)
+
+                # A weapon breaks on its last use, as in Battle
+                worn = striking & (uses[side] != UNLIMITED_USES)
+                uses[side] = np.where(worn, np.maximum(uses[side] - 1, 0), uses[side])
+                broken[side] |= worn & (uses[side] <= 0)
+
+    winner = np.where(hp[DEFENDER] <= 0, ATTACKER,
+                      np.where(hp[ATTACKER] <= 0, DEFENDER, NO_VICTORY)).astype(np.int8)
+
+    attacker_hp = attackers.current_hp.copy()
+    attacker_uses = attackers.weapon_uses.copy()
+    defender_hp = attacker_hp if same_army else defenders.current_hp.copy()
+    defender_uses = attacker_uses if same_army else defenders.weapon_uses.copy()
+    attacker_hp[attacker_index], defender_hp[defender_index] = hp
+    attacker_uses[attacker_index], defender_uses[defender_index] = uses
+
+    return PairingResults(winner, attacker_hp, defender_hp, attacker_uses, defender_uses)
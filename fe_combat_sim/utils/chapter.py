@@ -0,0 +1,406 @@
+"""
+Chapter simulation for Fire Emblem Combat Simulator.
+A chapter is a map, the units deployed on it and the conditions to clear or
+lose it. A PhaseScheduler plays it turn by turn: each team's phase moves its
+units one at a time with a TargetingAI and resolves every attack with Battle.
+Many playthroughs are split into blocks with their own random streams and
+spread across processes to estimate how often, and on which turn, the chapter
+is cleared or lost.
+"""
+import os
+import random
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fe_combat_sim.combat.battle import LOG_NONE, Battle
+from fe_combat_sim.entities.character import Character
+from fe_combat_sim.grid.map import GridMap
+from fe_combat_sim.utils.parallel import block_sizes
+from fe_combat_sim.utils.targeting import DEFAULT_WEIGHTS, TargetingAI
+
+# Teams, in phase order; allies fight on the player's side
+PLAYER = "player"
+ENEMY = "enemy"
+ALLY = "ally"
+PHASES = (PLAYER, ENEMY, ALLY)
+SIDES = {PLAYER: PLAYER, ALLY: PLAYER, ENEMY: ENEMY}
+
+# Chapter goals
+ROUT = "rout"
+DEFEAT_BOSS = "defeat_boss"
+SURVIVE = "survive"
+GOALS = (ROUT, DEFEAT_BOSS, SURVIVE)
+
+# Outcomes of a playthrough
+CLEARED = "cleared"
+LOST = "lost"
+OUT_OF_TURNS = "out_of_turns"
+
+# Number of playthroughs played with each random stream
+DEFAULT_BLOCK_SIZE = 32
+
+
+class ChapterResult(namedtuple("ChapterResult", ["outcome", "turn", "units_lost"])):
+    """
+    Result of one playthrough of a chapter.
+
+    Attributes:
+        outcome (str): CLEARED, LOST or OUT_OF_TURNS
+        turn (int): Turn on which the playthrough ended
+        units_lost (int): Number of player and ally units defeated
+    """
+    __slots__ = ()
+
+
+class Chapter:
+    """
+    Map, deployment and conditions of a chapter.
+
+    The chapter keeps its own copy of the tiles and units of the grid it is
+    built from; every playthrough deploys fresh copies of them.
+    """
+
+    def __init__(self, grid, goal=ROUT, turn_limit=20, lords=None, boss=None, weights=None):
+        """
+        Initialize a chapter.
+
+        Args:
+            grid (GridMap): Map with the units of every team (PLAYER, ENEMY and
+                optionally ALLY) placed at their starting positions
+            goal (str): ROUT (defeat every enemy), DEFEAT_BOSS or SURVIVE
+                (last until the end of the turn limit)
+            turn_limit (int): Last turn of the chapter
+            lords (list, optional): Names of the player units whose defeat
+                loses the chapter; by default it is lost once every player
+                unit is defeated
+            boss (str, optional): Name of the enemy to defeat for DEFEAT_BOSS;
+                the boss never leaves its tile
+            weights (dict, optional): TargetWeights of each team's AI
+                (DEFAULT_WEIGHTS for teams not given)
+        """
+        if goal not in GOALS:
+            raise ValueError(f"Invalid goal. Must be one of {GOALS}")
+        if goal == DEFEAT_BOSS and boss is None:
+            raise ValueError("A boss chapter needs a boss")
+        teams = {grid.team_of(unit) for unit in grid.units()}
+        if not teams <= set(PHASES):
+            raise ValueError(f"Invalid teams {sorted(teams - set(PHASES))}. Must be in {PHASES}")
+
+        self.width = grid.width
+        self.height = grid.height
+        self.tiles = list(grid.tiles)
+        self.deployment = [(_copy_unit(unit), grid.position_of(unit), grid.team_of(unit))
+                           for unit in grid.units()]
+        self.goal = goal
+        self.turn_limit = turn_limit
+        self.lords = set(lords or ())
+        self.boss = boss
+        self.weights = dict(weights or {})
+
+    def deploy(self):
+        """
+        Place fresh copies of the chapter's units on a new map.
+
+        Returns:
+            GridMap: Map at the start of the chapter
+        """
+        rows = [self.tiles[row * self.width:(row + 1) * self.width] for row in range(self.height)]
+        grid = GridMap(self.width, self.height, rows)
+        for unit, position, team in self.deployment:
+            grid.place(_copy_unit(unit), position, team)
+        return grid
+
+    def play(self, rng=None, seed=None):
+        """
+        Play the chapter once.
+
+        Args:
+            rng (optional): Source of randint for every battle, such as a
+                random.Random; defaults to the random module
+            seed (int, optional): Seed of a random.Random used when rng is None
+
+        Returns:
+            ChapterResult: Outcome of the playthrough
+        """
+        if rng is None:
+            rng = random.Random(seed) if seed is not None else random
+        return PhaseScheduler(self, self.deploy(), rng).run()
+
+
+class PhaseScheduler:
+    """
+    Runs the turns of one playthrough: the phase of each team in PHASES order,
+    and within a phase each unit in deployment order.
+    """
+
+    def __init__(self, chapter, grid, rng):
+        """
+        Initialize a playthrough.
+
+        Args:
+            chapter (Chapter): Chapter being played
+            grid (GridMap): Map with the chapter's units deployed
+            rng: Source of randint for every battle
+        """
+        self.chapter = chapter
+        self.grid = grid
+        self.rng = rng
+        self.turn = 0
+        self.units_lost = 0
+        self.result = None
+
+        teams = {grid.team_of(unit) for unit in grid.units()}
+        self.phases = [team for team in PHASES if team in teams]
+        self.ais = {
+            team: TargetingAI(grid, team, chapter.weights.get(team, DEFAULT_WEIGHTS),
+                              opponents={other for other in PHASES if SIDES[other] != SIDES[team]})
+            for team in self.phases
+        }
+
+    def run(self):
+        """
+        Play turns until the chapter is cleared, lost or out of turns.
+
+        Returns:
+            ChapterResult: Outcome of the playthrough
+        """
+        while self.result is None:
+            self.run_turn()
+        return self.result
+
+    def run_turn(self):
+        """Play the phase of every team, then check the turn limit."""
+        self.turn += 1
+        for team in self.phases:
+            self.run_phase(team)
+            if self.result is not None:
+                return
+
+        if self.turn >= self.chapter.turn_limit:
+            outcome = CLEARED if self.chapter.goal == SURVIVE else OUT_OF_TURNS
+            self._finish(outcome)
+
+    def run_phase(self, team):
+        """
+        Play one team's phase: healing from the tiles, then every unit's action.
+
+        Args:
+            team (str): Team whose phase it is
+        """
+        grid = self.grid
+        ai = self.ais[team]
+        ai.new_turn()
+
+        units = grid.units(team)
+        for unit in units:
+            heal = grid.tile(grid.position_of(unit)).heal_amount(unit.stats["hp"])
+            unit.current_hp = min(unit.stats["hp"], unit.current_hp + heal)
+
+        # Forecast every attack of the phase in one batch; units acting later
+        # only solve the matchups changed by earlier fights
+        ai.forecast(ai.candidates(units))
+
+        for unit in units:
+            # Units defeated earlier in the phase no longer act
+            if grid.position_of(unit) is None:
+                continue
+            self._act(unit)
+            if self.result is not None:
+                return
+
+    def _act(self, unit):
+        """Attack with a unit if it has a target in reach, or move it closer."""
+        grid = self.grid
+        ai = self.ais[grid.team_of(unit)]
+
+        candidates = ai.candidates([unit])
+        stationary = unit.name == self.chapter.boss
+        if stationary:
+            position = grid.position_of(unit)
+            candidates = [candidate for candidate in candidates if candidate[1] == position]
+        choice = ai.plan([unit], candidates)[unit]
+
+        if choice is None:
+            if not stationary:
+                self._advance(unit, ai)
+            return
+
+        grid.move(unit, choice.position)
+        target = choice.target
+        battle = Battle(unit, target, (grid.tile(choice.position), grid.tile(grid.position_of(target))),
+                        log_level=LOG_NONE, rng=self.rng, distance=choice.distance)
+        battle.simulate_round()
+
+        for fighter in (unit, target):
+            if fighter.current_hp <= 0:
+                self._defeat(fighter)
+
+    def _advance(self, unit, ai):
+        """Move a unit without a target to the tile closest to an opponent."""
+        grid = self.grid
+        opponents = [grid.position_of(other) for other in grid.units()
+                     if ai.is_opponent(grid.team_of(other))]
+        if not opponents:
+            return
+
+        reach = grid.reachable(unit)
+        best = min(grid.destinations(unit),
+                   key=lambda tile: (min(grid.distance(tile, other) for other in opponents),
+                                     reach[tile]))
+        grid.move(unit, best)
+
+    def _defeat(self, unit):
+        """Take a defeated unit off the map and check the chapter's conditions."""
+        grid = self.grid
+        chapter = self.chapter
+        team = grid.team_of(unit)
+        grid.remove(unit)
+
+        if SIDES[team] == PLAYER:
+            self.units_lost += 1
+            if unit.name in chapter.lords or (not chapter.lords and not grid.units(PLAYER)):
+                self._finish(LOST)
+        elif chapter.goal == DEFEAT_BOSS and unit.name == chapter.boss:
+            self._finish(CLEARED)
+        elif chapter.goal == ROUT and not grid.units(ENEMY):
+            self._finish(CLEARED)
+
+    def _finish(self, outcome):
+        """End the playthrough."""
+        if self.result is None:
+            self.result = ChapterResult(outcome, self.turn, self.units_lost)
+
+
+def _copy_unit(unit):
+    """Copy a unit with its own stats, HP and weapon instance."""
+    weapon = unit.weapon
+    copy = Character(unit.name, unit.character_class, dict(unit.stats),
+                     weapon.instance(weapon.current_uses) if weapon is not None else None,
+                     unit.skills)
+    copy.current_hp = unit.current_hp
+    return copy
+
+
+class ChapterTotals(namedtuple("ChapterTotals", ["cleared", "lost", "out_of_turns",
+                                                  "units_lost", "playthroughs"])):
+    """
+    Running sums over a set of playthroughs.
+
+    Attributes:
+        cleared (numpy.ndarray): Playthroughs cleared on each turn (index 0 unused)
+        lost (numpy.ndarray): Playthroughs lost on each turn
+        out_of_turns (int): Playthroughs that ran out of turns
+        units_lost (int): Sum of the units lost
+        playthroughs (int): Number of playthroughs
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_results(cls, results, turn_limit):
+        """
+        Aggregate individual playthroughs.
+
+        Args:
+            results (list): ChapterResult of each playthrough
+            turn_limit (int): Last turn of the chapter
+
+        Returns:
+            ChapterTotals: Sums over the playthroughs
+        """
+        cleared = np.zeros(turn_limit + 1, dtype=np.int64)
+        lost = np.zeros(turn_limit + 1, dtype=np.int64)
+        for result in results:
+            if result.outcome == CLEARED:
+                cleared[result.turn] += 1
+            elif result.outcome == LOST:
+                lost[result.turn] += 1
+        out_of_turns = sum(result.outcome == OUT_OF_TURNS for result in results)
+        return cls(cleared, lost, out_of_turns, sum(result.units_lost for result in results),
+                   len(results))
+
+    def merge(self, other):
+        """
+        Combine these totals with the totals of another set of playthroughs.
+
+        Args:
+            other (ChapterTotals): Totals to add
+
+        Returns:
+            ChapterTotals: Combined totals
+        """
+        return ChapterTotals(*(mine + theirs for mine, theirs in zip(self, other)))
+
+    def to_results(self):
+        """
+        Turn the totals into clear and loss rates.
+
+        Returns:
+            dict: Overall clear, loss and out-of-turns percentages, the share
+            of playthroughs cleared and lost on each turn (index 0 unused),
+            the cumulative clear rate by each turn, and the average units lost
+        """
+        count = max(self.playthroughs, 1)
+        return {
+            "clear_percentage": self.cleared.sum() / count * 100,
+            "loss_percentage": self.lost.sum() / count * 100,
+            "out_of_turns_percentage": self.out_of_turns / count * 100,
+            "clear_percentage_by_turn": self.cleared / count * 100,
+            "loss_percentage_by_turn": self.lost / count * 100,
+            "cumulative_clear_percentage": np.cumsum(self.cleared) / count * 100,
+            "average_units_lost": self.units_lost / count,
+            "playthroughs": self.playthroughs,
+        }
+
+
+def play_block(chapter, playthroughs, seed_sequence):
+    """
+    Play one block of playthroughs with its own random stream.
+
+    Args:
+        chapter (Chapter): Chapter to play
+        playthroughs (int): Number of playthroughs in the block
+        seed_sequence (numpy.random.SeedSequence): Seed of the block's stream
+
+    Returns:
+        ChapterTotals: Totals of the block
+    """
+    rng = random.Random(int(seed_sequence.generate_state(1)[0]))
+    results = [chapter.play(rng) for _ in range(playthroughs)]
+    return ChapterTotals.from_results(results, chapter.turn_limit)
+
+
+def estimate_clear_rate(chapter, playthroughs=1000, workers=None, seed=None,
+                        block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Estimate how often a chapter is cleared or lost, turn by turn.
+
+    Args:
+        chapter (Chapter): Chapter to play
+        playthroughs (int): Number of playthroughs
+        workers (int, optional): Number of worker processes (defaults to the
+            number of CPUs); 1 plays every block in the calling process
+        seed (int, optional): Seed of the root random stream; None draws fresh entropy
+        block_size (int): Number of playthroughs played with each random stream
+
+    Returns:
+        dict: Clear and loss statistics, as in ChapterTotals.to_results
+    """
+    sizes = block_sizes(playthroughs, block_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    count = len(sizes)
+    arguments = ([chapter] * count, sizes, seeds)
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or count <= 1:
+        block_totals = map(play_block, *arguments)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, count)) as executor:
+            block_totals = list(executor.map(play_block, *arguments))
+
+    totals = ChapterTotals.from_results([], chapter.turn_limit)
+    for block in block_totals:
+        totals = totals.merge(block)
+
+    return totals.to_results()
@@ -0,0 +1,252 @@
+"""
+Loadout comparison for Fire Emblem Combat Simulator.
+Candidate matchups are simulated against the same pre-drawn dice rolls (common
+random numbers), so the noise shared by every candidate cancels out of their
+differences and far fewer simulations are needed to rank them.
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from fe_combat_sim.combat.snapshot import CombatSnapshot
+from fe_combat_sim.utils.confidence import z_score
+from fe_combat_sim.utils.exchange import ATTACKER, DEFENDER, NO_VICTORY, build_exchange_plan
+from fe_combat_sim.utils.outcome import OutcomeTotals
+from fe_combat_sim.utils.vectorized import SLOTS_PER_ROUND, plan_arrays, simulate_fights
+
+# Metrics compared between candidates, in the order of the per-fight value rows
+COMPARED_METRICS = (
+    "attacker_victory_percentage",
+    "defender_victory_percentage",
+    "no_victory_percentage",
+    "average_attacker_remaining_hp",
+    "average_defender_remaining_hp",
+    "average_rounds",
+)
+
+# Maximum number of fights sharing one roll table, to bound memory use
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+
+class RollTable(namedtuple("RollTable", ["hit", "crit", "guard"], defaults=(None,))):
+    """
+    Pre-drawn d100 rolls of a set of fights, usable as a simulate_fights roll source.
+
+    Attributes:
+        hit (numpy.ndarray): Hit rolls, shape (rounds, 3, fights)
+        crit (numpy.ndarray): Critical hit rolls, shape (rounds, 3, fights)
+        guard (numpy.ndarray): Rolls of targets negating hits, shape
+            (rounds, 3, fights), or None when no target can negate a hit
+
+    The roll of a strike only depends on its fight, round and slot, so every
+    matchup simulated with the same table sees the same dice.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def draw(cls, rng, fights, max_rounds=10, antithetic=False, slots=SLOTS_PER_ROUND,
+             guarded=False):
+        """
+        Draw the rolls of a set of fights.
+
+        Args:
+            rng (numpy.random.Generator): Random generator
+            fights (int): Number of fights
+            max_rounds (int): Number of rounds per fight
+            antithetic (bool): Make the second half of the fights mirror the
+                first half (a roll r becomes 101 - r)
+            slots (int): Strike slots per round (more when skills add strikes)
+            guarded (bool): Also draw the rolls of targets negating hits
+
+        Returns:
+            RollTable: Rolls of every fight
+        """
+        if antithetic and fights % 2:
+            raise ValueError("Antithetic pairing needs an even number of fights")
+
+        drawn = fights // 2 if antithetic else fights
+        tables = []
+        for _ in range(3 if guarded else 2):
+            rolls = rng.integers(1, 101, (max_rounds, slots, drawn), dtype=np.int16)
+            if antithetic:
+                rolls = np.concatenate([rolls, 101 - rolls], axis=2)
+            tables.append(rolls)
+
+        return cls(*tables)
+
+    def __call__(self, round_index, slot, lanes):
+        """
+        Get the rolls of one strike slot for the given fights.
+
+        Args:
+            round_index (int): Round of the strike
+            slot (int): Strike slot within the round
+            lanes (numpy.ndarray): Fights still in progress
+
+        Returns:
+            tuple: (hit_rolls, crit_rolls) of the fights, followed by their
+            guard_rolls when the table has them
+        """
+        rolls = (self.hit[round_index, slot][lanes], self.crit[round_index, slot][lanes])
+        if self.guard is None:
+            return rolls
+        return rolls + (self.guard[round_index, slot][lanes],)
+
+
+class _RunningMoments:
+    """Mean and sum of squared deviations of several series, merged chunk by chunk."""
+
+    def __init__(self, series):
+        self.count = 0
+        self.mean = np.zeros(series)
+        self.m2 = np.zeros(series)
+
+    def update(self, values):
+        """
+        Add observations.
+
+        Args:
+            values (numpy.ndarray): Observations, shape (series, observations)
+        """
+        count = values.shape[1]
+        mean = values.mean(axis=1)
+        m2 = ((values - mean[:, None]) ** 2).sum(axis=1)
+
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def variance_of_mean(self):
+        """Sample variance of each series' mean."""
+        if self.count < 2:
+            return np.full_like(self.mean, np.inf)
+        return self.m2 / (self.count - 1) / self.count
+
+
+def fight_values(batch):
+    """
+    Get the per-fight value of every compared metric.
+
+    Victories are scaled to 100, so the mean of each row is the matching
+    percentage or average of predict_battle_outcome.
+
+    Args:
+        batch (FightBatch): Per-battle results
+
+    Returns:
+        numpy.ndarray: Values, shape (len(COMPARED_METRICS), fights)
+    """
+    return np.stack([
+        (batch.winner == ATTACKER) * 100.0,
+        (batch.winner == DEFENDER) * 100.0,
+        (batch.winner == NO_VICTORY) * 100.0,
+        batch.attacker_hp.astype(np.float64),
+        batch.defender_hp.astype(np.float64),
+        batch.rounds.astype(np.float64),
+    ])
+
+
+def compare_loadouts(candidates, iterations=10000, baseline=0, antithetic=False,
+                     confidence=0.95, max_rounds=10, seed=None, terrain=None,
+                     chunk_size=DEFAULT_CHUNK_SIZE, distance=None):
+    """
+    Compare candidate matchups on common random numbers.
+
+    Every candidate is simulated against the same dice rolls, and each metric
+    is compared to the baseline candidate fight by fight.
+
+    Args:
+        candidates: List of (attacker, defender) pairs, e.g. one per loadout
+        iterations: Number of simulations per candidate
+        baseline: Index of the candidate the others are compared to
+        antithetic: Pair every fight with one using mirrored rolls
+        confidence: Confidence level of the difference intervals
+        max_rounds: Number of rounds after which a battle is a draw
+        seed: Seed for the random generator
+        terrain: Terrain effects
+        chunk_size: Maximum number of fights sharing one roll table
+        distance: Distance between the characters in tiles (see Battle)
+
+    Returns:
+        dict: "results" (outcome statistics of each candidate, as in
+        predict_battle_outcome) and "differences" (for each candidate, a dict
+        per metric with the paired "difference" from the baseline, its
+        "variance", "standard_error", "confidence_interval" and the
+        "independent_variance" two separate runs would have had), plus
+        "baseline", "iterations", "antithetic" and "confidence"
+    """
+    if antithetic and iterations % 2:
+        raise ValueError("Antithetic pairing needs an even number of iterations")
+
+    matchups = []
+    for attacker, defender in candidates:
+        attacker = CombatSnapshot.from_character(attacker)
+        defender = CombatSnapshot.from_character(defender)
+        params = plan_arrays([build_exchange_plan(attacker, defender, terrain, distance)])
+        matchups.append((params, attacker.current_hp, defender.current_hp))
+
+    rng = np.random.default_rng(seed)
+    slots = max(params.slots.shape[1] for params, _, _ in matchups)
+    guarded = any(params.negate is not None for params, _, _ in matchups)
+    if antithetic:
+        chunk_size = max(2, chunk_size - chunk_size % 2)
+
+    totals = [OutcomeTotals.empty() for _ in matchups]
+    values_moments = [_RunningMoments(len(COMPARED_METRICS)) for _ in matchups]
+    difference_moments = [_RunningMoments(len(COMPARED_METRICS)) for _ in matchups]
+
+    remaining = iterations
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        rolls = RollTable.draw(rng, size, max_rounds, antithetic, slots, guarded)
+
+        values = []
+        for i, (params, attacker_hp, defender_hp) in enumerate(matchups):
+            batch = simulate_fights(params, attacker_hp, defender_hp, size, max_rounds,
+                                    rolls=rolls)
+            totals[i] = totals[i].merge(batch.totals())
+            values.append(fight_values(batch))
+            values_moments[i].update(values[i])
+
+        for i, candidate_values in enumerate(values):
+            differences = candidate_values - values[baseline]
+            if antithetic:
+                # Mirrored fights are not independent, so each pair counts once
+                half = size // 2
+                differences = (differences[:, :half] + differences[:, half:]) / 2
+            difference_moments[i].update(differences)
+
+        remaining -= size
+
+    z = z_score(confidence)
+    independent = [moments.variance_of_mean() for moments in values_moments]
+
+    comparisons = []
+    for i, moments in enumerate(difference_moments):
+        variance = moments.variance_of_mean() if i != baseline else np.zeros(len(COMPARED_METRICS))
+        comparison = {}
+        for m, metric in enumerate(COMPARED_METRICS):
+            difference = float(moments.mean[m])
+            standard_error = math.sqrt(variance[m])
+            comparison[metric] = {
+                "difference": difference,
+                "variance": float(variance[m]),
+                "standard_error": standard_error,
+                "confidence_interval": (difference - z * standard_error,
+                                        difference + z * standard_error),
+                "independent_variance": float(independent[i][m] + independent[baseline][m])
+                if i != baseline else 0.0,
+            }
+        comparisons.append(comparison)
+
+    return {
+        "results": [candidate_totals.to_results() for candidate_totals in totals],
+        "differences": comparisons,
+        "baseline": baseline,
+        "iterations": iterations,
+        "antithetic": antithetic,
+        "confidence": confidence,
+    }
@@ -0,0 +1,123 @@
+"""
+Confidence interval utilities for Fire Emblem Combat Simulator.
+"""
+import math
+
+# Coefficients of Acklam's rational approximation of the normal quantile
+_CENTRAL_NUMERATOR = (-3.969683028665376e+01, 2.209460984245205e+02, -2.759285104469687e+02,
+                      1.383577518672690e+02, -3.066479806614716e+01, 2.506628277459239e+00)
+_CENTRAL_DENOMINATOR = (-5.447609879822406e+01, 1.615858368580409e+02, -1.556989798598866e+02,
+                        6.680131188771972e+01, -1.328068155288572e+01, 1.0)
+_TAIL_NUMERATOR = (-7.784894002430293e-03, -3.223964580411365e-01, -2.400758277161838e+00,
+                   -2.549732539343734e+00, 4.374664141464968e+00, 2.938163982698783e+00)
+_TAIL_DENOMINATOR = (7.784695709041462e-03, 3.224671290700398e-01, 2.445134137142996e+00,
+                     3.754408661907416e+00, 1.0)
+
+
+def _polynomial(coefficients, x):
+    """Evaluate a polynomial given its coefficients, highest degree first."""
+    value = 0.0
+    for coefficient in coefficients:
+        value = value * x + coefficient
+    return value
+
+
+def normal_quantile(probability):
+    """
+    Get the quantile of the standard normal distribution.
+
+    Acklam's rational approximation, refined by one Newton step on math.erf,
+    is accurate to double precision (statistics.NormalDist needs Python 3.8).
+
+    Args:
+        probability (float): Cumulative probability between 0 and 1
+
+    Returns:
+        float: Value below which the given share of the distribution lies
+    """
+    if not 0 < probability < 1:
+        raise ValueError("Probability must be between 0 and 1")
+
+    if 0.02425 <= probability <= 0.97575:
+        q = probability - 0.5
+        r = q * q
+        x = q * _polynomial(_CENTRAL_NUMERATOR, r) / _polynomial(_CENTRAL_DENOMINATOR, r)
+    else:
+        q = math.sqrt(-2 * math.log(min(probability, 1 - probability)))
+        x = _polynomial(_TAIL_NUMERATOR, q) / _polynomial(_TAIL_DENOMINATOR, q)
+        if probability > 0.5:
+            x = -x
+
+    # Error of the cumulative probability, read from the nearer tail to keep precision
+    if x <= 0:
+        error = 0.5 * math.erfc(-x / math.sqrt(2)) - probability
+    else:
+        error = (1 - probability) - 0.5 * math.erfc(x / math.sqrt(2))
+    return x - error * math.sqrt(2 * math.pi) * math.exp(x * x / 2)
+
+
+def z_score(confidence=0.95):
+    """
+    Get the two-sided standard normal critical value for a confidence level.
+
+    Args:
+        confidence (float): Confidence level between 0 and 1
+
+    Returns:
+        float: Critical value (about 1.96 for 95% confidence)
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("Confidence level must be between 0 and 1")
+
+    return normal_quantile(0.5 + confidence / 2)
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """
+    Compute the Wilson score interval of a binomial proportion.
+
+    Unlike the normal approximation, the interval stays inside [0, 1] and keeps
+    a sensible width when no or every trial is a success.
+
+    Args:
+        successes (int): Number of successes
+        trials (int): Number of trials
+        confidence (float): Confidence level between 0 and 1
+
+    Returns:
+        tuple: (lower, upper) bounds of the proportion
+    """
+    if trials <= 0:
+        return 0.0, 1.0
+
+    z = z_score(confidence)
+    z2 = z * z
+    proportion = successes / trials
+
+    denominator = 1 + z2 / trials
+    center = (proportion + z2 / (2 * trials)) / denominator
+    margin = (z / denominator) * math.sqrt(
+        proportion * (1 - proportion) / trials + z2 / (4 * trials * trials)
+    )
+
+    # The bounds are exact at the edges; avoid rounding errors there
+    lower = 0.0 if successes == 0 else max(0.0, center - margin)
+    upper = 1.0 if successes == trials else min(1.0, center + margin)
+
+    return lower, upper
+
+
+def required_trials(proportion, half_width, confidence=0.95):
+    """
+    Estimate the number of trials needed for an interval of a given half-width.
+
+    Args:
+        proportion (float): Expected proportion
+        half_width (float): Target half-width of the interval, as a proportion
+        confidence (float): Confidence level between 0 and 1
+
+    Returns:
+        int: Estimated number of trials
+    """
+    z = z_score(confidence)
+    return math.ceil(z * z * proportion * (1 - proportion) / (half_width * half_width))
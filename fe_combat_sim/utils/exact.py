@@ -0,0 +1,140 @@
+"""
+Exact battle outcome prediction for Fire Emblem Combat Simulator.
+Instead of sampling fights, these functions walk the hit/crit/miss tree over
+(attacker HP, defender HP) states and return exact outcome probabilities.
+"""
+from collections import defaultdict
+
+from fe_combat_sim.utils.exchange import ATTACKER, build_exchange_plan
+
+
+def strike_outcomes(plan, side):
+    """
+    List the possible results of a single strike.
+
+    Args:
+        plan (ExchangePlan): Exchange plan of the battle
+        side (int): Striking side (ATTACKER or DEFENDER)
+
+    Returns:
+        list: (probability, damage) pairs for a miss or negated hit, normal hit
+        and critical hit
+    """
+    hit = plan.hit[side] / 100
+    crit = plan.crit[side] / 100
+    damage = plan.damage[side]
+    landed = hit * (1 - plan.negate[side] / 100) if damage else hit
+
+    outcomes = [
+        (1 - landed, 0),
+        (landed * (1 - crit), damage),
+        (landed * crit, damage * 3),
+    ]
+    return [(probability, dealt) for probability, dealt in outcomes if probability > 0]
+
+
+def solve_exchange(plan, attacker_hp, defender_hp, max_rounds=10):
+    """
+    Compute the exact outcome distribution of a battle described by a plan.
+
+    Args:
+        plan (ExchangePlan): Exchange plan of the battle
+        attacker_hp (int): Attacker's HP at the start of the battle
+        defender_hp (int): Defender's HP at the start of the battle
+        max_rounds (int): Number of rounds after which the battle is a draw
+
+    Returns:
+        dict: Exact outcome probabilities and expected values
+    """
+    outcomes = [strike_outcomes(plan, side) for side in (0, 1)]
+
+    results = {
+        "attacker_victory_probability": 0.0,
+        "defender_victory_probability": 0.0,
+        "no_victory_probability": 0.0,
+        "average_attacker_remaining_hp": 0.0,
+        "average_defender_remaining_hp": 0.0,
+        "average_rounds": 0.0
+    }
+
+    states = {(attacker_hp, defender_hp): 1.0}
+
+    for round_number in range(1, max_rounds + 1):
+        for side in plan.order:
+            next_states = defaultdict(float)
+
+            for (a_hp, d_hp), probability in states.items():
+                for chance, dealt in outcomes[side]:
+                    p = probability * chance
+
+                    if side == ATTACKER:
+                        d_left = max(0, d_hp - dealt)
+                        if d_left <= 0:
+                            results["attacker_victory_probability"] += p
+                            results["average_attacker_remaining_hp"] += p * a_hp
+                            results["average_rounds"] += p * round_number
+                        else:
+                            next_states[(a_hp, d_left)] += p
+                    else:
+                        a_left = max(0, a_hp - dealt)
+                        if a_left <= 0:
+                            results["defender_victory_probability"] += p
+                            results["average_defender_remaining_hp"] += p * d_hp
+                            results["average_rounds"] += p * round_number
+                        else:
+                            next_states[(a_left, d_hp)] += p
+
+            states = next_states
+
+    # Whatever is still standing after the last round is inconclusive
+    for (a_hp, d_hp), probability in states.items():
+        results["no_victory_probability"] += probability
+        results["average_attacker_remaining_hp"] += probability * a_hp
+        results["average_defender_remaining_hp"] += probability * d_hp
+        results["average_rounds"] += probability * max_rounds
+
+    return results
+
+
+def predict_battle_outcome_exact(attacker, defender, max_rounds=10, terrain=None,
+                                 distance=None):
+    """
+    Predict the exact outcome of a battle without Monte Carlo sampling.
+
+    The result uses the same keys as predict_battle_outcome for percentages and
+    averages. Victory counts are omitted since no fights are sampled.
+
+    Args:
+        attacker: The attacking character
+        defender: The defending character
+        max_rounds: Number of rounds after which the battle is a draw
+        terrain: Terrain effects
+        distance: Distance between the characters in tiles (see Battle)
+
+    Returns:
+        dict: Exact battle outcome statistics
+    """
+    plan = build_exchange_plan(attacker, defender, terrain, distance)
+    solution = solve_exchange(plan, attacker.current_hp, defender.current_hp, max_rounds)
+
+    return solution_to_results(solution)
+
+
+def solution_to_results(solution):
+    """
+    Convert exact outcome probabilities to the keys of predict_battle_outcome.
+
+    Args:
+        solution (dict): Result of solve_exchange, with scalar or array values
+
+    Returns:
+        dict: Victory percentages and averages
+    """
+    return {
+        "attacker_victory_percentage": solution["attacker_victory_probability"] * 100,
+        "defender_victory_percentage": solution["defender_victory_probability"] * 100,
+        "no_victory_percentage": solution["no_victory_probability"] * 100,
+        "average_attacker_remaining_hp": solution["average_attacker_remaining_hp"],
+        "average_defender_remaining_hp": solution["average_defender_remaining_hp"],
+        "average_rounds": solution["average_rounds"]
+    }
@@ -0,0 +1,118 @@
+"""
+Exchange planning utilities for Fire Emblem Combat Simulator.
+An exchange plan captures everything a prediction engine needs to know about
+one round of combat between two characters, without touching their HP.
+"""
+import random
+from collections import namedtuple
+
+from fe_combat_sim.combat.battle import Battle
+
+# Sides of an exchange, used to index the per-side tuples of a plan
+ATTACKER = 0
+DEFENDER = 1
+
+# Winner of a battle still undecided after the round limit
+NO_VICTORY = 2
+
+
+class ExchangePlan(namedtuple("ExchangePlan", ["hit", "crit", "damage", "order", "negate"],
+                              defaults=((0, 0),))):
+    """
+    Per-side combat parameters of a single round.
+
+    Attributes:
+        hit (tuple): Hit rate percentage of each side
+        crit (tuple): Critical hit rate percentage of each side
+        damage (tuple): Non-critical damage dealt by each side
+        order (tuple): Sides striking in a round, in the order of Battle.simulate_round
+            (skills such as Vantage or a Brave weapon included)
+        negate (tuple): Percentage chance that the target negates the damage
+            of each hit of each side (Pavise), rolled after the critical roll
+    """
+    __slots__ = ()
+
+
+class FightOutcome(namedtuple("FightOutcome", ["winner", "rounds", "attacker_hp", "defender_hp"])):
+    """
+    Result of one sampled battle.
+
+    Attributes:
+        winner (int): ATTACKER, DEFENDER or NO_VICTORY
+        rounds (int): Rounds fought
+        attacker_hp (int): Attacker's remaining HP
+        defender_hp (int): Defender's remaining HP
+    """
+    __slots__ = ()
+
+
+def build_exchange_plan(attacker, defender, terrain=None, distance=None):
+    """
+    Build the exchange plan for a battle between two characters.
+
+    The plan is read from the battle's combat profiles and strike order, so it
+    uses the same rules as Battle.simulate_round, skills changing them
+    included. A character without a weapon is treated as unable to attack
+    (hit rate 0, damage 0), and a side whose weapon does not reach the distance
+    does not strike at all. A target's chance to negate hits (Pavise) is
+    part of the plan; skills guarding hits in any other way cannot be planned.
+
+    Args:
+        attacker (Character): Attacking character
+        defender (Character): Defending character
+        terrain (dict, optional): Terrain effects
+        distance (int, optional): Distance between the characters in tiles
+            (see Battle)
+
+    Returns:
+        ExchangePlan: Combat parameters of one round
+    """
+    battle = Battle(attacker, defender, terrain, distance=distance)
+    profiles = battle.profiles
+
+    for side in (ATTACKER, DEFENDER):
+        if len(battle.guards[side]) > len(battle.negates[side]) or len(battle.negates[side]) > 1:
+            raise ValueError("Only one skill negating hits per side can be predicted; "
+                             "other guarding skills only act in Battle")
+
+    return ExchangePlan(
+        tuple(profile.hit for profile in profiles),
+        tuple(profile.crit for profile in profiles),
+        tuple(profile.damage for profile in profiles),
+        battle.order,
+        tuple(min(100, max(0, sum(battle.negates[1 - side]))) for side in (ATTACKER, DEFENDER))
+    )
+
+
+def sample_exchange(plan, attacker_hp, defender_hp, max_rounds=10, rng=random):
+    """
+    Sample one battle described by a plan, rolling dice like Battle does.
+
+    Args:
+        plan (ExchangePlan): Exchange plan of the battle
+        attacker_hp (int): Attacker's starting HP
+        defender_hp (int): Defender's starting HP
+        max_rounds (int): Number of rounds after which the battle is a draw
+        rng: Source of randint, such as the random module or a random.Random
+
+    Returns:
+        FightOutcome: Result of the battle
+    """
+    hp = [attacker_hp, defender_hp]
+
+    for round_number in range(1, max_rounds + 1):
+        for side in plan.order:
+            target = 1 - side
+
+            if rng.randint(1, 100) <= plan.hit[side]:
+                damage = plan.damage[side]
+                if rng.randint(1, 100) <= plan.crit[side]:
+                    damage *= 3
+                if damage and plan.negate[side] and rng.randint(1, 100) <= plan.negate[side]:
+                    damage = 0
+                hp[target] = max(0, hp[target] - damage)
+
+            if hp[target] <= 0:
+                return FightOutcome(side, round_number, hp[ATTACKER], hp[DEFENDER])
+
+    return FightOutcome(NO_VICTORY, max_rounds, hp[ATTACKER], hp[DEFENDER])
@@ -0,0 +1,160 @@
+"""
+Forecast caching utilities for Fire Emblem Combat Simulator.
+Damage forecasts only depend on a handful of combat stats, so repeated requests
+for the same matchup can be answered from a bounded LRU cache.
+"""
+import threading
+from collections import OrderedDict
+
+from fe_combat_sim.combat.skills import unit_skills
+from fe_combat_sim.data.terrain import resolve_terrain
+from fe_combat_sim.utils.prediction import predict_damage
+
+# Stats read by the hit, crit and damage formulas (HP only affects the forecast
+# of a unit with skills)
+FORECAST_STATS = ("str", "mag", "skl", "spd", "lck", "def", "res")
+
+
+def weapon_key(weapon):
+    """
+    Build the part of a forecast key describing a weapon.
+
+    Args:
+        weapon (Weapon): Weapon to describe, or None
+
+    Returns:
+        tuple: Might, hit, crit, type, range and effectiveness of the weapon
+    """
+    if weapon is None:
+        return None
+    return (weapon.might, weapon.hit, weapon.crit, weapon.weapon_type, tuple(weapon.range),
+            tuple(sorted(weapon.effective_against)))
+
+
+def unit_key(character):
+    """
+    Build the part of a forecast key describing one character.
+
+    Args:
+        character (Character): Character to describe
+
+    Returns:
+        tuple: Combat stats, class types, weapon and skills of the character
+    """
+    class_types = character.character_class.class_types if character.character_class else []
+    skills = tuple(skill.name for skill in unit_skills(character))
+    return (
+        tuple(character.stats.get(stat, 0) for stat in FORECAST_STATS),
+        tuple(sorted(class_types)),
+        weapon_key(character.weapon),
+        skills,
+        # Skills such as Wrath only apply at some HP
+        character.current_hp if skills else None
+    )
+
+
+def forecast_key(attacker, defender, terrain=None, distance=None):
+    """
+    Build the canonical key of a damage forecast.
+
+    The defender's weapon is part of the key because it decides the weapon
+    triangle bonus.
+
+    Args:
+        attacker (Character): Attacking character
+        defender (Character): Defending character
+        terrain (optional): Terrain, as accepted by Battle
+        distance (int, optional): Distance between the characters in tiles
+
+    Returns:
+        tuple: Hashable key of every input that affects the forecast
+    """
+    # Healing and tile names do not affect a forecast
+    terrain_key = tuple(tile[1:4] for tile in resolve_terrain(terrain))
+    return unit_key(attacker), unit_key(defender), terrain_key, distance
+
+
+class ForecastCache:
+    """Bounded, thread-safe LRU cache of predict_damage results."""
+
+    def __init__(self, maxsize=4096):
+        """
+        Initialize a forecast cache.
+
+        Args:
+            maxsize (int): Maximum number of forecasts kept
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def predict_damage(self, attacker, defender, terrain=None, distance=None):
+        """
+        Predict damage like predict_damage, reusing cached forecasts.
+
+        Args:
+            attacker: The attacking character
+            defender: The defending character
+            terrain: Terrain effects
+            distance: Distance between the characters in tiles (see Battle)
+
+        Returns:
+            dict: Damage prediction information (a copy the caller may modify)
+        """
+        key = forecast_key(attacker, defender, terrain, distance)
+
+        with self._lock:
+            forecast = self._entries.get(key)
+            if forecast is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(forecast)
+            self.misses += 1
+
+        forecast = predict_damage(attacker, defender, terrain, distance)
+
+        with self._lock:
+            self._entries[key] = forecast
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return dict(forecast)
+
+    def invalidate(self, character=None):
+        """
+        Drop cached forecasts.
+
+        Args:
+            character (Character, optional): Only drop forecasts involving a unit
+                with this character's current combat stats; drops everything if None
+        """
+        with self._lock:
+            if character is None:
+                self._entries.clear()
+                return
+
+            unit = unit_key(character)
+            for key in [key for key in self._entries if unit in key[:2]]:
+                del self._entries[key]
+
+    def info(self):
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Hits, misses, current size and maximum size
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize
+            }
+
+    def __len__(self):
+        """Number of cached forecasts."""
+        return len(self._entries)
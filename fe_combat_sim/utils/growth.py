@@ -0,0 +1,332 @@
+"""
+Growth-aware battle prediction for Fire Emblem Combat Simulator.
+Instead of predicting a battle for one random roll of a template's level-ups,
+these functions average the exact outcome over the whole distribution of stats
+implied by the template's growth rates.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from fe_combat_sim.data import (
+    CHARACTER_TEMPLATES, PLAINS, WEAPON_RANGES, attack_mask, get_weapon, resolve_terrain
+)
+from fe_combat_sim.data.ranges import UNARMED_RANGE
+from fe_combat_sim.utils.exact import solution_to_results
+from fe_combat_sim.utils.stats import growth_distribution
+from fe_combat_sim.utils.unit_table import strike_slots, weapon_tables
+from fe_combat_sim.utils.vectorized import LaneParameters, exact_outcomes_marginal
+
+# Combat terms of each side, as columns of a term array (side 0 is the attacker)
+ACCURACY = (0, 1)   # Weapon hit + skl * 2 + lck // 2, before the weapon triangle
+HIT = (2, 3)
+CRIT = (4, 5)
+SPEED = 6           # Attacker spd - defender spd, then -5, 0 or 5 once finished
+TERM_COUNT = 7
+
+# Total probability of the stat combinations that may be dropped
+DEFAULT_TOLERANCE = 1e-6
+
+
+class TemplateUnit(namedtuple("TemplateUnit", ["template_name", "level", "weapon_name"])):
+    """
+    A unit described by its template and level rather than by rolled stats.
+
+    Attributes:
+        template_name (str): Name of the character template
+        level (int): Level of the unit
+        weapon_name (str): Name of the equipped weapon, or None
+    """
+    __slots__ = ()
+
+    def __new__(cls, template_name, level=1, weapon_name=None):
+        if template_name not in CHARACTER_TEMPLATES:
+            raise ValueError(f"Template '{template_name}' not found")
+        return super().__new__(cls, template_name, level, weapon_name)
+
+    @property
+    def character_class(self):
+        """Character class of the template."""
+        return CHARACTER_TEMPLATES[self.template_name]["class"]
+
+    @property
+    def weapon(self):
+        """Equipped weapon, or None."""
+        return get_weapon(self.weapon_name) if self.weapon_name else None
+
+    def stat_distributions(self):
+        """
+        Get the exact distribution of each stat at the unit's level.
+
+        Returns:
+            dict: Probability of each value, for each stat
+        """
+        template = CHARACTER_TEMPLATES[self.template_name]
+        levels = max(0, self.level - 1)
+        return {
+            stat: growth_distribution(base, template["growth_rates"].get(stat, 0), levels)
+            for stat, base in template["stats"].items()
+        }
+
+
+def _unit_distributions(unit):
+    """
+    Get the stat distributions of a template unit or a fixed character.
+
+    A character's stats are certain, and its current HP is used as its HP.
+    """
+    if isinstance(unit, TemplateUnit):
+        return unit.stat_distributions()
+
+    distributions = {stat: {value: 1.0} for stat, value in unit.stats.items()}
+    distributions["hp"] = {unit.current_hp: 1.0}
+    return distributions
+
+
+def damage_distribution(striker, target, target_terrain=PLAINS):
+    """
+    Compute the distribution of the non-critical damage a unit deals to another.
+
+    Mirrors Battle._calculate_damage. Damage only depends on str or mag and
+    def or res, so it is independent of the hit and crit terms.
+
+    Args:
+        striker (TemplateUnit or Character): Striking unit
+        target (TemplateUnit or Character): Targeted unit
+        target_terrain (Terrain): Tile of the target
+
+    Returns:
+        dict: Probability of each damage value
+    """
+    weapon = striker.weapon
+    if weapon is None:
+        return {0: 1.0}
+
+    physical = weapon.is_physical()
+    attack = _unit_distributions(striker).get("str" if physical else "mag", {0: 1.0})
+    defense = _unit_distributions(target).get("def" if physical else "res", {0: 1.0})
+    multiplier = weapon.get_effectiveness_multiplier(target)
+    bonus = target_terrain.defense if physical else target_terrain.resistance
+
+    distribution = {}
+    for attack_value, attack_probability in attack.items():
+        for defense_value, defense_probability in defense.items():
+            dealt = int(max(0, attack_value + weapon.might - defense_value - bonus) * multiplier)
+            distribution[dealt] = distribution.get(dealt, 0) + attack_probability * defense_probability
+
+    return distribution
+
+
+def _fold_steps(attacker, defender, terrain=None):
+    """
+    Plan how skl, lck and spd are folded into the hit, crit and follow-up terms.
+
+    The order is chosen so each term is finished (clamped to a rate) as soon as
+    its last stat is in, which lets combinations merge early. The finishing
+    rules mirror Battle._calculate_hit_rate, Battle._calculate_crit_rate and
+    Battle._can_perform_follow_up.
+
+    Args:
+        attacker (TemplateUnit or Character): Attacking unit
+        defender (TemplateUnit or Character): Defending unit
+        terrain (optional): Terrain, as accepted by Battle
+
+    Returns:
+        list: (side, stat, contributions, finish) tuples, where contributions
+        lists (term, function of the stat values) pairs and finish is a list of
+        functions applied to the term array once the stat is folded in
+    """
+    units = (attacker, defender)
+    weapons = (attacker.weapon, defender.weapon)
+    armed = [weapon is not None for weapon in weapons]
+    tiles = resolve_terrain(terrain)
+
+    bonus = [0, 0]
+    for side in (0, 1):
+        if armed[side] and armed[1 - side]:
+            target = units[1 - side]
+            triangle, _, _ = weapon_tables([weapons[side]], [target.weapon], [target.character_class])
+            bonus[side] = int(triangle[0, 0])
+
+    def finish_accuracy(side):
+        def finish(terms):
+            accuracy = weapons[side].hit + terms[:, ACCURACY[side]] + bonus[side]
+            if bonus[side] < 0:
+                accuracy = np.maximum(0, accuracy)
+            terms[:, HIT[side]] += accuracy
+            terms[:, ACCURACY[side]] = 0
+        return finish
+
+    def finish_hit(side):
+        def finish(terms):
+            terms[:, HIT[side]] = np.clip(terms[:, HIT[side]] - tiles[1 - side].avoid, 0, 100)
+        return finish
+
+    def finish_crit(side):
+        def finish(terms):
+            terms[:, CRIT[side]] = np.clip(weapons[side].crit + terms[:, CRIT[side]], 0, 100)
+        return finish
+
+    def finish_speed(terms):
+        speed = terms[:, SPEED]
+        terms[:, SPEED] = np.where(speed >= 5, 5, np.where(speed <= -5, -5, 0))
+
+    def when(condition, *items):
+        return [item for item in items if condition]
+
+    steps = []
+    for side in (0, 1):
+        other = 1 - side
+        steps.append((side, "skl", when(armed[side],
+                                        (ACCURACY[side], lambda v: v * 2),
+                                        (CRIT[side], lambda v: v // 2)),
+                      when(side == 1 and armed[side], finish_crit(side))))
+        steps.append((side, "lck",
+                      when(armed[side], (ACCURACY[side], lambda v: v // 2))
+                      + when(armed[other], (HIT[other], lambda v: -v), (CRIT[other], lambda v: -v)),
+                      when(armed[side], finish_accuracy(side))
+                      + when(side == 1 and armed[other], finish_crit(other))))
+
+    steps.append((0, "spd", [(SPEED, lambda v: v)] + when(armed[1], (HIT[1], lambda v: -2 * v)), []))
+    steps.append((1, "spd", [(SPEED, lambda v: -v)] + when(armed[0], (HIT[0], lambda v: -2 * v)),
+                  when(armed[0], finish_hit(0)) + when(armed[1], finish_hit(1)) + [finish_speed]))
+
+    return steps
+
+
+def _merge(terms, probabilities):
+    """
+    Merge identical combinations, adding up their probabilities.
+
+    Returns:
+        tuple: (distinct combinations, probability of each)
+    """
+    low = terms.min(axis=0)
+    spans = terms.max(axis=0) - low + 1
+
+    if np.prod(spans.astype(np.float64)) < 2.0 ** 62:
+        keys = np.ravel_multi_index(tuple((terms - low).T), tuple(spans))
+        keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        distinct = terms[first]
+    else:
+        distinct, inverse = np.unique(terms, axis=0, return_inverse=True)
+
+    return distinct, np.bincount(inverse.ravel(), weights=probabilities, minlength=len(distinct))
+
+
+def _prune(terms, probabilities, budget):
+    """
+    Drop the least likely combinations, up to a total probability of budget.
+
+    Returns:
+        tuple: (kept combinations, their probabilities, probability dropped)
+    """
+    order = np.argsort(probabilities, kind="stable")
+    dropped = np.searchsorted(np.cumsum(probabilities[order]), budget, side="right")
+    if not dropped:
+        return terms, probabilities, 0.0
+
+    keep = np.sort(order[dropped:])
+    return terms[keep], probabilities[keep], float(probabilities[order[:dropped]].sum())
+
+
+def combat_term_distribution(attacker, defender, terrain=None, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compute the joint distribution of the hit, crit and follow-up terms of a battle.
+
+    skl, lck and spd are folded in one at a time. After each one, combinations
+    with equal terms are merged and the least likely are dropped, keeping the total
+    probability dropped under tolerance.
+
+    Args:
+        attacker (TemplateUnit or Character): Attacking unit
+        defender (TemplateUnit or Character): Defending unit
+        terrain (optional): Terrain, as accepted by Battle
+        tolerance (float): Total probability of the combinations that may be dropped
+
+    Returns:
+        tuple: (finished combat terms, shape (combinations, TERM_COUNT);
+        probability of each combination; total probability dropped)
+    """
+    distributions = (_unit_distributions(attacker), _unit_distributions(defender))
+    steps = _fold_steps(attacker, defender, terrain)
+
+    terms = np.zeros((1, TERM_COUNT), dtype=np.int32)
+    probabilities = np.ones(1)
+    pruned = 0.0
+
+    for side, stat, contributions, finish in steps:
+        distribution = distributions[side].get(stat, {0: 1.0})
+        if contributions:
+            values = np.array(list(distribution), dtype=np.int32)
+            chances = np.array(list(distribution.values()))
+
+            added = np.zeros((len(values), TERM_COUNT), dtype=np.int32)
+            for term, contribution in contributions:
+                added[:, term] += contribution(values)
+
+            terms = (terms[:, None, :] + added[None, :, :]).reshape(-1, TERM_COUNT)
+            probabilities = (probabilities[:, None] * chances[None, :]).ravel()
+
+        for function in finish:
+            function(terms)
+
+        terms, probabilities = _merge(terms, probabilities)
+        terms, probabilities, dropped = _prune(terms, probabilities,
+                                               (tolerance - pruned) / len(steps))
+        pruned += dropped
+
+    return terms, probabilities, pruned
+
+
+def predict_battle_outcome_growth(attacker, defender, max_rounds=10, terrain=None,
+                                  tolerance=DEFAULT_TOLERANCE, distance=None):
+    """
+    Predict the exact outcome of a battle, averaged over level-up randomness.
+
+    Each side is either a TemplateUnit, whose stats follow the binomial
+    distributions implied by its growth rates, or a Character with fixed stats.
+
+    Args:
+        attacker: The attacking TemplateUnit or Character
+        defender: The defending TemplateUnit or Character
+        max_rounds: Number of rounds after which a battle is a draw
+        terrain: Terrain, as accepted by Battle
+        tolerance: Total probability of the stat combinations that may be dropped
+        distance: Distance between the units in tiles (see Battle)
+
+    Returns:
+        dict: Battle outcome statistics with the keys of predict_battle_outcome
+        (method="exact"), plus "stat_combinations" (distinct hit, crit and
+        follow-up combinations solved, each for every HP and damage at once) and
+        "pruned_probability" (probability of the dropped stat combinations,
+        which the averages are renormalized to exclude)
+    """
+    terms, probabilities, pruned = combat_term_distribution(attacker, defender, terrain, tolerance)
+    tiles = resolve_terrain(terrain)
+
+    if distance is None:
+        distance = (attacker.weapon.range if attacker.weapon else UNARMED_RANGE)[0]
+    can_attack = bool(attack_mask(attacker.weapon) >> distance & 1)
+    can_counter = WEAPON_RANGES.can_counter(attacker.weapon, defender.weapon, distance)
+
+    params = LaneParameters(
+        terms[:, list(HIT)].T.astype(np.int16),
+        terms[:, list(CRIT)].T.astype(np.int16),
+        np.zeros((2, 1), dtype=np.int32),
+        strike_slots(np.full(len(terms), can_counter), terms[:, SPEED], can_attack)
+    )
+    solved = exact_outcomes_marginal(
+        params, _unit_distributions(attacker)["hp"], _unit_distributions(defender)["hp"],
+        damage_distribution(attacker, defender, tiles[1]),
+        damage_distribution(defender, attacker, tiles[0]),
+        max_rounds
+    )
+
+    weights = probabilities / probabilities.sum()
+    results = solution_to_results({key: float(np.dot(weights, values))
+                                   for key, values in solved.items()})
+    results["stat_combinations"] = len(terms)
+    results["pruned_probability"] = pruned
+
+    return results
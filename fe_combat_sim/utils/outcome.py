@@ -0,0 +1,117 @@
+"""
+Outcome aggregation utilities for Fire Emblem Combat Simulator.
+Sampling engines accumulate OutcomeTotals, which can be merged across chunks or
+workers and turned into the result dict of predict_battle_outcome.
+"""
+from collections import namedtuple
+
+from fe_combat_sim.utils.confidence import wilson_interval
+from fe_combat_sim.utils.exchange import ATTACKER, DEFENDER, NO_VICTORY
+
+# Victory count fields of OutcomeTotals and the matching result percentages
+OUTCOME_FIELDS = (
+    ("attacker_victories", "attacker_victory_percentage"),
+    ("defender_victories", "defender_victory_percentage"),
+    ("no_victory", "no_victory_percentage"),
+)
+
+
+class OutcomeTotals(namedtuple("OutcomeTotals", [
+        "attacker_victories", "defender_victories", "no_victory",
+        "attacker_hp", "defender_hp", "rounds", "iterations"])):
+    """
+    Running sums over a set of simulated battles.
+
+    Attributes:
+        attacker_victories (int): Battles won by the attacker
+        defender_victories (int): Battles won by the defender
+        no_victory (int): Battles still undecided after the round limit
+        attacker_hp (int): Sum of the attacker's remaining HP
+        defender_hp (int): Sum of the defender's remaining HP
+        rounds (int): Sum of the rounds fought
+        iterations (int): Number of simulated battles
+    """
+    __slots__ = ()
+
+    @classmethod
+    def empty(cls):
+        """
+        Create totals for zero battles.
+
+        Returns:
+            OutcomeTotals: Totals with every sum at 0
+        """
+        return cls(0, 0, 0, 0, 0, 0, 0)
+
+    @classmethod
+    def from_outcomes(cls, outcomes):
+        """
+        Aggregate individually sampled battles.
+
+        Outcomes are added as they arrive, so a generator of fights is summed
+        without ever holding them all.
+
+        Args:
+            outcomes (iterable): FightOutcome of each battle
+
+        Returns:
+            OutcomeTotals: Sums over the battles
+        """
+        victories = {ATTACKER: 0, DEFENDER: 0, NO_VICTORY: 0}
+        attacker_hp = defender_hp = rounds = iterations = 0
+        for outcome in outcomes:
+            victories[outcome.winner] += 1
+            attacker_hp += outcome.attacker_hp
+            defender_hp += outcome.defender_hp
+            rounds += outcome.rounds
+            iterations += 1
+        return cls(victories[ATTACKER], victories[DEFENDER], victories[NO_VICTORY],
+                   attacker_hp, defender_hp, rounds, iterations)
+
+    def merge(self, other):
+        """
+        Combine these totals with the totals of another set of battles.
+
+        Args:
+            other (OutcomeTotals): Totals to add
+
+        Returns:
+            OutcomeTotals: Combined totals
+        """
+        return OutcomeTotals(*(mine + theirs for mine, theirs in zip(self, other)))
+
+    def intervals(self, confidence=0.95):
+        """
+        Compute Wilson confidence intervals of each victory percentage.
+
+        Args:
+            confidence (float): Confidence level between 0 and 1
+
+        Returns:
+            dict: (lower, upper) percentage bounds keyed like the result percentages
+        """
+        intervals = {}
+        for count_field, percentage_key in OUTCOME_FIELDS:
+            lower, upper = wilson_interval(getattr(self, count_field), self.iterations, confidence)
+            intervals[percentage_key] = (lower * 100, upper * 100)
+        return intervals
+
+    def to_results(self):
+        """
+        Convert the totals to the result dict of predict_battle_outcome.
+
+        Returns:
+            dict: Battle outcome prediction statistics
+        """
+        iterations = self.iterations
+        return {
+            "attacker_victories": self.attacker_victories,
+            "defender_victories": self.defender_victories,
+            "no_victory": self.no_victory,
+            "average_attacker_remaining_hp": self.attacker_hp / iterations,
+            "average_defender_remaining_hp": self.defender_hp / iterations,
+            "average_rounds": self.rounds / iterations,
+            "attacker_victory_percentage": (self.attacker_victories / iterations) * 100,
+            "defender_victory_percentage": (self.defender_victories / iterations) * 100,
+            "no_victory_percentage": (self.no_victory / iterations) * 100
+        }
@@ -0,0 +1,102 @@
+"""
+Multi-core battle prediction for Fire Emblem Combat Simulator.
+Iterations are split into fixed-size blocks, each simulated with its own
+random stream spawned from one seed. Since blocks never depend on the number of
+workers, the same seed gives the same merged result on any machine.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fe_combat_sim.utils.exchange import build_exchange_plan
+from fe_combat_sim.utils.outcome import OutcomeTotals
+from fe_combat_sim.utils.vectorized import plan_arrays, simulate_fights
+
+# Number of battles simulated with each random stream
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+
+def block_sizes(iterations, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Split a number of iterations into blocks.
+
+    Args:
+        iterations (int): Total number of battles
+        block_size (int): Number of battles per block
+
+    Returns:
+        list: Size of each block, the last one possibly smaller
+    """
+    full_blocks, rest = divmod(iterations, block_size)
+    return [block_size] * full_blocks + ([rest] if rest else [])
+
+
+def simulate_block(plan, attacker_hp, defender_hp, iterations, max_rounds, seed_sequence):
+    """
+    Simulate one block of battles with its own random stream.
+
+    Args:
+        plan (ExchangePlan): Exchange plan of the battle
+        attacker_hp (int): Attacker's starting HP
+        defender_hp (int): Defender's starting HP
+        iterations (int): Number of battles in the block
+        max_rounds (int): Number of rounds after which a battle is a draw
+        seed_sequence (numpy.random.SeedSequence): Seed of the block's stream
+
+    Returns:
+        OutcomeTotals: Totals of the block
+    """
+    rng = np.random.default_rng(seed_sequence)
+    batch = simulate_fights(plan_arrays([plan]), attacker_hp, defender_hp,
+                            iterations, max_rounds, rng)
+    return batch.totals()
+
+
+def predict_battle_outcome_parallel(attacker, defender, iterations=100, workers=None, seed=None,
+                                    max_rounds=10, terrain=None, block_size=DEFAULT_BLOCK_SIZE,
+                                    distance=None):
+    """
+    Predict the outcome of a battle by spreading simulations across processes.
+
+    Args:
+        attacker: The attacking character
+        defender: The defending character
+        iterations: Number of simulations to run
+        workers: Number of worker processes (defaults to the number of CPUs);
+            1 runs every block in the calling process
+        seed: Seed of the root random stream; None draws fresh entropy
+        max_rounds: Number of rounds after which a battle is a draw
+        terrain: Terrain effects
+        block_size: Number of battles simulated with each random stream
+        distance: Distance between the characters in tiles (see Battle)
+
+    Returns:
+        dict: Battle outcome prediction statistics, as in predict_battle_outcome
+    """
+    plan = build_exchange_plan(attacker, defender, terrain, distance)
+    sizes = block_sizes(iterations, block_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    count = len(sizes)
+    arguments = (
+        [plan] * count,
+        [attacker.current_hp] * count,
+        [defender.current_hp] * count,
+        sizes,
+        [max_rounds] * count,
+        seeds
+    )
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or count <= 1:
+        block_totals = map(simulate_block, *arguments)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, count)) as executor:
+            block_totals = list(executor.map(simulate_block, *arguments))
+
+    totals = OutcomeTotals.empty()
+    for block in block_totals:
+        totals = totals.merge(block)
+
+    return totals.to_results()
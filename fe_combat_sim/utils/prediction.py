@@ -2,22 +2,28 @@
 Prediction utility functions for Fire Emblem Combat Simulator.
 These functions help analyze possible combat outcomes without actually performing the combat.
 """
-import random
 from fe_combat_sim.combat.battle import Battle
+from fe_combat_sim.combat.dice import CounterRandom
+from fe_combat_sim.combat.snapshot import CombatSnapshot
+from fe_combat_sim.utils.exact import predict_battle_outcome_exact
+from fe_combat_sim.utils.exchange import build_exchange_plan, sample_exchange
+from fe_combat_sim.utils.outcome import OutcomeTotals
 
-def predict_damage(attacker, defender):
+def predict_damage(attacker, defender, terrain=None, distance=None):
     """
     Predict the damage that an attacker would deal to a defender.
     
     Args:
         attacker: The attacking character
         defender: The defending character
+        terrain: Terrain effects
+        distance: Distance between the characters in tiles (see Battle)
         
     Returns:
         dict: Damage prediction information
     """
-    # Check if the attacker has a weapon
-    if not attacker.weapon:
+    # Check if the attacker has a weapon that reaches the defender
+    if not attacker.weapon or (distance is not None and not attacker.weapon.reaches(distance)):
         return {
             "min_damage": 0,
             "max_damage": 0,
@@ -27,34 +33,25 @@ def predict_damage(attacker, defender):
             "effectiveness": False
         }
     
-    # Create a temporary battle to use its calculation methods
-    temp_battle = Battle(attacker, defender)
+    # Read the characters once, so concurrent changes cannot mix into the result
+    attacker = CombatSnapshot.from_character(attacker)
+    defender = CombatSnapshot.from_character(defender)
     
-    # Calculate hit rate
-    hit_rate = temp_battle._calculate_hit_rate(attacker, defender)
-    
-    # Calculate crit rate
-    crit_rate = temp_battle._calculate_crit_rate(attacker, defender)
-    
-    # Calculate base damage
-    base_damage = attacker._calculate_damage(defender)
-    
-    # Calculate critical damage
-    crit_damage = base_damage * 3
-    
-    # Check for effectiveness
-    effectiveness = attacker.weapon.is_effective_against(defender)
+    # The battle compiles every forecast figure once
+    profile = Battle(attacker, defender, terrain, distance=distance).attacker_profile
+    base_damage = profile.damage
     
     return {
         "min_damage": base_damage,  # Minimum damage (no critical)
         "max_damage": base_damage,  # Maximum damage (no critical)
-        "crit_damage": crit_damage,  # Critical hit damage
-        "hit_rate": hit_rate,       # Hit rate percentage
-        "crit_rate": crit_rate,     # Critical hit rate percentage
-        "effectiveness": effectiveness  # Whether weapon is effective against defender
+        "crit_damage": profile.critical_damage,  # Critical hit damage
+        "hit_rate": profile.hit,    # Hit rate percentage
+        "crit_rate": profile.crit,  # Critical hit rate percentage
+        "effectiveness": profile.effective  # Whether weapon is effective against defender
     }
 
-def predict_battle_outcome(attacker, defender, iterations=100):
+def predict_battle_outcome(attacker, defender, iterations=100, method="monte_carlo",
+                           workers=None, seed=None, terrain=None, distance=None):
     """
     Predict the outcome of a battle through Monte Carlo simulation.
     
@@ -62,70 +59,58 @@ def predict_battle_outcome(attacker, defender, iterations=100):
         attacker: The attacking character
         defender: The defending character
         iterations: Number of simulations to run
+        method: "monte_carlo" to sample fights one by one, "vectorized" to
+            sample them in batches with NumPy, or "exact" to compute exact
+            probabilities (iterations is ignored and victory counts are omitted)
+        workers: Number of worker processes; when given, fights are sampled in
+            seeded blocks spread across a process pool
+        seed: Seed for the vectorized and parallel backends; the same seed
+            gives the same result whatever the number of workers. With the
+            Monte Carlo method, fight k rolls CounterRandom(seed, k), so any
+            fight can be regenerated on its own
+        terrain: Tiles the characters stand on (see resolve_terrain)
+        distance: Distance between the characters in tiles; defaults to the
+            nearest distance the attacker's weapon reaches
         
     Returns:
         dict: Battle outcome prediction statistics
     """
-    # Store original HP values to reset after each simulation
-    attacker_hp = attacker.current_hp
-    defender_hp = defender.current_hp
+    # Work on snapshots so the caller's characters are never touched
+    attacker = CombatSnapshot.from_character(attacker)
+    defender = CombatSnapshot.from_character(defender)
     
-    results = {
-        "attacker_victories": 0,
-        "defender_victories": 0,
-        "no_victory": 0,
-        "average_attacker_remaining_hp": 0,
-        "average_defender_remaining_hp": 0,
-        "average_rounds": 0
-    }
+    if method == "exact":
+        return predict_battle_outcome_exact(attacker, defender, terrain=terrain,
+                                            distance=distance)
+    if method not in ("monte_carlo", "vectorized"):
+        raise ValueError(f"Unknown prediction method '{method}'")
     
-    for _ in range(iterations):
-        # Reset HP
-        attacker.current_hp = attacker_hp
-        defender.current_hp = defender_hp
-        
-        # Create a new battle
-        battle = Battle(attacker, defender)
-        
-        # Simulate combat for up to 10 rounds (to avoid potential infinite loops)
-        round_count = 0
-        max_rounds = 10
-        
-        while round_count < max_rounds:
-            round_count += 1
-            
-            # Simulate a round
-            result = battle.simulate_round()
-            
-            # Check if battle is over
-            if result.get("victory", False):
-                if result["victor"] == attacker.name:
-                    results["attacker_victories"] += 1
-                else:
-                    results["defender_victories"] += 1
-                break
-            
-            # If we reach max rounds without victory, count as no victory
-            if round_count == max_rounds:
-                results["no_victory"] += 1
-        
-        # Track remaining HP and rounds
-        results["average_attacker_remaining_hp"] += attacker.current_hp
-        results["average_defender_remaining_hp"] += defender.current_hp
-        results["average_rounds"] += round_count
+    # NumPy is only needed for the vectorized and parallel backends
+    if workers is not None:
+        from fe_combat_sim.utils.parallel import predict_battle_outcome_parallel
+        return predict_battle_outcome_parallel(attacker, defender, iterations, workers, seed,
+                                               terrain=terrain, distance=distance)
+    if method == "vectorized":
+        from fe_combat_sim.utils.vectorized import predict_battle_outcome_vectorized
+        return predict_battle_outcome_vectorized(attacker, defender, iterations, seed=seed,
+                                                 terrain=terrain, distance=distance)
     
-    # Calculate averages
-    results["average_attacker_remaining_hp"] /= iterations
-    results["average_defender_remaining_hp"] /= iterations
-    results["average_rounds"] /= iterations
+    plan = build_exchange_plan(attacker, defender, terrain, distance)
     
-    # Calculate victory percentages
-    results["attacker_victory_percentage"] = (results["attacker_victories"] / iterations) * 100
-    results["defender_victory_percentage"] = (results["defender_victories"] / iterations) * 100
-    results["no_victory_percentage"] = (results["no_victory"] / iterations) * 100
+    # Simulate combat for up to 10 rounds (to avoid potential infinite loops)
+    max_rounds = 10
     
-    # Reset HP to original values
-    attacker.current_hp = attacker_hp
-    defender.current_hp = defender_hp
+    # Fights are summed as they finish, so memory does not grow with iterations
+    if seed is None:
+        outcomes = (
+            sample_exchange(plan, attacker.current_hp, defender.current_hp, max_rounds)
+            for _ in range(iterations)
+        )
+    else:
+        outcomes = (
+            sample_exchange(plan, attacker.current_hp, defender.current_hp, max_rounds,
+                            CounterRandom(seed, fight))
+            for fight in range(iterations)
+        )
     
-    return results
+    return OutcomeTotals.from_outcomes(outcomes).to_results()
@@ -3,7 +3,11 @@ Stats utilities for Fire Emblem Combat Simulator.
 """
 
 # Import from old location and fix imports for the package structure
-from utils.stats import calculate_growth, generate_random_stats
+from utils.stats import (
+    calculate_growth, generate_random_stats, calculate_average_stats, growth_distribution
+)
 # Update imports to use package structure
 calculate_growth.__module__ = 'fe_combat_sim.utils.stats'
 generate_random_stats.__module__ = 'fe_combat_sim.utils.stats'
+calculate_average_stats.__module__ = 'fe_combat_sim.utils.stats'
+growth_distribution.__module__ = 'fe_combat_sim.utils.stats'
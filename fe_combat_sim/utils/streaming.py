@@ -0,0 +1,75 @@
+"""
+Streaming battle prediction for Fire Emblem Combat Simulator.
+Fights are sampled in chunks and the running aggregates are yielded after each
+one, so callers can show partial results, stop early or cancel at any point
+and keep everything sampled so far.
+"""
+import numpy as np
+
+from fe_combat_sim.combat.snapshot import CombatSnapshot
+from fe_combat_sim.utils.exchange import build_exchange_plan
+from fe_combat_sim.utils.outcome import OutcomeTotals
+from fe_combat_sim.utils.vectorized import plan_arrays, simulate_fights
+
+
+def iter_battle_outcome(attacker, defender, iterations=None, report_every=1000,
+                        confidence=0.95, max_rounds=10, seed=None, terrain=None,
+                        totals=None, distance=None):
+    """
+    Predict the outcome of a battle, yielding running results as fights are sampled.
+
+    Each yielded dict covers every fight sampled so far. Closing the generator
+    (or simply no longer iterating it) cancels the remaining work; the last
+    yielded result is still valid, and its "totals" can be passed back in to
+    continue sampling later.
+
+    Args:
+        attacker: The attacking character
+        defender: The defending character
+        iterations: Total number of simulations, or None to sample until the
+            caller stops iterating
+        report_every: Number of simulations between two yielded results
+        confidence: Confidence level of the intervals
+        max_rounds: Number of rounds after which a battle is a draw
+        seed: Seed for the random generator; a run resumed from totals draws
+            from a stream of its own, derived from the seed and the number of
+            fights already counted, so it never repeats the fights in totals
+        terrain: Terrain effects
+        totals: OutcomeTotals of earlier fights of the same matchup to build on
+        distance: Distance between the characters in tiles (see Battle)
+
+    Yields:
+        dict: Battle outcome prediction statistics, as in predict_battle_outcome,
+        plus "confidence_intervals" (Wilson bounds of each victory percentage),
+        "confidence", "iterations" (simulations so far), "totals" (OutcomeTotals
+        so far) and "done" (whether the requested iterations are complete)
+    """
+    if report_every < 1:
+        raise ValueError("report_every must be at least 1")
+
+    attacker = CombatSnapshot.from_character(attacker)
+    defender = CombatSnapshot.from_character(defender)
+
+    params = plan_arrays([build_exchange_plan(attacker, defender, terrain, distance)])
+    totals = totals or OutcomeTotals.empty()
+    if seed is not None and totals.iterations:
+        seed = np.random.SeedSequence(seed, spawn_key=(totals.iterations,))
+    rng = np.random.default_rng(seed)
+
+    while iterations is None or totals.iterations < iterations:
+        size = report_every
+        if iterations is not None:
+            size = min(size, iterations - totals.iterations)
+
+        batch = simulate_fights(params, attacker.current_hp, defender.current_hp,
+                                size, max_rounds, rng)
+        totals = totals.merge(batch.totals())
+
+        results = totals.to_results()
+        results["confidence_intervals"] = totals.intervals(confidence)
+        results["confidence"] = confidence
+        results["iterations"] = totals.iterations
+        results["totals"] = totals
+        results["done"] = iterations is not None and totals.iterations >= iterations
+
+        yield results
@@ -0,0 +1,314 @@
+"""
+Matchup matrix sweeps for Fire Emblem Combat Simulator.
+A sweep evaluates every attacker/defender combination of two unit axes in
+batched, exact passes and returns the results as dense labelled arrays.
+"""
+import itertools
+
+import numpy as np
+
+from fe_combat_sim.data import CHARACTER_TEMPLATES, TERRAIN_TYPES, WEAPONS, get_terrain
+from fe_combat_sim.utils.exact import solution_to_results
+from fe_combat_sim.utils.stats import calculate_average_stats
+from fe_combat_sim.utils.unit_table import UnitTable, pair_parameters
+from fe_combat_sim.utils.vectorized import exact_outcomes
+
+# Outcome metrics stored for each cell of a matchup matrix
+METRICS = (
+    "attacker_victory_percentage",
+    "defender_victory_percentage",
+    "no_victory_percentage",
+    "average_attacker_remaining_hp",
+    "average_defender_remaining_hp",
+    "average_rounds",
+)
+
+# Maximum number of matchups solved in one pass
+DEFAULT_BLOCK_SIZE = 1 << 18
+
+
+class UnitAxis:
+    """One axis of a sweep: every combination of templates, weapons and levels."""
+
+    def __init__(self, templates=None, weapons=None, levels=range(1, 21)):
+        """
+        Initialize a unit axis.
+
+        Units use the expected stats of their template at each level, so the
+        sweep is deterministic.
+
+        Args:
+            templates (list, optional): Template names (defaults to every template)
+            weapons (list, optional): Weapon names (defaults to every weapon)
+            levels (iterable): Levels of the units
+        """
+        self.templates = list(templates or CHARACTER_TEMPLATES)
+        self.weapons = list(weapons or WEAPONS)
+        self.levels = list(levels)
+
+        for template_name in self.templates:
+            if template_name not in CHARACTER_TEMPLATES:
+                raise ValueError(f"Template '{template_name}' not found")
+        for weapon_name in self.weapons:
+            if weapon_name not in WEAPONS:
+                raise ValueError(f"Weapon '{weapon_name}' not found")
+
+    @property
+    def shape(self):
+        """Number of templates, weapons and levels on the axis."""
+        return len(self.templates), len(self.weapons), len(self.levels)
+
+    @property
+    def labels(self):
+        """(template, weapon, level) label of each unit, in axis order."""
+        return list(itertools.product(self.templates, self.weapons, self.levels))
+
+    def __len__(self):
+        """Number of units on the axis."""
+        return len(self.templates) * len(self.weapons) * len(self.levels)
+
+    def unit_table(self):
+        """
+        Build the unit table of the axis.
+
+        Stats are computed once per template and level and shared by every weapon.
+
+        Returns:
+            UnitTable: Table of the axis' units, in label order
+        """
+        stats = {
+            (template_name, level): calculate_average_stats(
+                CHARACTER_TEMPLATES[template_name]["stats"],
+                CHARACTER_TEMPLATES[template_name]["growth_rates"],
+                level - 1
+            )
+            for template_name in self.templates
+            for level in self.levels
+        }
+
+        units = [
+            (stats[(template_name, level)], WEAPONS[weapon_name],
+             CHARACTER_TEMPLATES[template_name]["class"])
+            for template_name, weapon_name, level in self.labels
+        ]
+        return UnitTable.from_units(units, labels=self.labels)
+
+
+class MatchupMatrix:
+    """Outcome metrics of every attacker/defender pair of a sweep."""
+
+    def __init__(self, attacker_axis, defender_axis, metrics):
+        """
+        Initialize a matchup matrix.
+
+        Args:
+            attacker_axis (UnitAxis): Axis of the attackers (rows)
+            defender_axis (UnitAxis): Axis of the defenders (columns)
+            metrics (dict): 2D array for each name in METRICS
+        """
+        self.attacker_axis = attacker_axis
+        self.defender_axis = defender_axis
+        self.metrics = metrics
+        self._attacker_positions = {label: i for i, label in enumerate(attacker_axis.labels)}
+        self._defender_positions = {label: i for i, label in enumerate(defender_axis.labels)}
+
+    def __getitem__(self, metric):
+        """
+        Get a metric as a (attackers, defenders) array.
+
+        Args:
+            metric (str): Name of the metric
+
+        Returns:
+            numpy.ndarray: Values of the metric for every pair
+        """
+        return self.metrics[metric]
+
+    def grid(self, metric):
+        """
+        Get a metric with one dimension per template, weapon and level.
+
+        Args:
+            metric (str): Name of the metric
+
+        Returns:
+            numpy.ndarray: Array of shape attacker_axis.shape + defender_axis.shape
+        """
+        return self.metrics[metric].reshape(self.attacker_axis.shape + self.defender_axis.shape)
+
+    def cell(self, attacker_label, defender_label):
+        """
+        Get every metric of one matchup.
+
+        Args:
+            attacker_label (tuple): (template, weapon, level) of the attacker
+            defender_label (tuple): (template, weapon, level) of the defender
+
+        Returns:
+            dict: Value of each metric
+        """
+        row = self._attacker_positions[tuple(attacker_label)]
+        column = self._defender_positions[tuple(defender_label)]
+        return {metric: float(values[row, column]) for metric, values in self.metrics.items()}
+
+    def to_dataframe(self):
+        """
+        Convert the matrix to a long-form pandas DataFrame.
+
+        Returns:
+            pandas.DataFrame: One row per matchup, indexed by both units' labels
+        """
+        import pandas as pd
+
+        index = pd.MultiIndex.from_tuples(
+            [attacker + defender for attacker in self.attacker_axis.labels
+             for defender in self.defender_axis.labels],
+            names=["attacker_template", "attacker_weapon", "attacker_level",
+                   "defender_template", "defender_weapon", "defender_level"]
+        )
+        return pd.DataFrame({metric: values.ravel() for metric, values in self.metrics.items()},
+                            index=index)
+
+
+def sweep_matchups(attacker_axis, defender_axis=None, max_rounds=10, terrain=None,
+                   block_size=DEFAULT_BLOCK_SIZE, distance=None):
+    """
+    Compute exact battle outcomes for every pair of units of two axes.
+
+    Args:
+        attacker_axis (UnitAxis): Axis of the attackers
+        defender_axis (UnitAxis, optional): Axis of the defenders (defaults to
+            the attacker axis)
+        max_rounds (int): Number of rounds after which a battle is a draw
+        terrain (dict, optional): Terrain effects
+        block_size (int): Maximum number of matchups solved in one pass
+        distance (int, optional): Distance of every matchup in tiles; None
+            uses the nearest distance each attacker's weapon reaches
+
+    Returns:
+        MatchupMatrix: Outcome metrics of every pair
+    """
+    defender_axis = defender_axis or attacker_axis
+    attackers = attacker_axis.unit_table()
+    defenders = defender_axis.unit_table()
+
+    rows, columns = len(attackers), len(defenders)
+    metrics = {metric: np.empty((rows, columns)) for metric in METRICS}
+
+    rows_per_block = max(1, block_size // columns)
+    for start in range(0, rows, rows_per_block):
+        block_rows = np.arange(start, min(rows, start + rows_per_block))
+        attacker_index = np.repeat(block_rows, columns)
+        defender_index = np.tile(np.arange(columns), len(block_rows))
+
+        params = pair_parameters(attackers, attacker_index, defenders, defender_index, terrain,
+                                 distance=distance)
+        solved = exact_outcomes(params, attackers.current_hp[attacker_index],
+                                defenders.current_hp[defender_index], max_rounds)
+
+        for metric, values in solution_to_results(solved).items():
+            metrics[metric][block_rows] = values.reshape(len(block_rows), columns)
+
+    return MatchupMatrix(attacker_axis, defender_axis, metrics)
+
+
+class TerrainMatrix:
+    """Outcome metrics of one matchup for every pair of tiles."""
+
+    def __init__(self, attacker_tiles, defender_tiles, metrics):
+        """
+        Initialize a terrain matrix.
+
+        Args:
+            attacker_tiles (list): Tiles of the attacker (rows)
+            defender_tiles (list): Tiles of the defender (columns)
+            metrics (dict): 2D array for each name in METRICS
+        """
+        self.attacker_tiles = list(attacker_tiles)
+        self.defender_tiles = list(defender_tiles)
+        self.metrics = metrics
+
+    def __getitem__(self, metric):
+        """
+        Get a metric as a (attacker tiles, defender tiles) array.
+
+        Args:
+            metric (str): Name of the metric
+
+        Returns:
+            numpy.ndarray: Values of the metric for every pair of tiles
+        """
+        return self.metrics[metric]
+
+    def cell(self, attacker_tile, defender_tile):
+        """
+        Get every metric for one pair of tiles.
+
+        Args:
+            attacker_tile (str): Name of the attacker's tile
+            defender_tile (str): Name of the defender's tile
+
+        Returns:
+            dict: Value of each metric
+        """
+        row = [tile.name for tile in self.attacker_tiles].index(attacker_tile)
+        column = [tile.name for tile in self.defender_tiles].index(defender_tile)
+        return {metric: float(values[row, column]) for metric, values in self.metrics.items()}
+
+    def to_dataframe(self):
+        """
+        Convert the matrix to a long-form pandas DataFrame.
+
+        Returns:
+            pandas.DataFrame: One row per pair of tiles, indexed by their names
+        """
+        import pandas as pd
+
+        index = pd.MultiIndex.from_product(
+            [[tile.name for tile in self.attacker_tiles], [tile.name for tile in self.defender_tiles]],
+            names=["attacker_terrain", "defender_terrain"]
+        )
+        return pd.DataFrame({metric: values.ravel() for metric, values in self.metrics.items()},
+                            index=index)
+
+
+def sweep_terrain(attacker, defender, attacker_tiles=None, defender_tiles=None, max_rounds=10,
+                  distance=None):
+    """
+    Compute exact battle outcomes of one matchup on every pair of tiles.
+
+    Every pair of tiles is one lane of a single batched pass.
+
+    Args:
+        attacker (Character): Attacking character
+        defender (Character): Defending character
+        attacker_tiles (list, optional): Tiles (names or Terrain) of the
+            attacker (defaults to every predefined tile type)
+        defender_tiles (list, optional): Tiles of the defender (defaults to the
+            attacker's tiles)
+        max_rounds (int): Number of rounds after which a battle is a draw
+        distance (int, optional): Distance between the characters in tiles
+            (see Battle)
+
+    Returns:
+        TerrainMatrix: Outcome metrics of every pair of tiles
+    """
+    attacker_tiles = [get_terrain(tile) if isinstance(tile, str) else tile
+                      for tile in (attacker_tiles or TERRAIN_TYPES)]
+    defender_tiles = ([get_terrain(tile) if isinstance(tile, str) else tile
+                       for tile in defender_tiles] if defender_tiles else attacker_tiles)
+
+    rows, columns = len(attacker_tiles), len(defender_tiles)
+    attackers = UnitTable.from_characters([attacker])
+    defenders = UnitTable.from_characters([defender])
+    lanes = np.zeros(rows * columns, dtype=np.int64)
+    tiles = ([tile for tile in attacker_tiles for _ in range(columns)],
+             defender_tiles * rows)
+
+    params = pair_parameters(attackers, lanes, defenders, lanes, tiles=tiles, distance=distance)
+    solved = exact_outcomes(params, attackers.current_hp[lanes], defenders.current_hp[lanes],
+                            max_rounds)
+
+    metrics = {metric: values.reshape(rows, columns)
+               for metric, values in solution_to_results(solved).items()}
+    return TerrainMatrix(attacker_tiles, defender_tiles, metrics)
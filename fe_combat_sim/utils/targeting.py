@@ -0,0 +1,243 @@
+"""
+Enemy AI target selection for Fire Emblem Combat Simulator.
+Every attack a team's units can make this turn (unit, tile to attack from,
+target) is scored from an exact one-round forecast. The forecasts of all
+candidates are computed together in one batch; attacks from tiles of the same
+type at the same distance share a forecast, and forecasts are cached for the
+rest of the turn, so replanning after each action only solves new matchups.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from fe_combat_sim.grid.threat import ring_offsets
+from fe_combat_sim.utils.unit_table import UnitTable, pair_parameters
+from fe_combat_sim.utils.vectorized import exact_outcomes
+
+# Columns of a forecast, in the order they are cached
+FORECAST_FIELDS = ("expected_damage", "kill_probability", "expected_damage_taken",
+                   "death_probability")
+
+
+class TargetWeights(namedtuple("TargetWeights", ["damage", "kill", "damage_taken", "death"])):
+    """
+    Weights of the terms of an attack's score.
+
+    The score of an attack is damage * expected damage + kill * kill
+    probability - damage_taken * expected counter damage - death *
+    probability of dying to the counter.
+
+    Attributes:
+        damage (float): Weight of the expected damage dealt
+        kill (float): Weight of the probability of defeating the target
+        damage_taken (float): Weight of the expected damage taken
+        death (float): Weight of the probability of being defeated
+    """
+    __slots__ = ()
+
+
+# Aggressive but not reckless
+DEFAULT_WEIGHTS = TargetWeights(damage=1.0, kill=30.0, damage_taken=0.5, death=40.0)
+
+
+class AttackChoice(namedtuple("AttackChoice", ["unit", "position", "target", "distance",
+                                               "score", "forecast"])):
+    """
+    Best attack found for a unit.
+
+    Attributes:
+        unit (Character): Attacking unit
+        position (tuple): (x, y) tile to attack from
+        target (Character): Unit to attack
+        distance (int): Distance between the position and the target
+        score (float): Score of the attack
+        forecast (dict): Value of each of FORECAST_FIELDS for the attack
+    """
+    __slots__ = ()
+
+
+class TargetingAI:
+    """
+    Chooses the attacks of a team's units on a GridMap.
+
+    Subclasses can override score() to rank attacks differently.
+    """
+
+    def __init__(self, grid, team, weights=DEFAULT_WEIGHTS, opponents=None):
+        """
+        Initialize the AI of a team.
+
+        Args:
+            grid (GridMap): Map the units stand on
+            team (str): Team controlled by the AI
+            weights (TargetWeights): Weights of the score of an attack
+            opponents (collection, optional): Teams the AI attacks (every
+                other team by default)
+        """
+        self.grid = grid
+        self.team = team
+        self.weights = weights
+        self.opponents = opponents
+        self._forecasts = {}
+
+    def new_turn(self):
+        """Forget the forecasts of the previous turn."""
+        self._forecasts.clear()
+
+    def _forecast_key(self, unit, position, target, distance):
+        """Build the key of everything a forecast depends on."""
+        grid = self.grid
+        return (unit, unit.weapon, unit.current_hp, grid.tile(position),
+                target, target.weapon, target.current_hp, grid.tile(grid.position_of(target)),
+                distance)
+
+    def is_opponent(self, team):
+        """
+        Check if the AI attacks the units of a team.
+
+        Args:
+            team (str): Team to check
+
+        Returns:
+            bool: True if the team is one of the AI's opponents
+        """
+        return team in self.opponents if self.opponents is not None else team != self.team
+
+    def candidates(self, units=None):
+        """
+        List every attack the team's units can make this turn.
+
+        Args:
+            units (list, optional): Units to consider (the whole team by default)
+
+        Returns:
+            list: (unit, position, target, distance) of each candidate attack
+        """
+        grid = self.grid
+        units = grid.units(self.team) if units is None else units
+        targets = [(target, grid.position_of(target)) for target in grid.units()
+                   if self.is_opponent(grid.team_of(target))]
+
+        found = []
+        for unit in units:
+            weapon = unit.weapon
+            if weapon is None or weapon.weapon_type == "Staff":
+                continue
+            low, high = weapon.range
+            origin = grid.position_of(unit)
+            movement = unit.character_class.movement if unit.character_class else 0
+            destinations = None
+
+            for target, (tx, ty) in targets:
+                # Too far to reach whatever the terrain
+                if grid.distance(origin, (tx, ty)) > movement + high:
+                    continue
+                if destinations is None:
+                    destinations = set(grid.destinations(unit))
+                for distance in range(low, high + 1):
+                    for dx, dy in ring_offsets(distance):
+                        position = (tx + dx, ty + dy)
+                        if position in destinations:
+                            found.append((unit, position, target, distance))
+        return found
+
+    def forecast(self, candidates):
+        """
+        Forecast many candidate attacks, solving the uncached matchups in one batch.
+
+        Args:
+            candidates (list): (unit, position, target, distance) of each attack
+
+        Returns:
+            numpy.ndarray: FORECAST_FIELDS of each attack, shape (attacks, 4)
+        """
+        keys = [self._forecast_key(*candidate) for candidate in candidates]
+        missing = {}
+        for key, candidate in zip(keys, candidates):
+            if key not in self._forecasts and key not in missing:
+                missing[key] = candidate
+        if missing:
+            self._solve(missing)
+        return np.array([self._forecasts[key] for key in keys], dtype=float).reshape(-1, 4)
+
+    def _solve(self, missing):
+        """Compute the forecasts of new matchups and add them to the cache."""
+        grid = self.grid
+        units = []
+        slots = {}
+        for unit, _, target, _ in missing.values():
+            for character in (unit, target):
+                if character not in slots:
+                    slots[character] = len(units)
+                    units.append(character)
+        table = UnitTable.from_characters(units)
+
+        candidates = list(missing.values())
+        attacker_index = np.array([slots[unit] for unit, _, _, _ in candidates])
+        defender_index = np.array([slots[target] for _, _, target, _ in candidates])
+        tiles = ([grid.tile(position) for _, position, _, _ in candidates],
+                 [grid.tile(grid.position_of(target)) for _, _, target, _ in candidates])
+        distance = np.array([distance for _, _, _, distance in candidates])
+
+        params = pair_parameters(table, attacker_index, table, defender_index, tiles=tiles,
+                                 distance=distance)
+        attacker_hp = table.current_hp[attacker_index]
+        defender_hp = table.current_hp[defender_index]
+        outcome = exact_outcomes(params, attacker_hp, defender_hp, max_rounds=1)
+
+        forecasts = np.stack([
+            defender_hp - outcome["average_defender_remaining_hp"],
+            outcome["attacker_victory_probability"],
+            attacker_hp - outcome["average_attacker_remaining_hp"],
+            outcome["defender_victory_probability"],
+        ], axis=1)
+        self._forecasts.update(zip(missing, map(tuple, forecasts.tolist())))
+
+    def score(self, forecasts):
+        """
+        Score forecast attacks.
+
+        Args:
+            forecasts (numpy.ndarray): FORECAST_FIELDS of each attack
+
+        Returns:
+            numpy.ndarray: Score of each attack (higher is better)
+        """
+        weights = self.weights
+        return (weights.damage * forecasts[:, 0] + weights.kill * forecasts[:, 1]
+                - weights.damage_taken * forecasts[:, 2] - weights.death * forecasts[:, 3])
+
+    def plan(self, units=None, candidates=None):
+        """
+        Choose the best attack of every unit, scoring all candidates at once.
+
+        Args:
+            units (list, optional): Units to plan for (the whole team by default)
+            candidates (list, optional): Attacks to choose from, as listed by
+                candidates() (e.g. filtered to keep a unit in place); every
+                attack of the units by default
+
+        Returns:
+            dict: AttackChoice of each unit, or None for units with no target
+            in reach
+        """
+        units = self.grid.units(self.team) if units is None else list(units)
+        if candidates is None:
+            candidates = self.candidates(units)
+        forecasts = self.forecast(candidates)
+        scores = self.score(forecasts)
+
+        choices = dict.fromkeys(units)
+        # Candidates are listed unit by unit, so each unit's attacks are one slice
+        start = 0
+        while start < len(candidates):
+            unit = candidates[start][0]
+            end = start
+            while end < len(candidates) and candidates[end][0] is unit:
+                end += 1
+            best = start + int(np.argmax(scores[start:end]))
+            _, position, target, distance = candidates[best]
+            choices[unit] = AttackChoice(unit, position, target, distance, float(scores[best]),
+                                         dict(zip(FORECAST_FIELDS, forecasts[best].tolist())))
+            start = end
+        return choices
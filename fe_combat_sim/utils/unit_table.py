@@ -0,0 +1,313 @@
+"""
+Struct-of-arrays unit tables for Fire Emblem Combat Simulator.
+A UnitTable holds the combat-relevant state of many units as NumPy arrays, so
+the combat parameters of many pairs can be computed in one pass with the same
+rules as Battle. Skills are not part of a table: the engines built on it
+(sweeps, army pairings, enemy targeting) fight every unit without them.
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+from fe_combat_sim.data.ranges import UNARMED_MASK, UNARMED_RANGE
+from fe_combat_sim.data.terrain import resolve_terrain
+from fe_combat_sim.utils.exchange import ATTACKER, DEFENDER
+from fe_combat_sim.utils.vectorized import (
+    COUNTER_SLOT, FOLLOW_UP_SLOT, NO_STRIKE, SLOTS_PER_ROUND, LaneParameters
+)
+from fe_combat_sim.utils.weapon_triangle import WeaponTriangle
+
+# Stats read by the combat formulas
+STAT_NAMES = ("hp", "str", "mag", "skl", "spd", "lck", "def", "res")
+
+# Index used for units without a weapon
+NO_WEAPON = -1
+
+# Uses left of an unbreakable weapon (or of no weapon)
+UNLIMITED_USES = -1
+
+
+class UnitTable:
+    """Combat-relevant state of a set of units, stored column by column."""
+
+    def __init__(self, stats, weapons, weapon_index, classes, class_index,
+                 current_hp=None, labels=None, weapon_uses=None):
+        """
+        Initialize a unit table.
+
+        Args:
+            stats (dict): Array of values for each name in STAT_NAMES
+            weapons (list): Distinct weapons used by the units
+            weapon_index (numpy.ndarray): Index into weapons of each unit's
+                weapon, or NO_WEAPON
+            classes (list): Distinct character classes of the units
+            class_index (numpy.ndarray): Index into classes of each unit's class
+            current_hp (numpy.ndarray, optional): Current HP (defaults to max HP)
+            labels (list, optional): Label of each unit
+            weapon_uses (numpy.ndarray, optional): Uses left on each unit's
+                weapon, or UNLIMITED_USES (defaults to UNLIMITED_USES)
+        """
+        self.stats = {name: np.asarray(stats[name], dtype=np.int32) for name in STAT_NAMES}
+        self.weapons = list(weapons)
+        self.weapon_index = np.asarray(weapon_index, dtype=np.int32)
+        self.classes = list(classes)
+        self.class_index = np.asarray(class_index, dtype=np.int32)
+        self.current_hp = (np.asarray(current_hp, dtype=np.int32) if current_hp is not None
+                           else self.stats["hp"].copy())
+        self.labels = list(labels) if labels is not None else list(range(len(self.weapon_index)))
+        self.weapon_uses = (np.asarray(weapon_uses, dtype=np.int32) if weapon_uses is not None
+                            else np.full(len(self.weapon_index), UNLIMITED_USES, dtype=np.int32))
+
+    @classmethod
+    def from_units(cls, units, labels=None):
+        """
+        Build a table from (stats, weapon, character class) triples.
+
+        Args:
+            units (list): (stats dict, Weapon or None, CharacterClass) triples
+            labels (list, optional): Label of each unit
+
+        Returns:
+            UnitTable: Table of the units
+        """
+        # Units share the definitions of their weapons, however many copies exist
+        weapons, weapon_index = _intern([weapon and weapon.definition for _, weapon, _ in units],
+                                        skip_none=True)
+        classes, class_index = _intern([character_class for _, _, character_class in units])
+        stats = {name: [unit_stats.get(name, 0) for unit_stats, _, _ in units]
+                 for name in STAT_NAMES}
+        weapon_uses = [UNLIMITED_USES if weapon is None or weapon.current_uses is None
+                       else weapon.current_uses for _, weapon, _ in units]
+
+        return cls(stats, weapons, weapon_index, classes, class_index, labels=labels,
+                   weapon_uses=weapon_uses)
+
+    @classmethod
+    def from_characters(cls, characters):
+        """
+        Build a table from characters, keeping their current HP.
+
+        Args:
+            characters (list): Character objects
+
+        Returns:
+            UnitTable: Table of the characters, labelled by name
+        """
+        table = cls.from_units(
+            [(character.stats, character.weapon, character.character_class)
+             for character in characters],
+            labels=[character.name for character in characters]
+        )
+        table.current_hp = np.array([character.current_hp for character in characters],
+                                    dtype=np.int32)
+        return table
+
+    def __len__(self):
+        """Number of units in the table."""
+        return len(self.weapon_index)
+
+
+def _intern(values, skip_none=False):
+    """
+    Map objects to indices into a list of distinct objects.
+
+    Args:
+        values (list): Objects to intern
+        skip_none (bool): Map None to NO_WEAPON instead of interning it
+
+    Returns:
+        tuple: (distinct objects, index of each value)
+    """
+    distinct = []
+    positions = {}
+    indices = []
+
+    for value in values:
+        if skip_none and value is None:
+            indices.append(NO_WEAPON)
+            continue
+        if id(value) not in positions:
+            positions[id(value)] = len(distinct)
+            distinct.append(value)
+        indices.append(positions[id(value)])
+
+    return distinct, indices
+
+
+def weapon_tables(attacker_weapons, defender_weapons, defender_classes):
+    """
+    Precompute the categorical combat rules between weapons and classes.
+
+    Args:
+        attacker_weapons (list): Weapons of the striking units
+        defender_weapons (list): Weapons of the targeted units
+        defender_classes (list): Character classes of the targeted units
+
+    Returns:
+        tuple: (triangle hit bonus per weapon pair, effectiveness multiplier per
+        weapon and class, range bitmask of each defender weapon)
+    """
+    # Hit modifier of each weapon pair, measured on a neutral base hit of 100
+    triangle = np.array([[WeaponTriangle.apply_advantage(a, d, 0, 100)[1] - 100
+                          for d in defender_weapons] or [0]
+                         for a in attacker_weapons] or [[0]], dtype=np.int32)
+
+    effectiveness = np.array([
+        [int(weapon.get_effectiveness_multiplier(SimpleNamespace(character_class=character_class)))
+         for character_class in defender_classes]
+        for weapon in attacker_weapons
+    ] or [[1]], dtype=np.int32)
+
+    reach = range_masks(defender_weapons)
+
+    return triangle, effectiveness, reach
+
+
+def range_masks(weapons):
+    """
+    Stack the range bitmasks of weapons (see Weapon.range_mask).
+
+    Args:
+        weapons (list): Weapons
+
+    Returns:
+        numpy.ndarray: Bitmask of the distances each weapon reaches
+    """
+    return np.array([weapon.range_mask for weapon in weapons] or [0], dtype=np.int64)
+
+
+def terrain_columns(tiles):
+    """
+    Stack the combat modifiers of tiles into arrays.
+
+    Args:
+        tiles (list): Terrain of each pair (or a single one for every pair)
+
+    Returns:
+        dict: "avoid", "defense" and "resistance" arrays
+    """
+    return {field: np.array([getattr(tile, field) for tile in tiles], dtype=np.int32)
+            for field in ("avoid", "defense", "resistance")}
+
+
+def _direction(striker, striker_index, target, target_index, target_terrain):
+    """
+    Compute hit, crit and damage of one side against the other for many pairs.
+
+    Mirrors Battle._calculate_hit_rate, Battle._calculate_crit_rate and
+    Battle._calculate_damage, with the target's terrain given by terrain_columns.
+    A striker without a weapon gets 0 for all three.
+    """
+    s_weapon = striker.weapon_index[striker_index]
+    t_weapon = target.weapon_index[target_index]
+    armed = s_weapon != NO_WEAPON
+    s_weapon_safe = np.where(armed, s_weapon, 0)
+    t_weapon_safe = np.where(t_weapon != NO_WEAPON, t_weapon, 0)
+
+    s_stats = {name: values[striker_index] for name, values in striker.stats.items()}
+    t_stats = {name: values[target_index] for name, values in target.stats.items()}
+
+    weapon_hit = np.array([w.hit for w in striker.weapons] or [0], dtype=np.int32)[s_weapon_safe]
+    weapon_crit = np.array([w.crit for w in striker.weapons] or [0], dtype=np.int32)[s_weapon_safe]
+    might = np.array([w.might for w in striker.weapons] or [0], dtype=np.int32)[s_weapon_safe]
+    physical = np.array([w.is_physical() for w in striker.weapons] or [True])[s_weapon_safe]
+
+    triangle, effectiveness, _ = weapon_tables(striker.weapons, target.weapons, target.classes)
+
+    # Hit rate, with the weapon triangle applied only when both sides are armed
+    hit = weapon_hit + s_stats["skl"] * 2 + s_stats["lck"] // 2
+    bonus = np.where(armed & (t_weapon != NO_WEAPON), triangle[s_weapon_safe, t_weapon_safe], 0)
+    hit = np.where(bonus < 0, np.maximum(0, hit + bonus), hit + bonus)
+    avoid = t_stats["spd"] * 2 + t_stats["lck"]
+    hit = np.clip(hit - avoid - target_terrain["avoid"], 0, 100)
+
+    crit = np.clip(weapon_crit + s_stats["skl"] // 2 - t_stats["lck"], 0, 100)
+
+    attack = np.where(physical, s_stats["str"], s_stats["mag"]) + might
+    defense = np.where(physical, t_stats["def"] + target_terrain["defense"],
+                       t_stats["res"] + target_terrain["resistance"])
+    damage = np.maximum(0, attack - defense) * effectiveness[s_weapon_safe, target.class_index[target_index]]
+
+    return (np.where(armed, hit, 0), np.where(armed, crit, 0), np.where(armed, damage, 0))
+
+
+def strike_slots(can_counter, speed_difference, can_attack=True):
+    """
+    Compute the strike slots of many pairs, as in Battle.simulate_round.
+
+    Args:
+        can_counter (numpy.ndarray): Whether each defender can counter-attack
+        speed_difference (numpy.ndarray): Attacker spd - defender spd of each pair
+        can_attack (numpy.ndarray): Whether each attacker reaches its defender
+
+    Returns:
+        numpy.ndarray: Side striking in each slot, shape (pairs, 3)
+    """
+    can_counter, speed_difference, can_attack = np.broadcast_arrays(
+        can_counter, speed_difference, can_attack)
+
+    slots = np.full((len(speed_difference), SLOTS_PER_ROUND), NO_STRIKE, dtype=np.int8)
+    slots[can_attack, 0] = ATTACKER
+    slots[can_counter, COUNTER_SLOT] = DEFENDER
+    slots[(speed_difference <= -5) & can_counter, FOLLOW_UP_SLOT] = DEFENDER
+    slots[(speed_difference >= 5) & can_attack, FOLLOW_UP_SLOT] = ATTACKER
+
+    return slots
+
+
+def pair_parameters(attackers, attacker_index, defenders, defender_index, terrain=None,
+                    tiles=None, distance=None):
+    """
+    Compute the combat parameters of many attacker/defender pairs at once.
+
+    Args:
+        attackers (UnitTable): Table of attacking units
+        attacker_index (numpy.ndarray): Attacker of each pair
+        defenders (UnitTable): Table of defending units
+        defender_index (numpy.ndarray): Defender of each pair
+        terrain (optional): Terrain of every pair, as accepted by Battle
+        tiles (tuple, optional): (attacker tiles, defender tiles) lists with
+            the Terrain of each pair, used instead of terrain
+        distance (optional): Distance between the units of every pair, or an
+            array with the distance of each pair; None uses the nearest
+            distance each attacker's weapon reaches
+
+    Returns:
+        LaneParameters: Combat parameters with one lane per pair
+    """
+    attacker_index = np.asarray(attacker_index)
+    defender_index = np.asarray(defender_index)
+    if tiles is None:
+        tiles = [[tile] for tile in resolve_terrain(terrain)]
+    attacker_terrain, defender_terrain = (terrain_columns(side) for side in tiles)
+
+    a_hit, a_crit, a_damage = _direction(attackers, attacker_index, defenders,
+                                         defender_index, defender_terrain)
+    d_hit, d_crit, d_damage = _direction(defenders, defender_index, attackers,
+                                         attacker_index, attacker_terrain)
+
+    # Each side strikes only if its weapon reaches the distance
+    a_weapon = attackers.weapon_index[attacker_index]
+    d_weapon = defenders.weapon_index[defender_index]
+    a_reach = np.where(a_weapon != NO_WEAPON,
+                       range_masks(attackers.weapons)[np.where(a_weapon != NO_WEAPON, a_weapon, 0)],
+                       UNARMED_MASK)
+    d_reach = np.where(d_weapon != NO_WEAPON,
+                       range_masks(defenders.weapons)[np.where(d_weapon != NO_WEAPON, d_weapon, 0)],
+                       0)
+    if distance is None:
+        nearest = np.array([weapon.range[0] for weapon in attackers.weapons] or [0], dtype=np.int64)
+        distance = np.where(a_weapon != NO_WEAPON, nearest[np.where(a_weapon != NO_WEAPON, a_weapon, 0)],
+                            UNARMED_RANGE[0])
+    can_attack = (a_reach >> distance & 1).astype(bool)
+    can_counter = can_attack & (d_reach >> distance & 1).astype(bool)
+
+    slots = strike_slots(can_counter, attackers.stats["spd"][attacker_index]
+                         - defenders.stats["spd"][defender_index], can_attack)
+
+    return LaneParameters(
+        np.stack([a_hit, d_hit]).astype(np.int16),
+        np.stack([a_crit, d_crit]).astype(np.int16),
+        np.stack([a_damage, d_damage]).astype(np.int32),
+        slots
+    )
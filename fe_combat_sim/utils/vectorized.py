@@ -0,0 +1,690 @@
+"""
+NumPy-vectorized battle simulation for Fire Emblem Combat Simulator.
+Simulates many independent battles at once as arrays of HP and dice rolls,
+following the attack/counter/follow-up order of Battle.simulate_round (or the
+order skills give it).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from fe_combat_sim.utils.exchange import ATTACKER, DEFENDER, NO_VICTORY, build_exchange_plan
+from fe_combat_sim.utils.outcome import OutcomeTotals
+
+# Strike slots of a round: first attack, counter-attack and follow-up attack
+ATTACK_SLOT = 0
+COUNTER_SLOT = 1
+FOLLOW_UP_SLOT = 2
+SLOTS_PER_ROUND = 3
+
+# Slot value for a strike that does not happen
+NO_STRIKE = -1
+
+# Maximum number of battles simulated in one pass, to bound memory use
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+
+class LaneParameters(namedtuple("LaneParameters", ["hit", "crit", "damage", "slots", "negate"],
+                                defaults=(None,))):
+    """
+    Combat parameters of each simulated battle (lane).
+
+    Attributes:
+        hit (numpy.ndarray): Hit rates, shape (2, lanes) indexed by side
+        crit (numpy.ndarray): Critical hit rates, shape (2, lanes)
+        damage (numpy.ndarray): Non-critical damage, shape (2, lanes)
+        slots (numpy.ndarray): Side striking in each slot, shape (lanes, slots);
+            SLOTS_PER_ROUND slots unless skills add strikes to a round
+        negate (numpy.ndarray): Chance that the target negates each hit of a
+            side (Pavise), shape (2, lanes); None when no hit can be negated
+
+    A lane dimension of 1 is broadcast to every simulated battle.
+    """
+    __slots__ = ()
+
+
+class FightBatch(namedtuple("FightBatch", ["winner", "rounds", "attacker_hp", "defender_hp"])):
+    """
+    Per-battle results of a vectorized simulation.
+
+    Attributes:
+        winner (numpy.ndarray): ATTACKER, DEFENDER or NO_VICTORY for each battle
+        rounds (numpy.ndarray): Rounds fought in each battle
+        attacker_hp (numpy.ndarray): Attacker's remaining HP in each battle
+        defender_hp (numpy.ndarray): Defender's remaining HP in each battle
+    """
+    __slots__ = ()
+
+    def totals(self):
+        """
+        Aggregate the batch into outcome totals.
+
+        Returns:
+            OutcomeTotals: Sums over every battle of the batch
+        """
+        return OutcomeTotals(
+            int(np.count_nonzero(self.winner == ATTACKER)),
+            int(np.count_nonzero(self.winner == DEFENDER)),
+            int(np.count_nonzero(self.winner == NO_VICTORY)),
+            int(self.attacker_hp.sum()),
+            int(self.defender_hp.sum()),
+            int(self.rounds.sum()),
+            len(self.winner)
+        )
+
+
+def plan_slots(order):
+    """
+    Convert the strike order of an exchange plan into strike slots.
+
+    An order changed by skills that does not fit the three slots (such as two
+    strikes in a row from a Brave weapon) gets one slot per strike instead.
+
+    Args:
+        order (tuple): Strike order of an ExchangePlan
+
+    Returns:
+        list: Side striking in the attack, counter and follow-up slots, or in
+        each slot of the round
+    """
+    slots = [ATTACKER if order[:1] == (ATTACKER,) else NO_STRIKE, NO_STRIKE, NO_STRIKE]
+    rest = list(order[1:] if slots[ATTACK_SLOT] == ATTACKER else order)
+
+    if rest and rest[0] == DEFENDER:
+        slots[COUNTER_SLOT] = DEFENDER
+        rest.pop(0)
+
+    if len(rest) > 1:
+        return list(order) + [NO_STRIKE] * (SLOTS_PER_ROUND - len(order))
+    if rest:
+        slots[FOLLOW_UP_SLOT] = rest[0]
+
+    return slots
+
+
+def plan_arrays(plans):
+    """
+    Stack exchange plans into lane parameters, one lane per plan.
+
+    Args:
+        plans (list): ExchangePlan objects
+
+    Returns:
+        LaneParameters: Stacked combat parameters
+    """
+    negate = None
+    if any(any(plan.negate) for plan in plans):
+        negate = np.array([plan.negate for plan in plans], dtype=np.int16).T
+
+    return LaneParameters(
+        np.array([plan.hit for plan in plans], dtype=np.int16).T,
+        np.array([plan.crit for plan in plans], dtype=np.int16).T,
+        np.array([plan.damage for plan in plans], dtype=np.int32).T,
+        _stack_slots([plan_slots(plan.order) for plan in plans]),
+        negate
+    )
+
+
+def _stack_slots(slots):
+    """Stack the slots of several plans, padding shorter rounds with NO_STRIKE."""
+    width = max(len(row) for row in slots)
+    return np.array([row + [NO_STRIKE] * (width - len(row)) for row in slots], dtype=np.int8)
+
+
+def random_rolls(rng, guarded=False):
+    """
+    Create a roll source drawing fresh d100 rolls from a generator.
+
+    Args:
+        rng (numpy.random.Generator): Random generator
+        guarded (bool): Also draw the rolls of targets negating hits
+
+    Returns:
+        callable: Roll source for simulate_fights
+    """
+    def draw(round_index, slot, lanes):
+        size = len(lanes)
+        if guarded:
+            return tuple(rng.integers(1, 101, (3, size), dtype=np.int16))
+        return (rng.integers(1, 101, size, dtype=np.int16),
+                rng.integers(1, 101, size, dtype=np.int16))
+
+    return draw
+
+
+def simulate_fights(params, attacker_hp, defender_hp, iterations, max_rounds=10,
+                    rng=None, rolls=None):
+    """
+    Simulate independent battles in one vectorized pass.
+
+    Args:
+        params (LaneParameters): Combat parameters of each battle
+        attacker_hp (int or numpy.ndarray): Attacker's starting HP
+        defender_hp (int or numpy.ndarray): Defender's starting HP
+        iterations (int): Number of battles to simulate
+        max_rounds (int): Number of rounds after which a battle is a draw
+        rng (numpy.random.Generator, optional): Random generator for the rolls
+        rolls (callable, optional): Roll source called as
+            rolls(round_index, slot, lanes) and returning (hit_rolls, crit_rolls)
+            for the given lanes, followed by guard_rolls when params.negate is
+            set; overrides rng
+
+    Returns:
+        FightBatch: Per-battle results
+    """
+    guarded = params.negate is not None
+    if rolls is None:
+        rolls = random_rolls(rng if rng is not None else np.random.default_rng(), guarded)
+
+    winner = np.full(iterations, NO_VICTORY, dtype=np.int8)
+    rounds = np.full(iterations, max_rounds, dtype=np.int16)
+    final_attacker_hp = np.empty(iterations, dtype=np.int32)
+    final_defender_hp = np.empty(iterations, dtype=np.int32)
+
+    # State of the battles still in progress, compacted as battles finish
+    lanes = np.arange(iterations)
+    attacker_left = np.broadcast_to(np.asarray(attacker_hp, dtype=np.int32), (iterations,)).copy()
+    defender_left = np.broadcast_to(np.asarray(defender_hp, dtype=np.int32), (iterations,)).copy()
+
+    # With a single set of parameters, every battle strikes in the same order
+    uniform = params.slots.shape[0] == 1
+    negate = params.negate if guarded else np.zeros((2, 1), dtype=np.int16)
+    if uniform:
+        hit, crit, damage = (params.hit[:, 0], params.crit[:, 0], params.damage[:, 0])
+        negate = negate[:, 0]
+        slots = params.slots[0]
+    else:
+        hit = np.broadcast_to(params.hit, (2, iterations)).copy()
+        crit = np.broadcast_to(params.crit, (2, iterations)).copy()
+        damage = np.broadcast_to(params.damage, (2, iterations)).copy()
+        negate = np.broadcast_to(negate, (2, iterations)).copy()
+        slots = np.broadcast_to(params.slots, (iterations, params.slots.shape[1])).copy()
+
+    for round_index in range(max_rounds):
+        for slot in range(params.slots.shape[1]):
+            if not lanes.size:
+                break
+
+            if uniform:
+                side = int(slots[slot])
+                if side == NO_STRIKE:
+                    continue
+                attacker_strikes = side == ATTACKER
+                defender_strikes = side == DEFENDER
+            else:
+                side = slots[:, slot]
+                attacker_strikes = side == ATTACKER
+                defender_strikes = side == DEFENDER
+                if not (attacker_strikes.any() or defender_strikes.any()):
+                    continue
+
+            drawn = rolls(round_index, slot, lanes)
+            hit_rolls, crit_rolls = drawn[:2]
+            if guarded:
+                if len(drawn) < 3:
+                    raise ValueError("Hits can be negated, but the roll source has no guard rolls")
+                guard_rolls = drawn[2]
+            else:
+                guard_rolls = None
+            defeated = False
+
+            if np.any(attacker_strikes):
+                dealt = strike_damage(hit_rolls, crit_rolls, hit[ATTACKER],
+                                       crit[ATTACKER], damage[ATTACKER], attacker_strikes,
+                                       guard_rolls, negate[ATTACKER])
+                defender_left = np.maximum(defender_left - dealt, 0, dtype=np.int32)
+                defeated = defeated | (attacker_strikes & (defender_left <= 0))
+
+            if np.any(defender_strikes):
+                dealt = strike_damage(hit_rolls, crit_rolls, hit[DEFENDER],
+                                       crit[DEFENDER], damage[DEFENDER], defender_strikes,
+                                       guard_rolls, negate[DEFENDER])
+                attacker_left = np.maximum(attacker_left - dealt, 0, dtype=np.int32)
+                defeated = defeated | (defender_strikes & (attacker_left <= 0))
+
+            if not np.any(defeated):
+                continue
+
+            finished = lanes[defeated]
+            attacker_won = attacker_strikes & (defender_left <= 0)
+            winner[finished] = np.where(attacker_won[defeated], ATTACKER, DEFENDER)
+            rounds[finished] = round_index + 1
+            final_attacker_hp[finished] = attacker_left[defeated]
+            final_defender_hp[finished] = defender_left[defeated]
+
+            keep = ~defeated
+            lanes = lanes[keep]
+            attacker_left = attacker_left[keep]
+            defender_left = defender_left[keep]
+            if not uniform:
+                hit, crit, damage = hit[:, keep], crit[:, keep], damage[:, keep]
+                negate = negate[:, keep]
+                slots = slots[keep]
+
+    final_attacker_hp[lanes] = attacker_left
+    final_defender_hp[lanes] = defender_left
+
+    return FightBatch(winner, rounds, final_attacker_hp, final_defender_hp)
+
+
+def strike_damage(hit_rolls, crit_rolls, hit, crit, damage, striking, guard_rolls=None,
+                  negate=0):
+    """
+    Compute the damage dealt by one strike in every battle.
+
+    Args:
+        hit_rolls (numpy.ndarray): d100 hit rolls
+        crit_rolls (numpy.ndarray): d100 critical hit rolls
+        hit: Hit rate of the striking side
+        crit: Critical hit rate of the striking side
+        damage: Non-critical damage of the striking side
+        striking: Whether the side strikes in each battle
+        guard_rolls (numpy.ndarray, optional): d100 rolls of the target
+            negating the hit
+        negate: Chance that the target negates the hit
+
+    Returns:
+        numpy.ndarray: Damage dealt in each battle
+    """
+    landed = striking & (hit_rolls <= hit)
+    if guard_rolls is not None:
+        landed &= guard_rolls > negate
+    critical = landed & (crit_rolls <= crit)
+
+    # 0 for a miss, 1 for a hit and 3 for a critical hit
+    multiplier = landed.view(np.int8) + (critical.view(np.int8) << 1)
+    return damage * multiplier
+
+
+def predict_battle_outcome_vectorized(attacker, defender, iterations=100, max_rounds=10,
+                                      seed=None, terrain=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                                      distance=None):
+    """
+    Predict the outcome of a battle by simulating many fights as NumPy arrays.
+
+    Args:
+        attacker: The attacking character
+        defender: The defending character
+        iterations: Number of simulations to run
+        max_rounds: Number of rounds after which a battle is a draw
+        seed: Seed for the random generator
+        terrain: Terrain effects
+        chunk_size: Maximum number of battles simulated in one pass
+        distance: Distance between the characters in tiles (see Battle)
+
+    Returns:
+        dict: Battle outcome prediction statistics, as in predict_battle_outcome
+    """
+    plan = build_exchange_plan(attacker, defender, terrain, distance)
+    params = plan_arrays([plan])
+    rng = np.random.default_rng(seed)
+
+    totals = OutcomeTotals.empty()
+    remaining = iterations
+    while remaining > 0:
+        size = min(chunk_size, remaining)
+        batch = simulate_fights(params, attacker.current_hp, defender.current_hp,
+                                size, max_rounds, rng)
+        totals = totals.merge(batch.totals())
+        remaining -= size
+
+    return totals.to_results()
+
+
+def _strike_chances(params, side, target_hp):
+    """
+    Compute per-lane kill thresholds and transition chances of one side.
+
+    Damage is counted in units of the side's normal damage: a hit adds one unit
+    and a critical hit adds three, and the target falls once the units reach the
+    threshold. A target already at 0 HP falls on the next strike whatever the
+    roll, a side dealing no damage never makes progress, and a hit the target
+    negates counts as a miss.
+
+    Returns:
+        tuple: (threshold, miss chance, hit chance, critical chance) arrays
+    """
+    hit = _landed_chance(params, side)
+    crit = params.crit[side] / 100
+    damage = params.damage[side]
+
+    down = target_hp <= 0
+    harmless = (damage <= 0) & ~down
+    threshold = np.where(down | harmless, 1, -(-target_hp // np.maximum(damage, 1)))
+
+    normal = np.where(down, 1.0, np.where(harmless, 0.0, hit * (1 - crit)))
+    critical = np.where(down | harmless, 0.0, hit * crit)
+    miss = 1.0 - normal - critical
+
+    return threshold.astype(np.int64), miss, normal, critical
+
+
+def _landed_chance(params, side):
+    """Chance that a strike of one side hits and is not negated, per lane."""
+    hit = params.hit[side] / 100
+    if params.negate is None:
+        return hit
+    return hit * (1 - params.negate[side] / 100)
+
+
+def exact_outcomes(params, attacker_hp, defender_hp, max_rounds=10, max_states=1 << 22):
+    """
+    Compute exact outcome probabilities for many battles in one pass.
+
+    Each lane walks the same hit/crit/miss tree as solve_exchange, tracking the
+    damage dealt by each side in units of its normal damage. Lanes are grouped
+    by the size of that state grid and solved together.
+
+    Args:
+        params (LaneParameters): Combat parameters of each battle
+        attacker_hp (int or numpy.ndarray): Attacker's starting HP
+        defender_hp (int or numpy.ndarray): Defender's starting HP
+        max_rounds (int): Number of rounds after which a battle is a draw
+        max_states (int): Maximum number of grid states solved at once
+
+    Returns:
+        dict: Arrays keyed like the result of solve_exchange
+    """
+    lanes = max(params.hit.shape[1], params.slots.shape[0], np.size(attacker_hp), np.size(defender_hp))
+    params = LaneParameters(
+        np.broadcast_to(params.hit, (2, lanes)),
+        np.broadcast_to(params.crit, (2, lanes)),
+        np.broadcast_to(params.damage, (2, lanes)),
+        np.broadcast_to(params.slots, (lanes, params.slots.shape[1])),
+        None if params.negate is None else np.broadcast_to(params.negate, (2, lanes))
+    )
+    hp = np.empty((2, lanes), dtype=np.int64)
+    hp[ATTACKER] = attacker_hp
+    hp[DEFENDER] = defender_hp
+
+    # Side ATTACKER's progress is measured against the defender's HP and vice versa
+    chances = [_strike_chances(params, ATTACKER, hp[DEFENDER]),
+               _strike_chances(params, DEFENDER, hp[ATTACKER])]
+    thresholds = np.stack([chances[ATTACKER][0], chances[DEFENDER][0]])
+
+    keys = ("attacker_victory_probability", "defender_victory_probability",
+            "no_victory_probability", "average_attacker_remaining_hp",
+            "average_defender_remaining_hp", "average_rounds")
+    results = {key: np.zeros(lanes) for key in keys}
+
+    # Sort lanes by grid shape once, then walk the runs of equal shapes
+    order = np.lexsort((thresholds[DEFENDER], thresholds[ATTACKER]))
+    shape_keys = thresholds[:, order]
+    boundaries = np.flatnonzero(np.any(shape_keys[:, 1:] != shape_keys[:, :-1], axis=0)) + 1
+    for group in np.split(order, boundaries):
+        if not group.size:
+            continue
+        a_units, d_units = thresholds[:, group[0]]
+        step = max(1, max_states // int(a_units * d_units))
+
+        for start in range(0, len(group), step):
+            lane_ids = group[start:start + step]
+            solved = _solve_grid(params, hp, chances, lane_ids, int(a_units), int(d_units), max_rounds)
+            for key in keys:
+                results[key][lane_ids] = solved[key]
+
+    return results
+
+
+def _solve_grid(params, hp, chances, lane_ids, a_units, d_units, max_rounds):
+    """
+    Solve lanes sharing the same grid of (attacker units, defender units) states.
+
+    The grid only holds states where both sides are still standing; probability
+    that leaves it is a victory for the side that struck.
+    """
+    count = len(lane_ids)
+    grid = np.zeros((count, a_units, d_units))
+    grid[:, 0, 0] = 1.0
+
+    slots = params.slots[lane_ids]
+    damage = params.damage[:, lane_ids]
+
+    # Remaining HP of each side for each number of units taken
+    attacker_left = np.maximum(0, hp[ATTACKER, lane_ids, None] - np.arange(d_units) * damage[DEFENDER, :, None])
+    defender_left = np.maximum(0, hp[DEFENDER, lane_ids, None] - np.arange(a_units) * damage[ATTACKER, :, None])
+
+    probabilities = [np.zeros(count), np.zeros(count)]
+    attacker_hp_sum = np.zeros(count)
+    defender_hp_sum = np.zeros(count)
+    rounds_sum = np.zeros(count)
+
+    # Transition chances of every striking side in every slot, where a side
+    # that does not strike in a lane's slot always "misses"
+    strikes = []
+    for slot in range(slots.shape[1]):
+        for side in (ATTACKER, DEFENDER):
+            striking = slots[:, slot] == side
+            if striking.any():
+                strikes.append((side, [np.where(striking, values[lane_ids], fallback)
+                                       for values, fallback in zip(chances[side][1:], (1.0, 0.0, 0.0))]))
+
+    for round_number in range(1, max_rounds + 1):
+        for side, (miss, normal, critical) in strikes:
+            # Move probability along the striking side's axis of the grid
+            axis = 1 if side == ATTACKER else 2
+            grid, fallen = _advance(grid, axis, miss, normal, critical)
+
+            fallen_total = fallen.sum(axis=1)
+            probabilities[side] += fallen_total
+            rounds_sum += fallen_total * round_number
+            if side == ATTACKER:
+                attacker_hp_sum += (fallen * attacker_left).sum(axis=1)
+            else:
+                defender_hp_sum += (fallen * defender_left).sum(axis=1)
+
+    # Whatever is still standing after the last round is inconclusive
+    standing = grid.sum(axis=(1, 2))
+    attacker_hp_sum += (grid.sum(axis=1) * attacker_left).sum(axis=1)
+    defender_hp_sum += (grid.sum(axis=2) * defender_left).sum(axis=1)
+    rounds_sum += standing * max_rounds
+
+    return {
+        "attacker_victory_probability": probabilities[ATTACKER],
+        "defender_victory_probability": probabilities[DEFENDER],
+        "no_victory_probability": standing,
+        "average_attacker_remaining_hp": attacker_hp_sum,
+        "average_defender_remaining_hp": defender_hp_sum,
+        "average_rounds": rounds_sum,
+    }
+
+
+def _advance(grid, axis, miss, normal, critical):
+    """
+    Apply one strike along an axis of the state grid.
+
+    Returns:
+        tuple: (new grid, probability leaving the grid over the other axis)
+    """
+    size = grid.shape[axis]
+    moved = np.moveaxis(grid, axis, 1)
+
+    new = moved * miss[:, None, None]
+    new[:, 1:] += moved[:, :-1] * normal[:, None, None]
+    fallen = moved[:, size - 1] * normal[:, None]
+
+    if critical.any():
+        if size > 3:
+            new[:, 3:] += moved[:, :-3] * critical[:, None, None]
+        near_threshold = moved[:, size - 1].copy()
+        for units in range(max(0, size - 3), size - 1):
+            near_threshold += moved[:, units]
+        fallen += near_threshold * critical[:, None]
+
+    return np.moveaxis(new, 1, axis), fallen
+
+
+
+def exact_outcomes_marginal(params, attacker_hp, defender_hp, attacker_damage, defender_damage,
+                            max_rounds=10, max_states=1 << 18):
+    """
+    Compute exact outcome probabilities for many battles, averaged over HP and damage.
+
+    The starting HP and the non-critical damage of each side follow
+    distributions shared by every lane and independent of its hit and crit
+    rates; params.damage is not used. Counting strikes in units of damage, the
+    walk only depends on hit and crit rates, and damage and HP only decide
+    where each side falls. Damage dealt only ever grows, so a state where both
+    sides are still standing has the same probability whatever happens past
+    their kill thresholds, and one walk sized for the largest threshold serves
+    every HP and damage at once.
+
+    Args:
+        params (LaneParameters): Hit rates, crit rates and strike slots of each battle
+        attacker_hp (dict): Probability of each starting HP of the attacker
+        defender_hp (dict): Probability of each starting HP of the defender
+        attacker_damage (dict): Probability of each damage dealt by the attacker
+        defender_damage (dict): Probability of each damage dealt by the defender
+        max_rounds (int): Number of rounds after which a battle is a draw
+        max_states (int): Maximum number of states solved at once
+
+    Returns:
+        dict: Arrays keyed like the result of solve_exchange, with expected
+        values over HP and damage
+    """
+    if min(attacker_hp) <= 0 or min(defender_hp) <= 0:
+        raise ValueError("Starting HP must be positive")
+
+    lanes = max(params.hit.shape[1], params.slots.shape[0])
+    hit = np.broadcast_to(np.stack([_landed_chance(params, side) for side in (ATTACKER, DEFENDER)]),
+                          (2, lanes))
+    crit = np.broadcast_to(params.crit, (2, lanes)) / 100
+    slots = np.broadcast_to(params.slots, (lanes, params.slots.shape[1]))
+
+    targets = [_target_state(attacker_damage, defender_hp), _target_state(defender_damage, attacker_hp)]
+    strikes = [(1.0 - hit[side], hit[side] * (1 - crit[side]), hit[side] * crit[side])
+               for side in (ATTACKER, DEFENDER)]
+
+    step = max(1, max_states // (len(targets[ATTACKER][1]) + len(targets[DEFENDER][1])))
+    solved = {}
+    for start in range(0, lanes, step):
+        lane_ids = np.arange(start, min(lanes, start + step))
+        for key, values in _solve_marginal(slots, strikes, targets, lane_ids, max_rounds).items():
+            solved.setdefault(key, []).append(values)
+
+    return {key: np.concatenate(values) for key, values in solved.items()}
+
+
+def _target_state(damage, target_hp):
+    """
+    Summarize when a target falls, given the striker's damage and the target's HP.
+
+    Units of damage are counted up to the largest kill threshold; the last
+    state stands for that many units or more. A strike dealing no damage
+    never brings the target down.
+
+    Args:
+        damage (dict): Probability of each damage dealt by the striker
+        target_hp (dict): Probability of each starting HP of the target
+
+    Returns:
+        tuple: (probability of each kill threshold, indexed by units; chance
+        the target is still standing after each number of units; expected
+        remaining HP while standing)
+    """
+    dealt = np.array(list(damage), dtype=np.int64)[:, None]
+    hp = np.array(list(target_hp), dtype=np.int64)[None, :]
+    weights = (np.array(list(damage.values()))[:, None]
+               * np.array(list(target_hp.values()))[None, :])
+    weights = weights / weights.sum()
+
+    harmless = np.broadcast_to(dealt <= 0, weights.shape)
+    thresholds = np.broadcast_to(-(-hp // np.maximum(dealt, 1)), weights.shape)
+    units = int(thresholds[~harmless].max()) if not harmless.all() else 0
+
+    # Harmless strikes get a threshold past the last state, which is never reached
+    thresholds = np.where(harmless, units + 1, thresholds).ravel()
+    dealt = np.broadcast_to(np.maximum(dealt, 0), weights.shape).ravel()
+    hp = np.broadcast_to(hp, weights.shape).ravel()
+    weights = weights.ravel()
+
+    def by_threshold(values):
+        totals = np.zeros(units + 2)
+        np.add.at(totals, thresholds, values)
+        return totals
+
+    # Standing after x units means a threshold above x
+    def above(totals):
+        return np.cumsum(totals[::-1])[::-1][1:]
+
+    chances = by_threshold(weights)
+    standing = above(chances)
+    remaining_hp = above(by_threshold(weights * hp)) - np.arange(units + 1) * above(
+        by_threshold(weights * dealt))
+
+    chances[units + 1] = 0.0
+    return chances, standing, remaining_hp
+
+
+def _solve_marginal(slots, strikes, targets, lane_ids, max_rounds):
+    """
+    Solve lanes whose HP and damage follow shared distributions.
+
+    Nothing is absorbed when a side falls: probability is weighted by the
+    chance that both sides are still standing when it is read. The units dealt
+    by each side then evolve independently, so the (attacker units, defender
+    units) distribution is the product of one distribution per side.
+    """
+    count = len(lane_ids)
+    progress = [np.zeros((count, len(targets[side][1]))) for side in (ATTACKER, DEFENDER)]
+    progress[ATTACKER][:, 0] = 1.0
+    progress[DEFENDER][:, 0] = 1.0
+    slots = slots[lane_ids]
+
+    probabilities = [np.zeros(count), np.zeros(count)]
+    hp_sums = [np.zeros(count), np.zeros(count)]
+    rounds_sum = np.zeros(count)
+
+    # Transition chances of every striking side in every slot, and the chance
+    # its target falls to a strike from each number of units
+    schedule = []
+    for slot in range(slots.shape[1]):
+        for side in (ATTACKER, DEFENDER):
+            striking = slots[:, slot] == side
+            if not striking.any():
+                continue
+            miss, normal, critical = [np.where(striking, values[lane_ids], fallback)
+                                      for values, fallback in zip(strikes[side], (1.0, 0.0, 0.0))]
+            chances = np.append(targets[side][0], [0.0, 0.0])
+            last = len(targets[side][1])
+            near = chances[1:last + 1] + chances[2:last + 2] + chances[3:last + 3]
+            falls = normal[:, None] * chances[1:last + 1] + critical[:, None] * near
+            schedule.append((side, miss[:, None], normal[:, None], critical[:, None], falls))
+
+    for round_number in range(1, max_rounds + 1):
+        for side, miss, normal, critical, falls in schedule:
+            _, striker_standing, striker_hp = targets[1 - side]
+            fallen = (progress[side] * falls).sum(axis=1)
+            striker_alive = progress[1 - side] @ striker_standing
+
+            probabilities[side] += fallen * striker_alive
+            hp_sums[side] += fallen * (progress[1 - side] @ striker_hp)
+            rounds_sum += fallen * striker_alive * round_number
+
+            # Units past the last state are kept in it
+            old = progress[side]
+            new = old * miss
+            new[:, 1:] += old[:, :-1] * normal
+            new[:, -1] += old[:, -1] * normal[:, 0]
+            new[:, 3:] += old[:, :-3] * critical
+            new[:, -1] += old[:, -3:].sum(axis=1) * critical[:, 0]
+            progress[side] = new
+
+    # Whatever is still standing after the last round is inconclusive
+    _, defender_standing, defender_hp = targets[ATTACKER]
+    _, attacker_standing, attacker_hp = targets[DEFENDER]
+    defender_alive = progress[ATTACKER] @ defender_standing
+    attacker_alive = progress[DEFENDER] @ attacker_standing
+    standing = defender_alive * attacker_alive
+    hp_sums[ATTACKER] += defender_alive * (progress[DEFENDER] @ attacker_hp)
+    hp_sums[DEFENDER] += (progress[ATTACKER] @ defender_hp) * attacker_alive
+    rounds_sum += standing * max_rounds
+
+    return {
+        "attacker_victory_probability": probabilities[ATTACKER],
+        "defender_victory_probability": probabilities[DEFENDER],
+        "no_victory_probability": standing,
+        "average_attacker_remaining_hp": hp_sums[ATTACKER],
+        "average_defender_remaining_hp": hp_sums[DEFENDER],
+        "average_rounds": rounds_sum,
+    }
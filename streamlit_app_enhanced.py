@@ -7,12 +7,14 @@ import time
 import random
 import matplotlib.pyplot as plt
 from fe_combat_sim.entities import Character, Weapon
-from fe_combat_sim.combat import Battle
+from fe_combat_sim.combat import Battle, SKILLS
 from fe_combat_sim.data import (
-    WEAPONS, CHARACTER_TEMPLATES, 
-    get_weapon, create_character_from_template
+    WEAPONS, CHARACTER_TEMPLATES, TERRAIN_TYPES, WEAPON_RANGES,
+    get_weapon, create_character_from_template, get_terrain
 )
-from fe_combat_sim.utils.prediction import predict_damage, predict_battle_outcome
+from fe_combat_sim.utils.prediction import predict_battle_outcome
+from fe_combat_sim.utils.forecast_cache import ForecastCache
+from fe_combat_sim.utils.sweep import sweep_terrain
 
 # Set page config
 st.set_page_config(
@@ -28,6 +30,13 @@ This app lets you simulate battles between characters from a Fire Emblem-style
 tactical RPG. Create characters, equip weapons, and simulate combat!
 """)
 
+# Forecasts are shared across reruns, so unchanged matchups are not recomputed
+@st.cache_resource
+def get_forecast_cache():
+    return ForecastCache()
+
+forecast_cache = get_forecast_cache()
+
 # Initialize session state for combat log
 if 'combat_log' not in st.session_state:
     st.session_state.combat_log = []
@@ -84,6 +93,13 @@ def character_creator(column, character_key, default_name):
             key=f"weapon_{character_key}"
         )
         
+        skills = st.multiselect(
+            "Skills",
+            sorted(SKILLS),
+            key=f"skills_{character_key}",
+            help="; ".join(f"{skill.name}: {skill.description}" for skill in SKILLS.values())
+        )
+        
         # Create and return character
         character = create_character_from_template(
             name,
@@ -91,6 +107,7 @@ def character_creator(column, character_key, default_name):
             level,
             weapon_name
         )
+        character.skills = tuple(skills)
         
         # Display character stats
         st.write("---")
@@ -126,6 +143,25 @@ def character_creator(column, character_key, default_name):
 attacker = character_creator(col1, "attacker", "Marth")
 defender = character_creator(col2, "defender", "Minerva")
 
+# ---- Terrain ----
+st.header("Terrain")
+
+terrain_names = [terrain.name for terrain in TERRAIN_TYPES]
+col_terrain1, col_terrain2, col_terrain3 = st.columns(3)
+attacker_tile = get_terrain(col_terrain1.selectbox(f"{attacker.name}'s Tile", terrain_names))
+defender_tile = get_terrain(col_terrain2.selectbox(f"{defender.name}'s Tile", terrain_names))
+terrain = (attacker_tile, defender_tile)
+
+# Attacks start from the nearest tile the attacker's weapon reaches
+distance = col_terrain3.number_input(
+    "Distance (tiles)",
+    min_value=1,
+    max_value=WEAPON_RANGES.max_distance,
+    value=attacker.weapon.range[0] if attacker.weapon else 1
+)
+if not WEAPON_RANGES.can_counter(attacker.weapon, defender.weapon, distance):
+    col_terrain3.caption(f"{defender.name} cannot counter from this distance.")
+
 # ---- Combat Prediction ----
 st.header("Combat Prediction")
 
@@ -136,7 +172,7 @@ with colA:
     st.subheader(f"{attacker.name} → {defender.name}")
     
     # Predict damage
-    atk_damage_pred = predict_damage(attacker, defender)
+    atk_damage_pred = forecast_cache.predict_damage(attacker, defender, terrain, distance)
     
     # Format as a table
     atk_data = {
@@ -157,7 +193,8 @@ with colB:
     st.subheader(f"{defender.name} → {attacker.name}")
     
     # Predict damage
-    def_damage_pred = predict_damage(defender, attacker)
+    def_damage_pred = forecast_cache.predict_damage(defender, attacker,
+                                                   (defender_tile, attacker_tile), distance)
     
     # Format as a table
     def_data = {
@@ -178,7 +215,8 @@ with colB:
 if st.button("Predict Battle Outcome (100 Simulations)", type="secondary"):
     # Show spinner during calculation
     with st.spinner("Running simulations..."):
-        outcome = predict_battle_outcome(attacker, defender, iterations=100)
+        outcome = predict_battle_outcome(attacker, defender, iterations=100,
+                                         terrain=terrain, distance=distance)
     
     st.subheader("Battle Outcome Prediction")
     
@@ -257,7 +295,7 @@ if st.button("Simulate Battle", type="primary"):
     st.session_state.combat_log = []
     
     # Create battle
-    battle = Battle(attacker, defender)
+    battle = Battle(attacker, defender, terrain, distance=distance)
     
     # Simulate combat
     result = battle.simulate_round()
@@ -289,6 +327,9 @@ if st.button("Simulate Battle", type="primary"):
             
             # Add slight delay for animation effect
             time.sleep(0.5)
+        
+        for name, weapon in battle.broken_weapons:
+            st.write(f"💔 {name}'s {weapon.name} broke!")
     
     # Show result
     st.subheader("Result")
@@ -334,20 +375,20 @@ elif st.session_state.combat_log:
         if i < len(st.session_state.combat_log) - 1:
             st.write("---")
     
-# ---- Terrain Effects (Section for future development) ----
-with st.expander("Terrain Settings (Coming Soon)"):
-    st.write("""
-    In future versions, you'll be able to set terrain effects that modify
-    combat outcomes. Terrain can provide defensive bonuses, movement penalties,
-    or other strategic effects.
+# ---- Terrain Sweep ----
+with st.expander("Victory Chance on Every Terrain"):
+    st.write(f"""
+    Exact chance of {attacker.name} winning within 10 rounds for every pair of tiles
+    (rows: {attacker.name}'s tile, columns: {defender.name}'s tile).
     """)
     
-    # Placeholder terrain selector
-    terrain_type = st.selectbox(
-        "Terrain Type (Preview)",
-        ["Plains", "Forest", "Mountain", "Fort", "River", "Desert"],
-        disabled=True
+    terrain_matrix = sweep_terrain(attacker, defender, distance=distance)
+    terrain_df = pd.DataFrame(
+        terrain_matrix["attacker_victory_percentage"],
+        index=terrain_names,
+        columns=terrain_names
     )
+    st.dataframe(terrain_df.style.format("{:.1f}%"))
 
 # ---- About ----
 with st.expander("About This Simulator"):
@@ -5,6 +5,7 @@ from fe_combat_sim.entities import Character, Weapon, CharacterClass
 from fe_combat_sim.entities import KNIGHT, PEGASUS_KNIGHT
 from fe_combat_sim.combat import Battle
 from fe_combat_sim.data import get_weapon, create_character_from_template
+from fe_combat_sim.utils.prediction import predict_battle_outcome
 
 def test_imports():
     """Test that all imports work correctly."""
@@ -63,9 +64,1245 @@ def test_battle_simulation():
     
     print("Success!")
 
+def test_exact_prediction():
+    """Test that the exact prediction engine returns consistent probabilities."""
+    print("Testing exact prediction... ", end="")
+    
+    marth = create_character_from_template("Marth", "Lord", 1, "Killing Edge")
+    draug = create_character_from_template("Draug", "Knight", 1, "Iron Lance")
+    attacker_hp = marth.current_hp
+    
+    outcome = predict_battle_outcome(marth, draug, method="exact")
+    
+    total = (outcome["attacker_victory_percentage"] +
+             outcome["defender_victory_percentage"] +
+             outcome["no_victory_percentage"])
+    assert abs(total - 100) < 1e-9
+    assert 1 <= outcome["average_rounds"] <= 10
+    assert marth.current_hp == attacker_hp
+    
+    # A fight where nobody can land a hit never ends
+    marth.stats["skl"] = 0
+    marth.weapon = Weapon("Blunt Sword", "Sword", might=0, hit=0)
+    draug.weapon = None
+    outcome = predict_battle_outcome(marth, draug, method="exact")
+    assert outcome["no_victory_percentage"] == 100
+    assert outcome["average_rounds"] == 10
+    
+    print("Success!")
+
+def test_vectorized_prediction():
+    """Test that the vectorized backend agrees with the exact engine."""
+    print("Testing vectorized prediction... ", end="")
+    
+    from fe_combat_sim.utils.vectorized import predict_battle_outcome_vectorized
+    
+    marth = create_character_from_template("Marth", "Lord", 1, "Killing Edge")
+    minerva = create_character_from_template("Minerva", "Wyvern Rider", 1, "Steel Lance")
+    
+    exact = predict_battle_outcome(marth, minerva, method="exact")
+    sampled = predict_battle_outcome_vectorized(marth, minerva, iterations=200000, seed=7)
+    
+    assert sampled["attacker_victories"] + sampled["defender_victories"] + sampled["no_victory"] == 200000
+    for key in exact:
+        assert abs(exact[key] - sampled[key]) < 0.02 * max(1, exact[key])
+    
+    # The same seed reproduces the same sample
+    assert sampled == predict_battle_outcome_vectorized(marth, minerva, iterations=200000, seed=7)
+    
+    print("Success!")
+
+def test_parallel_prediction():
+    """Test that parallel prediction is reproducible across worker counts."""
+    print("Testing parallel prediction... ", end="")
+    
+    marth = create_character_from_template("Marth", "Lord", 1, "Killing Edge")
+    minerva = create_character_from_template("Minerva", "Wyvern Rider", 1, "Steel Lance")
+    
+    single = predict_battle_outcome(marth, minerva, iterations=150000, workers=1, seed=3)
+    pooled = predict_battle_outcome(marth, minerva, iterations=150000, workers=2, seed=3)
+    
+    assert single == pooled
+    assert single["attacker_victories"] + single["defender_victories"] + single["no_victory"] == 150000
+    
+    print("Success!")
+
+def test_adaptive_prediction():
+    """Test that adaptive prediction stops once intervals are tight enough."""
+    print("Testing adaptive prediction... ", end="")
+    
+    from fe_combat_sim.utils.adaptive import predict_battle_outcome_adaptive
+    
+    marth = create_character_from_template("Marth", "Lord", 1, "Killing Edge")
+    minerva = create_character_from_template("Minerva", "Wyvern Rider", 1, "Steel Lance")
+    
+    outcome = predict_battle_outcome_adaptive(marth, minerva, half_width=2.0, seed=11)
+    exact = predict_battle_outcome(marth, minerva, method="exact")
+    
+    assert outcome["converged"]
+    assert outcome["iterations"] < 10**6
+    for key, (lower, upper) in outcome["confidence_intervals"].items():
+        assert (upper - lower) / 2 <= 2.0
+        assert lower <= outcome[key] <= upper
+    
+    lower, upper = outcome["confidence_intervals"]["attacker_victory_percentage"]
+    assert lower - 1 <= exact["attacker_victory_percentage"] <= upper + 1
+    
+    # Critical values match the standard normal table
+    from fe_combat_sim.utils.confidence import normal_quantile, z_score
+    assert abs(z_score(0.95) - 1.959963984540054) < 1e-12
+    assert abs(z_score(0.99) - 2.5758293035489) < 1e-12
+    assert abs(normal_quantile(0.001) + 3.090232306167813) < 1e-12
+    
+    print("Success!")
+
+def test_matchup_sweep():
+    """Test that a matchup sweep matches single exact predictions."""
+    print("Testing matchup sweep... ", end="")
+    
+    from fe_combat_sim.data import CHARACTER_TEMPLATES
+    from fe_combat_sim.utils.stats import calculate_average_stats
+    from fe_combat_sim.utils.sweep import UnitAxis, sweep_matchups
+    
+    attackers = UnitAxis(["Lord", "Mage"], ["Killing Edge", "Fire"], [1, 12])
+    defenders = UnitAxis(["Knight", "Pegasus Knight"], ["Javelin", "Iron Bow"], [5, 20])
+    matrix = sweep_matchups(attackers, defenders)
+    
+    assert matrix["average_rounds"].shape == (8, 8)
+    assert matrix.grid("attacker_victory_percentage").shape == (2, 2, 2, 2, 2, 2)
+    
+    def build(label):
+        template = CHARACTER_TEMPLATES[label[0]]
+        stats = calculate_average_stats(template["stats"], template["growth_rates"], label[2] - 1)
+        return Character(label[0], template["class"], stats, get_weapon(label[1]))
+    
+    for attacker_label in attackers.labels:
+        for defender_label in defenders.labels:
+            expected = predict_battle_outcome(build(attacker_label), build(defender_label), method="exact")
+            cell = matrix.cell(attacker_label, defender_label)
+            for metric, value in expected.items():
+                assert abs(cell[metric] - value) < 1e-9
+    
+    print("Success!")
+
+def test_snapshot_prediction():
+    """Test that predictions never touch the caller's characters."""
+    print("Testing snapshot prediction... ", end="")
+    
+    from fe_combat_sim.combat import CombatSnapshot
+    
+    marth = create_character_from_template("Marth", "Lord", 1, "Silver Sword")
+    draug = create_character_from_template("Draug", "Knight", 1, "Iron Lance")
+    marth.current_hp = 12
+    
+    snapshot = CombatSnapshot.from_character(marth)
+    try:
+        snapshot.stats["str"] = 99
+        assert False, "Snapshot stats should be read-only"
+    except TypeError:
+        pass
+    
+    # A snapshot computes the same damage as its character
+    assert snapshot._calculate_damage(draug) == marth._calculate_damage(draug)
+    
+    for method in ("monte_carlo", "vectorized", "exact"):
+        outcome = predict_battle_outcome(marth, draug, iterations=200, method=method)
+        assert outcome["average_attacker_remaining_hp"] <= 12
+        assert marth.current_hp == 12
+        assert draug.current_hp == draug.stats["hp"]
+    
+    print("Success!")
+
+def test_forecast_cache():
+    """Test that forecasts are memoized on combat-relevant stats."""
+    print("Testing forecast cache... ", end="")
+    
+    from fe_combat_sim.utils.forecast_cache import ForecastCache
+    from fe_combat_sim.utils.prediction import predict_damage
+    
+    marth = create_character_from_template("Marth", "Lord", 1, "Rapier")
+    draug = create_character_from_template("Draug", "Knight", 1, "Iron Lance")
+    cache = ForecastCache(maxsize=2)
+    
+    assert cache.predict_damage(marth, draug) == predict_damage(marth, draug)
+    
+    # HP does not affect a forecast, so a wounded unit reuses the entry
+    marth.current_hp -= 5
+    assert cache.predict_damage(marth, draug) == predict_damage(marth, draug)
+    assert cache.info()["hits"] == 1 and cache.info()["misses"] == 1
+    
+    # Terrain and the defender's weapon are part of the key
+    cache.predict_damage(marth, draug, {"avoid": 20})
+    draug.weapon = get_weapon("Iron Axe")
+    forecast = cache.predict_damage(marth, draug)
+    assert forecast == predict_damage(marth, draug)
+    assert cache.info()["misses"] == 3 and len(cache) == 2
+    
+    cache.invalidate(draug)
+    assert len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
+    
+    print("Success!")
+
+def test_streaming_prediction():
+    """Test that streaming predictions yield consistent running results."""
+    print("Testing streaming prediction... ", end="")
+    
+    from fe_combat_sim.utils.streaming import iter_battle_outcome
+    
+    marth = create_character_from_template("Marth", "Lord", 5, "Iron Sword")
+    draug = create_character_from_template("Draug", "Knight", 5, "Iron Lance")
+    
+    updates = list(iter_battle_outcome(marth, draug, iterations=2500, report_every=1000, seed=3))
+    assert [update["iterations"] for update in updates] == [1000, 2000, 2500]
+    assert [update["done"] for update in updates] == [False, False, True]
+    
+    final = updates[-1]
+    total = final["attacker_victories"] + final["defender_victories"] + final["no_victory"]
+    assert total == 2500
+    lower, upper = final["confidence_intervals"]["attacker_victory_percentage"]
+    assert lower <= final["attacker_victory_percentage"] <= upper
+    
+    # Cancelling keeps the work done, which can be resumed later
+    stream = iter_battle_outcome(marth, draug, report_every=500, seed=3)
+    partial = next(stream)
+    stream.close()
+    resumed = list(iter_battle_outcome(marth, draug, iterations=1500, report_every=500,
+                                       seed=4, totals=partial["totals"]))
+    assert len(resumed) == 2 and resumed[-1]["iterations"] == 1500
+    
+    # Resuming with the run's own seed samples new fights instead of replaying it
+    first = list(iter_battle_outcome(marth, draug, iterations=2000, report_every=2000, seed=5))[0]
+    again = list(iter_battle_outcome(marth, draug, iterations=4000, report_every=2000, seed=5,
+                                     totals=first["totals"]))[0]
+    assert again["iterations"] == 4000
+    added = tuple(total - earlier for total, earlier in zip(again["totals"], first["totals"]))
+    assert added != tuple(first["totals"])
+    
+    print("Success!")
+
+def test_loadout_comparison():
+    """Test that loadout comparisons share their random rolls."""
+    print("Testing loadout comparison... ", end="")
+    
+    from fe_combat_sim.utils.comparison import compare_loadouts
+    
+    silver = create_character_from_template("Marth", "Lord", 10, "Silver Sword")
+    killing = create_character_from_template("Marth", "Lord", 10, "Killing Edge")
+    minerva = create_character_from_template("Minerva", "Wyvern Rider", 10, "Iron Lance")
+    
+    comparison = compare_loadouts([(silver, minerva), (killing, minerva), (silver, minerva)],
+                                  iterations=4000, antithetic=True, seed=5)
+    
+    # The same matchup on the same rolls gives the same fights
+    assert comparison["results"][0] == comparison["results"][2]
+    assert comparison["differences"][2]["average_rounds"]["variance"] == 0
+    
+    silver_exact = predict_battle_outcome(silver, minerva, method="exact")
+    killing_exact = predict_battle_outcome(killing, minerva, method="exact")
+    paired = comparison["differences"][1]["average_rounds"]
+    expected = killing_exact["average_rounds"] - silver_exact["average_rounds"]
+    assert abs(paired["difference"] - expected) < 5 * paired["standard_error"]
+    assert paired["variance"] < paired["independent_variance"]
+    
+    print("Success!")
+
+def test_growth_prediction():
+    """Test that growth-aware predictions average exact outcomes over level-ups."""
+    print("Testing growth prediction... ", end="")
+    
+    import itertools
+    from fe_combat_sim.data import CHARACTER_TEMPLATES
+    from fe_combat_sim.utils.growth import TemplateUnit, predict_battle_outcome_growth
+    from fe_combat_sim.utils.stats import growth_distribution
+    
+    distribution = growth_distribution(5, 0.4, 10)
+    assert abs(sum(distribution.values()) - 1) < 1e-12
+    assert abs(sum(value * p for value, p in distribution.items()) - 9) < 1e-12
+    assert max(growth_distribution(5, 1.0, 10, max_stat=12)) == 12
+    
+    # Fixed characters give the exact prediction
+    marth = create_character_from_template("Marth", "Lord", 5, "Iron Sword")
+    minerva = create_character_from_template("Minerva", "Wyvern Rider", 5, "Iron Lance")
+    growth = predict_battle_outcome_growth(marth, minerva)
+    exact = predict_battle_outcome(marth, minerva, method="exact")
+    for key, value in exact.items():
+        assert abs(growth[key] - value) < 1e-9
+    
+    # A level 2 unit is one level-up away from its base stats
+    lord = TemplateUnit("Lord", 2, "Iron Sword")
+    pegasus = TemplateUnit("Pegasus Knight", 1, "Iron Lance")
+    growth = predict_battle_outcome_growth(lord, pegasus, tolerance=0)
+    assert growth["pruned_probability"] == 0
+    
+    template = CHARACTER_TEMPLATES["Lord"]
+    stats = list(template["stats"])
+    expected = dict.fromkeys(exact, 0.0)
+    for gains in itertools.product((0, 1), repeat=len(stats)):
+        chance = 1.0
+        leveled = create_character_from_template("Lord", "Lord", 1, "Iron Sword")
+        for stat, gain in zip(stats, gains):
+            rate = template["growth_rates"].get(stat, 0)
+            chance *= rate if gain else 1 - rate
+            leveled.stats[stat] = template["stats"][stat] + gain
+        if chance == 0:
+            continue
+        leveled.current_hp = leveled.stats["hp"]
+        defender = create_character_from_template("Pegasus", "Pegasus Knight", 1, "Iron Lance")
+        for key, value in predict_battle_outcome(leveled, defender, method="exact").items():
+            expected[key] += chance * value
+    for key, value in expected.items():
+        assert abs(growth[key] - value) < 1e-9
+    
+    print("Success!")
+
+
+def test_combat_profile():
+    """Test that a battle's combat profiles match its calculation methods."""
+    print("Testing combat profile... ", end="")
+    
+    from fe_combat_sim.utils.exchange import build_exchange_plan
+    
+    marth = create_character_from_template("Marth", "Lord", 10, "Silver Sword")
+    minerva = create_character_from_template("Minerva", "Wyvern Rider", 10, "Iron Bow")
+    battle = Battle(marth, minerva, {"avoid": 10})
+    
+    profile = battle.attacker_profile
+    assert profile.hit == battle._calculate_hit_rate(marth, minerva)
+    assert profile.crit == min(100, battle._calculate_crit_rate(marth, minerva))
+    assert profile.damage == marth._calculate_damage(minerva)
+    assert profile.critical_damage == profile.damage * 3
+    assert profile.can_strike
+    
+    # A bow cannot counter at range 1, so the defender never strikes
+    assert not battle.defender_profile.can_strike
+    assert not battle.defender_profile.follow_up
+    
+    plan = build_exchange_plan(marth, minerva, {"avoid": 10})
+    assert plan.hit == tuple(p.hit for p in battle.profiles)
+    assert plan.order == (0, 0) or plan.order == (0,)
+    
+    battle.simulate_round()
+    assert marth.current_hp == marth.stats["hp"]
+    assert all(entry["attacker"] == "Marth" for entry in battle.log)
+    
+    print("Success!")
+
+
+def test_battle_log_levels():
+    """Test that a battle's log level only changes what is recorded."""
+    print("Testing battle log levels... ", end="")
+    
+    import random
+    from fe_combat_sim.combat import AttackEvent, LOG_COMPACT, LOG_NONE
+    
+    logs = {}
+    for log_level in (LOG_NONE, LOG_COMPACT, "full"):
+        marth = create_character_from_template("Marth", "Lord", 1, "Killing Edge")
+        draug = create_character_from_template("Draug", "Knight", 1, "Iron Lance")
+        battle = Battle(marth, draug, log_level=log_level)
+        random.seed(11)
+        for _ in range(10):
+            if battle.simulate_round()["victory"]:
+                break
+        logs[log_level] = (battle.log, marth.current_hp, draug.current_hp)
+    
+    assert logs[LOG_NONE][0] == []
+    assert logs[LOG_NONE][1:] == logs[LOG_COMPACT][1:] == logs["full"][1:]
+    
+    compact, full = logs[LOG_COMPACT][0], logs["full"][0]
+    assert all(isinstance(event, AttackEvent) for event in compact)
+    assert [entry.event for entry in full] == compact
+    for event, entry in zip(compact, full):
+        assert entry["message"] == event.message
+        assert ("damage" in entry) == event.hit
+        assert entry.get("critical", False) == event.critical
+    
+    try:
+        Battle(marth, draug, log_level="verbose")
+        assert False, "Unknown log levels should be rejected"
+    except ValueError:
+        pass
+    
+    print("Success!")
+
+
+def test_event_log():
+    """Test that a columnar event log records the same attacks as a full log."""
+    print("Testing event log... ", end="")
+    
+    import random
+    from fe_combat_sim.combat import EventLog, LOG_COLUMNAR
+    
+    def fight(log_level, event_log=None):
+        marth = create_character_from_template("Marth", "Lord", 5, "Killing Edge")
+        minerva = create_character_from_template("Minerva", "Wyvern Rider", 5, "Iron Axe")
+        battle = Battle(marth, minerva, log_level=log_level, event_log=event_log)
+        for _ in range(10):
+            if battle.simulate_round()["victory"]:
+                break
+        return battle.log
+    
+    random.seed(3)
+    full = [list(fight("full")) for _ in range(20)]
+    
+    random.seed(3)
+    event_log = EventLog()
+    for _ in range(20):
+        assert fight(LOG_COLUMNAR, event_log) is event_log
+    
+    assert len(event_log.fights) == 20
+    assert len(event_log) == sum(len(entries) for entries in full)
+    assert [dict(entry) for entry in event_log] == [dict(entry) for entries in full for entry in entries]
+    assert event_log.fight_entries(7) == full[7]
+    assert event_log[-1]["message"] == full[-1][-1]["message"]
+    assert event_log.nbytes == 12 * len(event_log)
+    
+    frame = event_log.to_dataframe()
+    assert len(frame) == len(event_log)
+    assert frame["damage"].sum() == sum(entry.get("damage", 0) for entries in full for entry in entries)
+    assert set(frame["attacker"]) <= {"Marth", "Minerva"}
+    assert frame["hit"].dtype == bool
+    
+    print("Success!")
+
+
+def test_bounded_battle_log():
+    """Test that bounded battle logs keep only the latest attacks."""
+    print("Testing bounded battle log... ", end="")
+    
+    import random
+    from fe_combat_sim.combat import LOG_COLUMNAR, LOG_LAST_ROUND
+    
+    def fight(**options):
+        marth = create_character_from_template("Marth", "Lord", 1, "Iron Sword")
+        draug = create_character_from_template("Draug", "Knight", 1, "Iron Lance")
+        battle = Battle(marth, draug, **options)
+        random.seed(8)
+        results = [battle.simulate_round() for _ in range(6)]
+        return battle, results
+    
+    unbounded, _ = fight()
+    entries = [dict(entry) for entry in unbounded.log]
+    assert len(entries) > 5
+    
+    ring, _ = fight(log_limit=5)
+    assert [dict(entry) for entry in ring.log] == entries[-5:]
+    
+    per_round, results = fight(log_limit=LOG_LAST_ROUND)
+    assert per_round.log == per_round.last_round == unbounded.last_round
+    assert sum(len(result["log"]) for result in results) == len(entries)
+    assert results[0]["log"] is not results[1]["log"]
+    
+    columnar, _ = fight(log_level=LOG_COLUMNAR)
+    assert [dict(entry) for entry in columnar.last_round] == [dict(entry) for entry in unbounded.last_round]
+    
+    for options in ({"log_limit": 0}, {"log_limit": True}, {"log_limit": 3, "log_level": LOG_COLUMNAR}):
+        try:
+            fight(**options)
+            assert False, "Invalid log limits should be rejected"
+        except ValueError:
+            pass
+    
+    print("Success!")
+
+
+def test_battle_replay():
+    """Test that battles can be seeded, recorded and replayed exactly."""
+    print("Testing battle replay... ", end="")
+    
+    from fe_combat_sim.combat import CounterRandom, ReplayRandom
+    from fe_combat_sim.utils.exchange import build_exchange_plan, sample_exchange
+    from fe_combat_sim.utils.outcome import OutcomeTotals
+    
+    def fight(**options):
+        marth = create_character_from_template("Marth", "Lord", 1, "Killing Edge")
+        draug = create_character_from_template("Draug", "Knight", 1, "Iron Lance")
+        battle = Battle(marth, draug, **options)
+        for _ in range(10):
+            if battle.simulate_round()["victory"]:
+                break
+        return battle, [dict(entry) for entry in battle.log]
+    
+    first, log = fight(seed=42, record_rolls=True)
+    assert first.rolls and all(1 <= roll <= 100 for roll in first.rolls)
+    assert fight(seed=first.seed)[1] == log
+    
+    replayed, replay_log = fight(rng=ReplayRandom(first.rolls), record_rolls=True)
+    assert replay_log == log and replayed.rolls == first.rolls
+    
+    # Counter-based streams regenerate any fight without the ones before it
+    marth = create_character_from_template("Marth", "Lord", 1, "Killing Edge")
+    draug = create_character_from_template("Draug", "Knight", 1, "Iron Lance")
+    outcome = predict_battle_outcome(marth, draug, iterations=500, seed=9)
+    assert outcome == predict_battle_outcome(marth, draug, iterations=500, seed=9)
+    
+    plan = build_exchange_plan(marth, draug)
+    fights = [sample_exchange(plan, marth.current_hp, draug.current_hp, 10, CounterRandom(9, k))
+              for k in range(500)]
+    assert sum(f.winner == 0 for f in fights) == outcome["attacker_victories"]
+    # Outcomes are summed one by one, so a generator of fights gives the same totals
+    assert OutcomeTotals.from_outcomes(iter(fights)).to_results() == outcome
+    assert fights[321] == sample_exchange(plan, marth.current_hp, draug.current_hp, 10,
+                                          CounterRandom(9).for_fight(321))
+    
+    rolls = [CounterRandom(1, 0).randint(1, 100) for _ in range(3)]
+    assert len(set(rolls)) == 1
+    stream = CounterRandom(1, 0)
+    counts = [0] * 100
+    for _ in range(20000):
+        counts[stream.randint(1, 100) - 1] += 1
+    assert min(counts) > 120 and max(counts) < 290
+    
+    print("Success!")
+
+
+def test_battle_replay_file():
+    """Test that battles round-trip through the binary replay format."""
+    print("Testing battle replay file... ", end="")
+    
+    import os
+    import tempfile
+    from fe_combat_sim.combat import ReplayReader, ReplayWriter, record_battle
+    from fe_combat_sim.combat.replay import FILE_MAGIC, FORMAT_VERSION, decode_replay, encode_replay
+    
+    replays = []
+    for seed in range(30):
+        marth = create_character_from_template("Marth", "Lord", 5, "Killing Edge")
+        pegasus = create_character_from_template("Caeda", "Pegasus Knight", 5, "Iron Lance")
+        replays.append(record_battle(marth, pegasus, {"avoid": 10}, seed=seed))
+    
+    # The replay keeps the state from before the fight
+    assert replays[-1].attacker.current_hp == marth.stats["hp"]
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "replays.bin")
+        with ReplayWriter(path) as writer:
+            for replay in replays:
+                writer.write(replay)
+        
+        with ReplayReader(path) as reader:
+            assert len(reader) == len(replays)
+            replay = reader[17]
+            assert encode_replay(replay) == encode_replay(replays[17])
+            assert replay.seed == 17 and replay.terrain[1].avoid == 10
+            
+            # Re-running with the recorded rolls reproduces the messages
+            battle = replay.rerun()
+            assert [entry["message"] for entry in battle.log] == \
+                [entry["message"] for entry in replay.entries()]
+            assert [entry["message"] for entry in replay.entries()] == \
+                [entry["message"] for entry in replays[17].rerun().log]
+        
+        # Without its index, a file is read by walking its records
+        with open(path, "rb") as file:
+            data = file.read()
+        with open(path, "wb") as file:
+            file.write(data[:-(len(replays) * 8 + 24 + 5)])
+        with ReplayReader(path) as reader:
+            assert len(reader) == len(replays) - 1
+            assert encode_replay(reader[-1]) == encode_replay(replays[-2])
+        
+        # Records whose terrain is not a pair of tiles are rejected
+        try:
+            decode_replay(encode_replay(replays[0]._replace(terrain=())))
+            assert False, "expected a ValueError"
+        except ValueError as error:
+            assert "terrain" in str(error)
+        
+        # Files of any other format version are rejected rather than misread
+        with open(path, "r+b") as file:
+            file.seek(4)
+            file.write((FORMAT_VERSION + 1).to_bytes(2, "little"))
+        try:
+            ReplayReader(path)
+            assert False, "expected a ValueError"
+        except ValueError as error:
+            assert "version" in str(error)
+        
+        # A file shorter than its header is not a replay file
+        with open(path, "wb") as file:
+            file.write(FILE_MAGIC)
+        try:
+            ReplayReader(path)
+            assert False, "expected a ValueError"
+        except ValueError as error:
+            assert "Not a replay file" in str(error)
+    
+    # Any 64-bit seed, signed or not, is stored as it was given
+    for seed in (2**63 + 5, 2**64 - 1, -2**63, -7, None):
+        assert decode_replay(encode_replay(replays[0]._replace(seed=seed))).seed == seed
+    try:
+        encode_replay(replays[0]._replace(seed=2**64))
+        assert False, "expected a ValueError"
+    except ValueError as error:
+        assert "64 bits" in str(error)
+    
+    print("Success!")
+
+
+def test_terrain():
+    """Test that each side's tile modifies its defense, and terrain sweeps."""
+    print("Testing terrain... ", end="")
+    
+    from fe_combat_sim.data import PLAINS, TERRAIN, get_terrain, resolve_terrain
+    from fe_combat_sim.utils.exact import predict_battle_outcome_exact
+    from fe_combat_sim.utils.sweep import sweep_terrain
+    
+    fort = get_terrain("Fort")
+    assert fort.heal_amount(40) == 8
+    assert resolve_terrain(None) == (PLAINS, PLAINS)
+    assert resolve_terrain(("Forest", fort)) == (TERRAIN["Forest"], fort)
+    assert resolve_terrain({"avoid": 10})[1].avoid == 10
+    
+    marth = create_character_from_template("Marth", "Lord", 5, "Killing Edge")
+    knight = create_character_from_template("Draug", "Knight", 5, "Iron Lance")
+    
+    plains = Battle(marth, knight)
+    battle = Battle(marth, knight, ("Mountain", "Fort"))
+    assert battle.attacker_profile.hit == max(0, plains.attacker_profile.hit - fort.avoid)
+    assert battle.attacker_profile.damage == max(0, plains.attacker_profile.damage - fort.defense)
+    assert battle.defender_profile.damage == max(0, plains.defender_profile.damage - 2)
+    
+    # A modifier dict still applies to both sides
+    shared = Battle(marth, knight, {"avoid": 20, "defense": 2})
+    assert shared.tiles[0] == shared.tiles[1]
+    
+    matrix = sweep_terrain(marth, knight)
+    assert matrix["attacker_victory_percentage"].shape == (len(TERRAIN), len(TERRAIN))
+    for attacker_tile in ("Plains", "Forest"):
+        for defender_tile in ("Fort", "River"):
+            exact = predict_battle_outcome_exact(marth, knight, terrain=(attacker_tile, defender_tile))
+            cell = matrix.cell(attacker_tile, defender_tile)
+            for key in ("attacker_victory_percentage", "defender_victory_percentage"):
+                assert abs(cell[key] - exact[key]) < 1e-9
+    
+    df = matrix.to_dataframe()
+    assert len(df) == len(TERRAIN) ** 2
+    print("Success!")
+
+
+def test_attack_distance():
+    """Test that strikes and counters depend on the distance of the attack."""
+    print("Testing attack distance... ", end="")
+    
+    from fe_combat_sim.data import CHARACTER_TEMPLATES, WEAPONS, WEAPON_RANGES
+    from fe_combat_sim.utils.stats import calculate_average_stats
+    from fe_combat_sim.utils.sweep import UnitAxis, sweep_matchups
+    
+    assert get_weapon("Longbow").range_mask == 0b1100
+    assert get_weapon("Physic").reaches(10)
+    
+    # The table agrees with the weapons' ranges for every pair and distance
+    table = WEAPON_RANGES.to_array()
+    assert table.shape == (len(WEAPONS), len(WEAPONS), WEAPON_RANGES.max_distance + 1)
+    for i, attack in enumerate(WEAPONS.values()):
+        for j, counter in enumerate(WEAPONS.values()):
+            for distance in range(WEAPON_RANGES.max_distance + 1):
+                expected = attack.reaches(distance) and counter.reaches(distance)
+                assert table[i, j, distance] == expected
+                assert WEAPON_RANGES.can_counter(attack, counter, distance) == expected
+    assert not WEAPON_RANGES.can_counter(get_weapon("Iron Bow"), get_weapon("Iron Sword"), 2)
+    assert WEAPON_RANGES.can_counter(get_weapon("Iron Bow"), get_weapon("Hand Axe"), 2)
+    assert get_weapon("Fire") in WEAPON_RANGES.counter_weapons(get_weapon("Javelin"), 2)
+    
+    archer = create_character_from_template("Wolt", "Lord", 5, "Iron Bow")
+    knight = create_character_from_template("Draug", "Knight", 5, "Iron Lance")
+    mage = create_character_from_template("Lute", "Mage", 5, "Fire")
+    
+    # Bows attack from 2 tiles by default, out of the lance's reach
+    battle = Battle(archer, knight)
+    assert battle.distance == 2 and not battle.defender_profile.can_strike
+    assert Battle(mage, knight, distance=2).attacker_profile.can_strike
+    assert not Battle(mage, knight, distance=2).defender_profile.can_strike
+    assert Battle(mage, create_character_from_template("Hector", "Knight", 5, "Hand Axe"),
+                  distance=2).defender_profile.can_strike
+    
+    # Out of the attacker's reach, nobody strikes
+    battle = Battle(knight, archer, distance=2)
+    assert not battle.attacker_profile.can_strike and not battle.defender_profile.can_strike
+    assert battle.simulate_round() == {"victory": False, "log": []}
+    assert predict_battle_outcome(knight, archer, method="exact", distance=2)["no_victory_percentage"] == 100
+    
+    # Replays keep the distance
+    from fe_combat_sim.combat import record_battle
+    from fe_combat_sim.combat.replay import decode_replay, encode_replay
+    assert decode_replay(encode_replay(record_battle(mage, knight, seed=1, distance=2))).distance == 2
+    
+    # The batched sweep agrees with the exact solver at every distance
+    attackers = UnitAxis(["Lord", "Mage"], ["Iron Bow", "Fire", "Javelin"], [5])
+    defenders = UnitAxis(["Knight"], ["Iron Lance", "Hand Axe", "Longbow"], [5])
+    
+    def build(label):
+        template = CHARACTER_TEMPLATES[label[0]]
+        stats = calculate_average_stats(template["stats"], template["growth_rates"], label[2] - 1)
+        return Character(label[0], template["class"], stats, get_weapon(label[1]))
+    
+    for distance in (None, 1, 2, 3):
+        matrix = sweep_matchups(attackers, defenders, distance=distance)
+        for attacker_label in attackers.labels:
+            for defender_label in defenders.labels:
+                expected = predict_battle_outcome(build(attacker_label), build(defender_label),
+                                                  method="exact", distance=distance)
+                cell = matrix.cell(attacker_label, defender_label)
+                for metric, value in expected.items():
+                    assert abs(cell[metric] - value) < 1e-9
+    
+    print("Success!")
+
+
+def test_weapon_durability():
+    """Test that every unit wears its own copy of a shared weapon."""
+    print("Testing weapon durability... ", end="")
+    
+    import os
+    import tempfile
+    from fe_combat_sim.combat import ReplayReader, ReplayWriter, record_battle
+    from fe_combat_sim.combat.replay import encode_replay
+    from fe_combat_sim.entities import WeaponInstance
+    from fe_combat_sim.utils.unit_table import UnitTable
+    
+    marth = create_character_from_template("Marth", "Lord", 5, "Iron Sword")
+    roy = create_character_from_template("Roy", "Lord", 5, "Iron Sword")
+    assert isinstance(marth.weapon, WeaponInstance)
+    assert marth.weapon is not roy.weapon
+    assert marth.weapon.definition is roy.weapon.definition is get_weapon("Iron Sword")
+    assert marth.weapon.might == 5 and marth.weapon.reaches(1)
+    
+    # Each strike uses the striker's copy only
+    knight = create_character_from_template("Draug", "Knight", 5, "Iron Lance")
+    battle = Battle(marth, knight, seed=3)
+    battle.simulate_round()
+    assert marth.weapon.current_uses == 46 - sum(entry["attacker"] == "Marth" for entry in battle.log)
+    assert roy.weapon.current_uses == 46 and get_weapon("Iron Sword").current_uses == 46
+    
+    # A weapon breaks on its last use and strikes no more
+    marth.weapon = get_weapon("Silver Sword").instance(current_uses=1)
+    marth.stats["spd"] = 30
+    marth.current_hp = knight.current_hp = 99
+    battle = Battle(marth, knight, seed=3)
+    battle.simulate_round()
+    assert marth.weapon is None
+    assert [name for name, _ in battle.broken_weapons] == ["Marth"]
+    assert [entry["attacker"] for entry in battle.log] == ["Marth", "Draug"]
+    assert not battle.attacker_profile.can_strike
+    
+    # A weapon already broken before the battle never strikes
+    worn = create_character_from_template("Roy", "Lord", 5, "Iron Sword")
+    worn.weapon.current_uses = 0
+    battle = Battle(worn, knight, seed=3)
+    assert battle.attacker_profile == (0, 0, 0, 0, False, False, False) and 0 not in battle.order
+    knight_hp = knight.current_hp
+    battle.simulate_round()
+    assert knight.current_hp == knight_hp
+    assert all(entry["attacker"] == "Draug" for entry in battle.log)
+    
+    # A definition used on its own still wears out, but units equipping it start fresh
+    javelin = Weapon("Javelin", "Lance", might=6, hit=65, range=(1, 2), uses=2)
+    assert javelin.use() and not javelin.use() and javelin.is_broken
+    assert Character("Sain", "Cavalier", {"hp": 20}, javelin).weapon.current_uses == 2
+    assert javelin.instance().current_uses == 2
+    
+    # Wearing a catalog weapon does not reach characters created from templates
+    catalog_sword = get_weapon("Iron Sword")
+    catalog_sword.use()
+    catalog_sword.use()
+    try:
+        assert create_character_from_template("Eliwood", "Lord", 1, "Iron Sword").weapon.current_uses == 46
+    finally:
+        catalog_sword.current_uses = catalog_sword.uses
+    
+    # Unbreakable weapons never wear out
+    staff = WeaponInstance(Weapon("Stick", "Staff", might=0, hit=100))
+    assert staff.use() and staff.current_uses is None and not staff.is_broken
+    
+    # Replays keep the uses left, so a re-run breaks the same weapon at the same strike
+    lyn = create_character_from_template("Lyn", "Lord", 5, "Killing Edge")
+    lyn.weapon.current_uses = 2
+    replay = record_battle(lyn, create_character_from_template("Bors", "Knight", 5, "Iron Lance"),
+                           seed=5)
+    assert replay.attacker.weapon.current_uses == 2
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "replays.bin")
+        with ReplayWriter(path) as writer:
+            writer.write(replay)
+        with ReplayReader(path) as reader:
+            loaded = reader[0]
+    assert encode_replay(loaded) == encode_replay(replay)
+    rerun = loaded.rerun()
+    assert [dict(entry) for entry in rerun.log] == [dict(entry) for entry in replay.entries()]
+    assert [name for name, _ in rerun.broken_weapons] == ["Lyn"]
+    
+    # Unit tables intern the shared definitions, not the copies
+    table = UnitTable.from_characters([create_character_from_template(f"Unit {i}", "Lord", 1, "Iron Sword")
+                                       for i in range(100)])
+    assert table.weapons == [get_weapon("Iron Sword")]
+    
+    print("Success!")
+
+
+def test_army_pairings():
+    """Test that army pairings resolve like battles, all at once."""
+    print("Testing army pairings... ", end="")
+    
+    import numpy as np
+    from fe_combat_sim.entities import CAVALIER
+    from fe_combat_sim.utils.army import resolve_pairings
+    from fe_combat_sim.utils.exact import predict_battle_outcome_exact
+    from fe_combat_sim.utils.exchange import ATTACKER, DEFENDER
+    from fe_combat_sim.utils.unit_table import UnitTable
+    
+    lancer = Character("Sain", CAVALIER, {"hp": 24, "str": 9, "mag": 0, "skl": 7, "spd": 7,
+                                          "lck": 5, "def": 8, "res": 1}, get_weapon("Steel Lance"))
+    knight = Character("Wallace", KNIGHT, {"hp": 30, "str": 11, "mag": 0, "skl": 6, "spd": 2,
+                                           "lck": 3, "def": 13, "res": 2}, get_weapon("Hand Axe"))
+    lancer.current_hp, knight.current_hp = 10, 12
+    
+    # Many copies of one matchup reproduce the exact outcome of that many rounds
+    count = 100000
+    attackers = UnitTable.from_characters([lancer] * count)
+    defenders = UnitTable.from_characters([knight] * count)
+    pairings = np.stack([np.arange(count), np.arange(count)], axis=1)
+    for rounds in (1, 3):
+        results = resolve_pairings(attackers, defenders, pairings, rounds=rounds, seed=1)
+        expected = predict_battle_outcome_exact(lancer, knight, max_rounds=rounds)
+        assert abs(np.mean(results.winner == ATTACKER) * 100 - expected["attacker_victory_percentage"]) < 1
+        assert abs(np.mean(results.winner == DEFENDER) * 100 - expected["defender_victory_percentage"]) < 1
+        assert abs(results.defender_hp.mean() - expected["average_defender_remaining_hp"]) < 0.1
+    
+    # Tables are not modified, and units outside the pairings are untouched
+    results = resolve_pairings([lancer, lancer], [knight, knight], [(1, 0)], seed=2)
+    assert results.attacker_hp[0] == 10 and results.defender_hp[1] == 12
+    assert attackers.current_hp[0] == 10
+    
+    # Each strike wears the striker's weapon; a broken weapon strikes no more
+    lord = CharacterClass("Lord", 5, ["Infantry", "Royal"])
+    stats = {"hp": 40, "str": 1, "skl": 10, "spd": 30, "lck": 5, "def": 5, "res": 0}
+    fast = Character("Lyn", lord, stats, get_weapon("Iron Sword"))
+    worn = Character("Guy", lord, stats, get_weapon("Iron Sword").instance(1))
+    walls = [Character("Oswin", KNIGHT, {"hp": 60, "str": 0, "skl": 0, "spd": 0, "lck": 0,
+                                         "def": 0, "res": 0}, get_weapon("Iron Lance"))
+             for _ in range(2)]
+    results = resolve_pairings([fast, worn], walls, [(0, 0), (1, 1)], seed=3)
+    assert list(results.attacker_uses) == [44, 0]
+    assert list(results.defender_uses) == [44, 44]
+    
+    # A weapon broken before the pass never strikes
+    broken = Character("Guy", lord, stats, get_weapon("Iron Sword").instance(0))
+    results = resolve_pairings([broken], walls[:1], [(0, 0)], seed=3)
+    assert list(results.defender_hp) == [walls[0].current_hp]
+    assert list(results.attacker_uses) == [0]
+    
+    # An army can fight itself, as long as every unit fights once
+    army = [lancer, knight, lancer, knight]
+    results = resolve_pairings(army, army, [(0, 1), (3, 2)], seed=4)
+    assert results.attacker_hp is results.defender_hp
+    try:
+        resolve_pairings(army, army, [(0, 1), (1, 2)])
+        assert False, "a unit fought twice"
+    except ValueError:
+        pass
+    
+    print("Success!")
+
+
+def test_grid_map():
+    """Test movement on a tile grid."""
+    print("Testing grid map... ", end="")
+    
+    import heapq
+    import random
+    from fe_combat_sim.data.movement import movement_cost
+    from fe_combat_sim.entities import CAVALIER, INFANTRY
+    from fe_combat_sim.grid import GridMap, find_reachable, grid_neighbors
+    
+    stats = {"hp": 20, "str": 5, "skl": 5, "spd": 5, "lck": 5, "def": 5, "res": 0}
+    grid = GridMap.from_rows([
+        ".....",
+        ".^^~.",
+        ".....",
+    ])
+    archer = Character("Rebecca", INFANTRY, stats)
+    knight = Character("Oswin", KNIGHT, stats)
+    flier = Character("Florina", PEGASUS_KNIGHT, stats)
+    rider = Character("Kent", CAVALIER, stats)
+    grid.place(archer, (1, 0), "player")
+    grid.place(knight, (0, 2), "player")
+    grid.place(flier, (4, 2), "player")
+    
+    # Mountains cost infantry 4 and stop armor; fliers ignore terrain
+    assert grid.reachable(archer)[(1, 1)] == 4
+    assert (1, 1) not in grid.reachable(knight) and (3, 1) not in grid.reachable(knight)
+    assert grid.reachable(knight)[(4, 2)] == 4
+    assert len(grid.reachable(flier)) == 15
+    
+    # Enemies block the way; allies can be passed through but not stopped on
+    grid.place(rider, (1, 2), "enemy")
+    assert (2, 2) not in grid.reachable(knight) and (1, 2) not in grid.reachable(knight)
+    assert (0, 2) in grid.reachable(archer) and (0, 2) not in grid.destinations(archer)
+    assert dict(grid.reachable(rider)) == {(1, 2): 0, (2, 2): 1, (3, 2): 2}
+    
+    # Results are cached until a unit of another team moves or the tiles change
+    reach = grid.reachable(knight)
+    grid.move(archer, (2, 0))
+    assert grid.reachable(knight) is reach
+    grid.move(rider, (2, 2))
+    assert grid.reachable(knight) is not reach and grid.reachable(knight)[(1, 2)] == 1
+    grid.set_tile((0, 1), "River")
+    assert (0, 1) not in grid.reachable(knight)
+    grid.remove(rider)
+    assert grid.position_of(rider) is None and grid.units("enemy") == []
+    
+    # The cache keeps only the most recently used results
+    grid.reach_cache_size = 2
+    for position in [(0, 0), (1, 0), (3, 0)]:
+        grid.reachable(knight, position)
+    assert len(grid._reach_cache) == 2
+    
+    # The bucket search agrees with a textbook Dijkstra
+    random.seed(7)
+    width, height = 12, 9
+    costs = [movement_cost(random.choice(["Plains", "Forest", "Mountain", "River"]), "Mounted")
+             for _ in range(width * height)]
+    neighbors = grid_neighbors(width, height)
+    blocked = set(random.sample(range(width * height), 10)) - {0}
+    expected = {0: 0}
+    queue = [(0, 0)]
+    while queue:
+        used, tile = heapq.heappop(queue)
+        for adjacent in neighbors[tile]:
+            if costs[adjacent] is None or adjacent in blocked:
+                continue
+            total = used + costs[adjacent]
+            if total <= 7 and total < expected.get(adjacent, 8):
+                expected[adjacent] = total
+                heapq.heappush(queue, (total, adjacent))
+    assert find_reachable(costs, neighbors, 0, 7, blocked) == expected
+    
+    print("Success!")
+
+
+def test_threat_map():
+    """Test the enemy danger zone and its incremental updates."""
+    print("Testing threat map... ", end="")
+    
+    import random
+    from fe_combat_sim.entities import INFANTRY
+    from fe_combat_sim.grid import GridMap, ThreatMap
+    
+    stats = {"hp": 20, "str": 5, "skl": 5, "spd": 5, "lck": 5, "def": 5, "res": 0}
+    grid = GridMap(9, 9)
+    archer = Character("Archer", KNIGHT, stats, get_weapon("Iron Bow"))
+    grid.place(archer, (4, 4), "enemy")
+    threat = ThreatMap(grid, "enemy")
+    
+    # Reachable tiles plus the weapon's range: 4 moves, then 2 tiles away
+    assert threat.threat_of(archer) == {(x, y) for x in range(9) for y in range(9)
+                                        if abs(x - 4) + abs(y - 4) <= 6}
+    assert threat.count((4, 4)) == 1 and threat.threatened_by((0, 0)) == []
+    
+    # Player units all around pin the archer down; freeing a side opens the zone again
+    walls = [Character(f"Wall {number}", INFANTRY, stats, get_weapon("Iron Sword")) for number in range(4)]
+    for wall, position in zip(walls, [(3, 4), (5, 4), (4, 3), (4, 5)]):
+        threat.place(wall, position, "player")
+    assert threat.threat_of(archer) == {(4, 2), (4, 6), (2, 4), (6, 4), (3, 3), (5, 3), (3, 5), (5, 5)}
+    threat.move(walls[0], (0, 0))
+    assert threat.count((0, 4)) == 1 and threat.threatened_by((0, 4)) == [archer]
+    threat.remove(archer)
+    assert threat.danger_zone() == set()
+    
+    # After any sequence of moves, the counts match a map built from scratch
+    random.seed(3)
+    grid = GridMap.from_rows(["..f..~...", ".^^..~.f.", "....#....", ".f..~~...", "........."])
+    units = []
+    for number in range(12):
+        unit = create_character_from_template(f"Unit {number}", random.choice(["Lord", "Knight", "Cavalier", "Pegasus Knight"]),
+                                              weapon_name=random.choice(["Iron Sword", "Javelin", "Iron Bow", "Longbow", "Heal"]))
+        empty = [(x, y) for x in range(9) for y in range(5) if grid.unit_at((x, y)) is None]
+        grid.place(unit, random.choice(empty), "enemy" if number % 2 else "player")
+        units.append(unit)
+    threat = ThreatMap(grid, "enemy")
+    for step in range(40):
+        unit = random.choice(grid.units())
+        if step % 9 == 8:
+            threat.remove(unit)
+        else:
+            threat.move(unit, random.choice(grid.destinations(unit)))
+        assert threat.counts == ThreatMap(grid, "enemy").counts
+    assert threat.danger_zone() == set().union(*(threat.threat_of(unit) for unit in grid.units("enemy")))
+    assert threat.to_array().sum() == sum(threat.counts)
+    
+    print("Success!")
+
+
+def test_targeting_ai():
+    """Test batched enemy target selection."""
+    print("Testing targeting AI... ", end="")
+    
+    from fe_combat_sim.entities import INFANTRY
+    from fe_combat_sim.grid import GridMap
+    from fe_combat_sim.utils.exact import predict_battle_outcome_exact
+    from fe_combat_sim.utils.targeting import TargetWeights, TargetingAI
+    
+    def unit(name, hp, defense, weapon):
+        stats = {"hp": hp, "str": 6, "skl": 5, "spd": 5, "lck": 0, "def": defense, "res": 0}
+        return Character(name, INFANTRY, stats, get_weapon(weapon))
+    
+    grid = GridMap.from_rows([".......", "..f....", "......."])
+    brigand = unit("Brigand", 30, 3, "Iron Sword")
+    frail = unit("Frail", 4, 0, "Iron Lance")
+    archer = unit("Archer", 30, 3, "Iron Bow")
+    grid.place(brigand, (0, 1), "enemy")
+    grid.place(frail, (3, 0), "player")
+    grid.place(archer, (3, 2), "player")
+    ai = TargetingAI(grid, "enemy")
+    
+    # Every reachable tile next to a target is a candidate, and the kill is preferred
+    candidates = ai.candidates()
+    assert {(position, target.name) for _, position, target, _ in candidates} == {
+        ((2, 0), "Frail"), ((3, 1), "Frail"), ((2, 2), "Archer"), ((3, 1), "Archer")}
+    choice = ai.plan()[brigand]
+    assert choice.target is frail and choice.distance == 1
+    
+    # Forecasts are exact one-round outcomes, terrain included
+    expected = predict_battle_outcome_exact(brigand, frail, max_rounds=1,
+                                            terrain=(grid.tile(choice.position), "Plains"))
+    assert abs(choice.forecast["kill_probability"] * 100 - expected["attacker_victory_percentage"]) < 1e-9
+    assert abs(frail.current_hp - choice.forecast["expected_damage"]
+               - expected["average_defender_remaining_hp"]) < 1e-9
+    
+    # Weights change the choice: a cautious AI attacks the archer, who cannot counter
+    cautious = TargetingAI(grid, "enemy", TargetWeights(damage=0, kill=0, damage_taken=1, death=0))
+    choice = cautious.plan()[brigand]
+    assert choice.target is archer and choice.forecast["expected_damage_taken"] == 0
+    
+    # Forecasts are kept for the turn; a matchup is solved again once HP changes,
+    # and attacks from tiles of the same type at the same distance share one
+    solved = []
+    
+    class CountingAI(TargetingAI):
+        def _solve(self, missing):
+            solved.append(len(missing))
+            super()._solve(missing)
+    
+    ai = CountingAI(grid, "enemy")
+    ai.plan()
+    ai.plan()
+    frail.current_hp = 1
+    ai.plan()
+    ai.new_turn()
+    ai.plan()
+    # One matchup per target, since both tiles next to each target are plains
+    assert solved == [2, 1, 2]
+    
+    print("Success!")
+
+
+def test_chapter_simulation():
+    """Test whole chapters played phase by phase."""
+    print("Testing chapter simulation... ", end="")
+    
+    import random
+    from fe_combat_sim.entities import INFANTRY
+    from fe_combat_sim.grid import GridMap
+    from fe_combat_sim.utils.chapter import (
+        CLEARED, DEFEAT_BOSS, LOST, OUT_OF_TURNS, SURVIVE, Chapter, PhaseScheduler,
+        estimate_clear_rate
+    )
+    
+    def unit(name, power, weapon="Iron Sword", hp=30):
+        stats = {"hp": hp, "str": power, "skl": 20, "spd": 10, "lck": 0, "def": power, "res": 0}
+        return Character(name, INFANTRY, stats, get_weapon(weapon) if weapon else None)
+    
+    def chapter(player, enemies, **conditions):
+        grid = GridMap.from_rows(["........", "..#.....", "........"])
+        grid.place(player, (0, 1), "player")
+        for position, enemy in enumerate(enemies):
+            grid.place(enemy, (7, position), "enemy")
+        return Chapter(grid, **conditions)
+    
+    # A hero that never misses routs a lone enemy on the first turn
+    rout = chapter(unit("Hero", 40), [unit("Grunt", 0)])
+    assert rout.play(seed=1) == (CLEARED, 1, 0)
+    assert rout.deployment[1][0].current_hp == 30   # the chapter's own units are untouched
+    
+    # Losing the lord loses the chapter, in the enemy phase
+    doomed = chapter(unit("Lord", 0), [unit("Brute", 40), unit("Boss", 40)], lords=["Lord"])
+    assert doomed.play(seed=2) == (LOST, 1, 1)
+    
+    # The boss holds its tile; defeating it clears the chapter
+    boss = chapter(unit("Hero", 40), [unit("Grunt", 0, weapon=None), unit("Boss", 0)],
+                   goal=DEFEAT_BOSS, boss="Boss")
+    assert boss.play(seed=3).outcome == CLEARED
+    
+    # Unarmed units can only last: a survival chapter is cleared, a rout runs out of turns
+    assert chapter(unit("Hero", 5, weapon=None), [unit("Grunt", 5, weapon=None)],
+                   goal=SURVIVE, turn_limit=3).play(seed=4) == (CLEARED, 3, 0)
+    assert chapter(unit("Hero", 5, weapon=None), [unit("Grunt", 5, weapon=None)],
+                   turn_limit=3).play(seed=4) == (OUT_OF_TURNS, 3, 0)
+    
+    # Forts heal their unit at the start of its phase
+    grid = rout.deploy()
+    hero = grid.units("player")[0]
+    grid.move(hero, (2, 1))
+    hero.current_hp = 10
+    PhaseScheduler(rout, grid, random.Random(0)).run_phase("enemy")
+    assert hero.current_hp == 10
+    PhaseScheduler(rout, grid, random.Random(0)).run_phase("player")
+    assert hero.current_hp == 16
+    
+    # Clear rates are reproducible from a seed, whatever the number of workers
+    even = chapter(unit("Hero", 8), [unit("Grunt", 6), unit("Grunt", 6)], turn_limit=4)
+    single = estimate_clear_rate(even, 40, workers=1, seed=5, block_size=8)
+    pooled = estimate_clear_rate(even, 40, workers=2, seed=5, block_size=8)
+    assert single["clear_percentage"] == pooled["clear_percentage"]
+    assert list(single["loss_percentage_by_turn"]) == list(pooled["loss_percentage_by_turn"])
+    assert abs(single["clear_percentage"] + single["loss_percentage"]
+               + single["out_of_turns_percentage"] - 100) < 1e-9
+    assert single["cumulative_clear_percentage"][-1] == single["clear_percentage"]
+    
+    print("Success!")
+
+
+def test_combat_skills():
+    """Test skills compiled into a fight's profiles, strike order and guards."""
+    print("Testing combat skills... ", end="")
+    
+    from fe_combat_sim.combat import LOG_COMPACT, SKILLS, Skill, record_battle, register_skill
+    from fe_combat_sim.combat.replay import decode_replay, encode_replay
+    from fe_combat_sim.entities import INFANTRY
+    from fe_combat_sim.utils.comparison import compare_loadouts
+    from fe_combat_sim.utils.exchange import build_exchange_plan
+    from fe_combat_sim.utils.forecast_cache import unit_key
+    from fe_combat_sim.utils.vectorized import plan_slots, predict_battle_outcome_vectorized
+    
+    def unit(name, weapon, skills=(), hp=30, skl=10):
+        stats = {"hp": hp, "str": 8, "skl": skl, "spd": 8, "lck": 0, "def": 4, "res": 0}
+        return Character(name, INFANTRY, stats, weapon, skills)
+    
+    # Fights without skills keep the usual order and run no hooks
+    battle = Battle(unit("Lyn", get_weapon("Iron Sword")), unit("Bors", get_weapon("Iron Lance")))
+    assert battle.order == (0, 1) and battle.skills == () and battle.guards == ((), ())
+    
+    # A Brave weapon strikes twice each time its wielder strikes
+    brave = Weapon("Brave Sword", "Sword", might=9, hit=75, skills=["Brave"])
+    battle = Battle(unit("Lyn", brave), unit("Bors", get_weapon("Iron Lance")))
+    assert battle.order == (0, 0, 1)
+    assert plan_slots(battle.order) == [0, 0, 1]
+    
+    # Vantage only strikes first when attacked at half HP or less
+    defender = unit("Bors", get_weapon("Iron Lance"), skills=["Vantage"])
+    assert Battle(unit("Lyn", get_weapon("Iron Sword")), defender).order == (0, 1)
+    defender.current_hp = 15
+    battle = Battle(unit("Lyn", get_weapon("Iron Sword")), defender, log_level=LOG_COMPACT, seed=1)
+    assert battle.order == (1, 0)
+    battle.simulate_round()
+    assert battle.log[0].attacker == "Bors"
+    
+    # Wrath adds critical rate at half HP or less
+    calm = Battle(unit("Lyn", get_weapon("Iron Sword"), ["Wrath"]), unit("Bors", None))
+    angry = unit("Lyn", get_weapon("Iron Sword"), ["Wrath"])
+    angry.current_hp = 10
+    assert Battle(angry, unit("Bors", None)).attacker_profile.crit == calm.attacker_profile.crit + 50
+    
+    # Pavise negates physical hits at Skill%
+    battle = Battle(unit("Lyn", get_weapon("Iron Sword")), unit("Bors", None, ["Pavise"], skl=100),
+                    log_level=LOG_COMPACT, seed=2)
+    for _ in range(5):
+        battle.simulate_round()
+    assert any(event.hit for event in battle.log)
+    assert all(event.damage == 0 for event in battle.log) and battle.defender.current_hp == 30
+    assert Battle(unit("Lyn", get_weapon("Fire")), battle.defender).skills == ()
+    
+    # Every prediction method accounts for Pavise, and agrees with Battle
+    attacker = unit("Lyn", get_weapon("Iron Sword"), hp=20)
+    defender = unit("Bors", get_weapon("Iron Sword"), ["Pavise"], hp=20, skl=40)
+    assert build_exchange_plan(attacker, defender).negate == (40, 0)
+    exact = predict_battle_outcome(attacker, defender, method="exact")
+    plain = predict_battle_outcome(attacker, unit("Bors", get_weapon("Iron Sword"), hp=20, skl=40),
+                                   method="exact")
+    assert exact["defender_victory_percentage"] > plain["defender_victory_percentage"] + 30
+    sampled = [predict_battle_outcome(attacker, defender, 20000, method=method, seed=6)
+               for method in ("monte_carlo", "vectorized")]
+    comparison = compare_loadouts([(attacker, defender)], iterations=20000, seed=6)["results"][0]
+    for result in sampled + [comparison]:
+        for key in exact:
+            assert abs(exact[key] - result[key]) < 0.05 * max(1, exact[key])
+    wins = 0
+    for fight in range(2000):
+        battle = Battle(unit("Lyn", get_weapon("Iron Sword"), hp=20),
+                        unit("Bors", get_weapon("Iron Sword"), ["Pavise"], hp=20, skl=40), seed=fight)
+        for _ in range(10):
+            if battle.simulate_round()["victory"]:
+                wins += battle.defender.current_hp > 0
+                break
+    assert abs(wins / 20 - exact["defender_victory_percentage"]) < 4
+    
+    # Other guarding skills cannot be predicted
+    halving = Skill("Halve", guard=lambda battle, side: lambda damage: damage // 2)
+    try:
+        build_exchange_plan(attacker, unit("Bors", get_weapon("Iron Lance"), [halving]))
+        assert False, "expected a ValueError"
+    except ValueError as error:
+        assert "Battle" in str(error)
+    
+    # Predictions follow the order and profiles skills give the fight
+    attacker = unit("Lyn", brave, ["Wrath"], hp=30)
+    attacker.current_hp = 12
+    defender = unit("Bors", get_weapon("Iron Lance"), ["Vantage"], hp=30)
+    defender.current_hp = 14
+    plan = build_exchange_plan(attacker, defender)
+    assert plan.order == Battle(attacker, defender).order == (1, 0, 0)
+    exact = predict_battle_outcome(attacker, defender, method="exact")
+    sampled = predict_battle_outcome_vectorized(attacker, defender, iterations=100000, seed=3)
+    for key in exact:
+        assert abs(exact[key] - sampled[key]) < 0.02 * max(1, exact[key])
+    
+    # Skills change forecast keys, and replays keep them
+    assert unit_key(attacker) != unit_key(unit("Lyn", get_weapon("Iron Sword"), hp=30))
+    replay = record_battle(attacker, defender, seed=4)
+    loaded = decode_replay(encode_replay(replay))
+    assert loaded.attacker.skills == ("Wrath",) and loaded.attacker.weapon.skills == ("Brave",)
+    assert [dict(entry) for entry in loaded.rerun().log] == [dict(entry) for entry in replay.entries()]
+    
+    # New skills are registered by name
+    register_skill(Skill("Cancel", "Strikes only once per round", order=lambda order, side: order[:1]))
+    assert Battle(unit("Lyn", get_weapon("Iron Sword"), ["Cancel"]),
+                  unit("Bors", get_weapon("Iron Lance"))).order == (0,)
+    del SKILLS["Cancel"]
+    
+    print("Success!")
+
+
 if __name__ == "__main__":
     print("Testing fe_combat_sim package...")
     test_imports()
     test_data_module()
     test_battle_simulation()
+    test_exact_prediction()
+    test_vectorized_prediction()
+    test_parallel_prediction()
+    test_adaptive_prediction()
+    test_matchup_sweep()
+    test_snapshot_prediction()
+    test_forecast_cache()
+    test_streaming_prediction()
+    test_loadout_comparison()
+    test_growth_prediction()
+    test_combat_profile()
+    test_battle_log_levels()
+    test_event_log()
+    test_bounded_battle_log()
+    test_battle_replay()
+    test_battle_replay_file()
+    test_terrain()
+    test_attack_distance()
+    test_weapon_durability()
+    test_army_pairings()
+    test_grid_map()
+    test_threat_map()
+    test_targeting_ai()
+    test_chapter_simulation()
+    test_combat_skills()
     print("All tests passed!")
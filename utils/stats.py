@@ -47,3 +47,62 @@ def generate_random_stats(base_stats, growth_rates, levels, max_stats=None):
             stats[stat] = min(stats[stat], max_stats[stat])
     
     return stats
+
+def calculate_average_stats(base_stats, growth_rates, levels, max_stats=None):
+    """
+    Calculate the expected stats after a number of level-ups.
+    
+    Args:
+        base_stats (dict): Base stats
+        growth_rates (dict): Growth rates as decimals
+        levels (int): Number of level-ups
+        max_stats (dict, optional): Maximum values for each stat
+        
+    Returns:
+        dict: Expected stats, rounded to the nearest integer
+    """
+    stats = {}
+    
+    for stat, base in base_stats.items():
+        growth = growth_rates.get(stat, 0)
+        stats[stat] = int(base + growth * levels + 0.5)
+        
+        if max_stats and stat in max_stats:
+            stats[stat] = min(stats[stat], max_stats[stat])
+    
+    return stats
+
+def growth_distribution(base, growth_rate, levels, max_stat=None):
+    """
+    Calculate the exact distribution of a stat after a number of level-ups.
+    
+    Each level-up raises the stat by one with probability growth_rate, as in
+    calculate_growth, so the gain follows a binomial distribution.
+    
+    Args:
+        base (int): Base stat value
+        growth_rate (float): Growth rate as a decimal (e.g., 0.7 for 70%)
+        levels (int): Number of level-ups
+        max_stat (int, optional): Maximum value of the stat
+        
+    Returns:
+        dict: Probability of each possible stat value
+    """
+    distribution = {base: 1.0}
+    
+    for _ in range(levels):
+        next_distribution = {}
+        for value, probability in distribution.items():
+            if growth_rate > 0:
+                next_distribution[value + 1] = next_distribution.get(value + 1, 0) + probability * growth_rate
+            if growth_rate < 1:
+                next_distribution[value] = next_distribution.get(value, 0) + probability * (1 - growth_rate)
+        distribution = next_distribution
+    
+    if max_stat is not None:
+        capped = {}
+        for value, probability in distribution.items():
+            capped[min(value, max_stat)] = capped.get(min(value, max_stat), 0) + probability
+        distribution = capped
+    
+    return distribution